@@ -1,11 +1,89 @@
 import gradio as gr
+import json
+import os
 import requests
+import threading
 import uuid
-import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Configuration ---
 # This is the URL where your FastAPI backend is running.
-API_URL = "http://127.0.0.1:8000/chat"
+API_URL = os.getenv("MARS_API_URL", "http://127.0.0.1:8000/chat")
+STREAM_URL = f"{API_URL}/stream"
+
+# HTTP client tuning. The read timeout is the longest silence tolerated
+# between streamed chunks, not a cap on the whole answer.
+CONNECT_TIMEOUT = float(os.getenv("MARS_API_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("MARS_API_READ_TIMEOUT", "90"))
+MAX_RETRIES = int(os.getenv("MARS_API_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("MARS_API_RETRY_BACKOFF", "0.5"))
+MAX_IN_FLIGHT = int(os.getenv("MARS_API_MAX_IN_FLIGHT", "16"))
+QUEUE_TIMEOUT = float(os.getenv("MARS_API_QUEUE_TIMEOUT", "10"))
+
+# Status line shown while the agents are working but no answer text has arrived yet.
+TOOL_STATUS = {
+    "recommender_agent": "🎬 Finding recommendations...",
+    "critic_agent": "🧐 Analyzing the movie...",
+    "recommend_movies": "🎬 Searching similar movies...",
+    "recommend_by_theme": "🎬 Matching themes across the catalog...",
+    "movie_info_agent": "🔎 Looking that up...",
+    "search_movies": "🔎 Searching the catalog...",
+    "profile_agent": "📝 Checking your profile...",
+    "get_movie_rating": "⭐ Fetching the rating...",
+    "update_user_preferences": "📝 Saving your preference...",
+}
+
+class BackendBusy(Exception):
+    """Raised when too many requests to the backend are already in flight."""
+
+
+class BackendClient:
+    """
+    Shared HTTP client for the FastAPI backend.
+
+    One pooled `requests.Session` keeps TCP connections alive across messages.
+    Retries only cover failures where the chat can't have been processed
+    (connection errors, 502/503 from a proxy or a warming-up worker), with
+    exponential backoff, so a message is never sent twice. A semaphore caps
+    in-flight requests so a slow backend can't tie up every Gradio worker.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_factor=RETRY_BACKOFF, max_in_flight=MAX_IN_FLIGHT, queue_timeout=QUEUE_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=(502, 503),
+            allowed_methods=frozenset({"GET", "POST"}),
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @contextmanager
+    def post_stream(self, url, payload):
+        """POSTs `payload` and yields the streaming response while holding an in-flight slot."""
+        if not self._in_flight.acquire(timeout=self.queue_timeout):
+            raise BackendBusy()
+        try:
+            with self.session.post(url, json=payload, stream=True, timeout=self.timeout) as response:
+                yield response
+        finally:
+            self._in_flight.release()
+
+
+backend = BackendClient()
 
 # --- UI Customization ---
 # A more professional and modern theme for our chatbot.
@@ -33,10 +111,24 @@ def get_session_ids(session_state):
         session_state["session_id"] = str(uuid.uuid4())
     return session_state.get("user_id"), session_state.get("session_id")
 
+def iter_sse(response):
+    """Parses a text/event-stream response into (event, data) pairs as lines arrive."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
 def chat_with_bot(message, history, session_state):
     """
     This function is called every time the user sends a message.
-    It communicates with your FastAPI backend and yields the response.
+    It streams the answer from the FastAPI backend and yields the text
+    received so far, so tokens show up as the model produces them.
     """
     user_id, session_id = get_session_ids(session_state)
     
@@ -48,22 +140,28 @@ def chat_with_bot(message, history, session_state):
             "session_id": session_id,
             "message": message,
         }
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        
-        bot_response = response.json().get("response", "Sorry, I encountered an error.")
-        
-        # Simulate a "typing" effect for a better UX
-        for i in range(len(bot_response)):
-            time.sleep(0.01)
-            yield bot_response[: i+1]
+        with backend.post_stream(STREAM_URL, payload) as response:
+            response.raise_for_status()
+
+            bot_response = ""
+            for event, data in iter_sse(response):
+                if event == "token":
+                    bot_response += data["text"]
+                    yield bot_response
+                elif event == "tool" and not bot_response:
+                    yield TOOL_STATUS.get(data["name"], "⏳ Working on it...")
+                elif event == "error":
+                    yield data.get("message", "Sorry, I encountered an error.")
+                    return
+                elif event == "done" and not bot_response:
+                    yield data.get("response") or "Sorry, I encountered an error."
         
+    except BackendBusy:
+        yield "I'm handling a lot of conversations right now. Please try again in a moment."
+
     except requests.exceptions.RequestException as e:
         print(f"API Error: {e}")
-        error_message = "I'm having trouble connecting to my brain right now. Please make sure the backend server is running and try again."
-        for i in range(len(error_message)):
-            time.sleep(0.01)
-            yield error_message[: i+1]
+        yield "I'm having trouble connecting to my brain right now. Please make sure the backend server is running and try again."
 
 # --- Build the Gradio Interface using Blocks for customization ---
 
@@ -0,0 +1,162 @@
+"""
+Recall / latency / memory benchmark for the FAISS index backends in storage/ann_index.py.
+
+Every backend is compared against the exact flat index on the same vectors:
+recall@k against the flat top-k, p50/p99 single-query latency, and the
+on-disk (~= resident) index size. Run from the repository root:
+
+    python -m benchmarks.ann_benchmark                        # real embeddings
+    python -m benchmarks.ann_benchmark --synthetic 1000000    # synthetic catalog
+    python -m benchmarks.ann_benchmark --nprobe 8 16 32 --ef-search 32 64 128 --json results/ann.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from storage.ann_index import INDEX_TYPES, build_index, configure_search
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def synthetic_vectors(num_vectors: int, dim: int, seed: int = 0, num_clusters: int = 256) -> np.ndarray:
+    """Clustered, L2-normalized vectors; uniform noise would make every ANN index look bad."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    vectors = np.empty((num_vectors, dim), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, num_vectors, chunk):
+        stop = min(start + chunk, num_vectors)
+        labels = rng.integers(0, num_clusters, stop - start)
+        vectors[start:stop] = centers[labels] + 0.5 * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def load_real_embeddings(path: str) -> np.ndarray:
+    return np.ascontiguousarray(np.load(path, mmap_mode="r"), dtype=np.float32)
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, seed: int = 1) -> np.ndarray:
+    """Perturbed catalog vectors, so queries land near (but not on) real items."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+
+def index_size_bytes(index: faiss.Index) -> int:
+    with tempfile.NamedTemporaryFile(suffix=".index", delete=False) as f:
+        path = f.name
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(index: faiss.Index, queries: np.ndarray, top_k: int):
+    """Single-query latencies (ms), matching how the chat tools call search()."""
+    latencies = np.empty(len(queries))
+    found = np.empty((len(queries), top_k), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], top_k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        found[i] = ids[0]
+    return found, latencies
+
+
+def run(vectors: np.ndarray, backends, top_k: int, num_queries: int, nprobes, ef_searches) -> list:
+    queries = make_queries(vectors, num_queries)
+    rows = []
+
+    flat = build_index(vectors, "flat")
+    truth, _ = time_queries(flat, queries, top_k)
+
+    for backend in backends:
+        start = time.perf_counter()
+        index = flat if backend == "flat" else build_index(vectors, backend)
+        build_seconds = time.perf_counter() - start
+        size = index_size_bytes(index)
+
+        if backend in ("ivf", "ivfpq"):
+            settings = [{"nprobe": n} for n in nprobes]
+        elif backend == "hnsw":
+            settings = [{"ef_search": ef} for ef in ef_searches]
+        else:
+            settings = [{}]
+
+        for setting in settings:
+            configure_search(index, **setting)
+            found, latencies = time_queries(index, queries, top_k)
+            rows.append({
+                "backend": backend,
+                "params": setting,
+                "num_vectors": len(vectors),
+                "dim": vectors.shape[1],
+                "recall_at_k": round(recall_at_k(found, truth), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+                "index_mb": round(size / 2**20, 2),
+                "build_s": round(build_seconds, 2),
+            })
+    return rows
+
+
+def print_table(rows: list, top_k: int) -> None:
+    print(f"{'backend':<8} {'params':<18} {'N':>10} {'recall@' + str(top_k):>10} {'p50 ms':>9} {'p99 ms':>9} {'index MB':>9} {'build s':>8}")
+    for row in rows:
+        params = ",".join(f"{k}={v}" for k, v in row["params"].items()) or "-"
+        print(f"{row['backend']:<8} {params:<18} {row['num_vectors']:>10} {row['recall_at_k']:>10.4f} "
+              f"{row['p50_ms']:>9.4f} {row['p99_ms']:>9.4f} {row['index_mb']:>9.2f} {row['build_s']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="embeddings/imdb_embeddings.npy", help="Stored catalog embeddings (.npy).")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[], help="Also benchmark synthetic catalogs of these sizes.")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for synthetic catalogs (MiniLM-L12 is 384).")
+    parser.add_argument("--backends", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    datasets = []
+    if os.path.exists(args.embeddings):
+        datasets.append(("real", load_real_embeddings(args.embeddings)))
+    else:
+        print(f"(no stored embeddings at {args.embeddings}; start the API once to build them)")
+    for size in args.synthetic:
+        datasets.append((f"synthetic-{size}", synthetic_vectors(size, args.dim)))
+
+    results = {}
+    for name, vectors in datasets:
+        print(f"\n=== {name}: {len(vectors)} x {vectors.shape[1]} ===")
+        rows = run(vectors, args.backends, args.top_k, args.queries, args.nprobe, args.ef_search)
+        print_table(rows, args.top_k)
+        results[name] = rows
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
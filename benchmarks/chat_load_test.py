@@ -0,0 +1,65 @@
+"""
+Concurrent /chat load test.
+
+Fires `--concurrency` chats at once (each from its own user/session) for
+`--rounds` rounds against a running API and reports per-request latency and
+the overlap factor: sum of request latencies / wall-clock time. A server that
+serialises chats scores ~1.0; one that overlaps them approaches the
+concurrency level. It ends with the server's fast-path share (chats
+answered without the LLM agents). Start the API first (`uvicorn main:app`), then:
+
+    python -m benchmarks.chat_load_test --concurrency 8 --rounds 3
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+DEFAULT_MESSAGES = [
+    "What is the rating for 'Pulp Fiction'?",
+    "Can you recommend a movie like 'The Matrix'?",
+    "What is the plot of 'Inception'?",
+    "I loved 'Parasite', can you save that to my profile?",
+]
+
+
+async def one_chat(client: httpx.AsyncClient, url: str, message: str) -> float:
+    payload = {"user_id": str(uuid.uuid4()), "session_id": str(uuid.uuid4()), "message": message}
+    start = time.perf_counter()
+    response = await client.post(url, json=payload)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(url: str, concurrency: int, rounds: int, timeout: float, stats_url: str) -> None:
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        for round_number in range(1, rounds + 1):
+            messages = [DEFAULT_MESSAGES[i % len(DEFAULT_MESSAGES)] for i in range(concurrency)]
+            start = time.perf_counter()
+            latencies = np.array(await asyncio.gather(*(one_chat(client, url, m) for m in messages)))
+            wall = time.perf_counter() - start
+            overlap = latencies.sum() / wall
+            print(f"round {round_number}: {concurrency} chats in {wall:.2f}s | "
+                  f"p50 {np.percentile(latencies, 50):.2f}s  max {latencies.max():.2f}s | "
+                  f"overlap x{overlap:.2f} (1.0 = fully queued, {concurrency} = fully parallel)")
+        stats = (await client.get(stats_url)).json()
+        print(f"fast path: {stats['fast_path']}/{stats['total']} chats ({stats['fast_path_ratio']:.0%}) | "
+              f"fallbacks: {stats['fallback_reasons']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--stats-url", default="http://127.0.0.1:8000/stats/fast-path")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.rounds, args.timeout, args.stats_url))
+
+
+if __name__ == "__main__":
+    main()
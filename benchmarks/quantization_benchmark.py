@@ -0,0 +1,203 @@
+"""
+Accuracy / memory / speed report for the vector codecs in storage/ann_index.py
+(MARS_VECTOR_CODEC: float32, fp16, int8, pq).
+
+For every index type and codec, on the same vectors:
+
+    overlap@k    share of the exact float32 top-k (brute force) that the
+                 index returns, i.e. what compression (and ANN) costs
+    p50/p99 ms   single-query search latency, and the change against the
+                 float32 index of the same type
+    index MB     on-disk (~= resident) index size
+    keep/drop MB what the retriever holds: the index plus the raw float32
+                 matrix, or the index alone with MARS_DROP_RAW_EMBEDDINGS=1.
+                 The raw matrix is memory-mapped, so "keep" is the worst
+                 case: all of it is resident after the index is built or
+                 refreshed, otherwise only the rows read so far
+    saved        drop-raw memory against today's float32 index + raw matrix
+    decode err   mean relative L2 error of vectors read back from the index,
+                 which personalization and exact filtered search use once
+                 the raw matrix is dropped
+
+Run from the repository root:
+
+    python -m benchmarks.quantization_benchmark                         # stored embeddings
+    python -m benchmarks.quantization_benchmark --synthetic 100000 --index-types flat hnsw
+    python -m benchmarks.quantization_benchmark --synthetic 100000 --compare results/quantization_benchmark.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.ann_benchmark import (
+    index_size_bytes,
+    load_real_embeddings,
+    make_queries,
+    recall_at_k,
+    synthetic_vectors,
+    time_queries,
+)
+from storage.ann_index import CODECS, INDEX_TYPES, IndexVectors, build_index, configure_search, resolve_codec
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def codecs_for(index_type: str, codecs) -> list:
+    """The requested codecs that `index_type` can be built with (ivfpq is always pq)."""
+    valid = []
+    for codec in codecs:
+        try:
+            resolved = resolve_codec(index_type, codec)
+        except ValueError:
+            continue
+        if resolved not in valid:
+            valid.append(resolved)
+    return valid
+
+
+def decode_error(index, vectors: np.ndarray, sample: int = 1000, seed: int = 2) -> float:
+    rows = np.random.default_rng(seed).choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    decoded = IndexVectors(index)[rows]
+    original = vectors[rows]
+    return float(np.mean(np.linalg.norm(decoded - original, axis=1) / np.linalg.norm(original, axis=1)))
+
+
+def run(vectors: np.ndarray, index_types, codecs, top_k: int, num_queries: int, nprobe: int, ef_search: int) -> list:
+    queries = make_queries(vectors, num_queries)
+    truth, _ = time_queries(build_index(vectors, "flat"), queries, top_k)
+    raw_bytes = vectors.nbytes
+    rows = []
+    baseline_memory = None
+    for index_type in index_types:
+        baseline_p50 = None
+        for codec in codecs_for(index_type, codecs):
+            start = time.perf_counter()
+            # ID-mapped like MovieRetriever's index, so sizes include the id maps it carries.
+            index = build_index(vectors, index_type, ids=np.arange(len(vectors)), codec=codec)
+            build_seconds = time.perf_counter() - start
+            configure_search(index, nprobe=nprobe, ef_search=ef_search)
+            size = index_size_bytes(index)
+            found, latencies = time_queries(index, queries, top_k)
+            p50 = float(np.percentile(latencies, 50))
+            if baseline_p50 is None and codec == "float32":
+                baseline_p50 = p50
+            if baseline_memory is None and (index_type, codec) == ("flat", "float32"):
+                baseline_memory = size + raw_bytes
+            rows.append({
+                "index_type": index_type,
+                "codec": codec,
+                "num_vectors": len(vectors),
+                "dim": vectors.shape[1],
+                "overlap_at_k": round(recall_at_k(found, truth), 4),
+                "p50_ms": round(p50, 4),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+                "speed_change": round(baseline_p50 / p50 - 1, 4) if baseline_p50 else None,
+                "index_mb": round(size / 2**20, 2),
+                "keep_raw_mb": round((size + raw_bytes) / 2**20, 2),
+                "drop_raw_mb": round(size / 2**20, 2),
+                "saved": round(1 - size / baseline_memory, 4) if baseline_memory else None,
+                "decode_error": round(decode_error(index, vectors), 4),
+                "build_s": round(build_seconds, 2),
+            })
+            print(f"  {index_type}/{codec} done", file=sys.stderr, flush=True)
+    return rows
+
+
+def print_table(rows: list, top_k: int) -> None:
+    def percent(value):
+        return "-" if value is None else f"{value:+.0%}"
+
+    print(f"{'type':<7}{'codec':<9}{'overlap@' + str(top_k):>11}{'p50 ms':>9}{'p99 ms':>9}{'speed':>8}"
+          f"{'index MB':>10}{'keep MB':>9}{'drop MB':>9}{'saved':>7}{'decode err':>12}{'build s':>9}")
+    for row in rows:
+        saved = "-" if row["saved"] is None else f"{row['saved']:.0%}"
+        print(f"{row['index_type']:<7}{row['codec']:<9}{row['overlap_at_k']:>11.4f}{row['p50_ms']:>9.3f}"
+              f"{row['p99_ms']:>9.3f}{percent(row['speed_change']):>8}{row['index_mb']:>10.1f}{row['keep_raw_mb']:>9.1f}"
+              f"{row['drop_raw_mb']:>9.1f}{saved:>7}{row['decode_error']:>12.4f}{row['build_s']:>9.2f}")
+    print("(speed: query-rate change against float32 of the same type; "
+          "saved: drop-raw memory against float32 flat + raw matrix)")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, overlap_tolerance: float, min_delta_ms: float) -> list:
+    """Lines describing every overlap drop or slowdown against the baseline beyond the tolerances."""
+    regressions = []
+    print("\nComparison with baseline:")
+    for dataset, rows in results.items():
+        old = {(r["index_type"], r["codec"]): r for r in baseline.get(dataset, [])}
+        for row in rows:
+            before = old.get((row["index_type"], row["codec"]))
+            if before is None:
+                continue
+            name = f"{dataset} {row['index_type']}/{row['codec']}"
+            overlap_drop = before["overlap_at_k"] - row["overlap_at_k"]
+            slowdown = row["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+            slower = slowdown > tolerance and row["p50_ms"] - before["p50_ms"] > min_delta_ms
+            worse = overlap_drop > overlap_tolerance or slower
+            print(f"  {name:<32} overlap {before['overlap_at_k']:.4f} -> {row['overlap_at_k']:.4f}  "
+                  f"p50 {before['p50_ms']:.3f} -> {row['p50_ms']:.3f} ms ({slowdown:+.1%})"
+                  f"{'  <-- regression' if worse else ''}")
+            if worse:
+                regressions.append(f"{name}: overlap {overlap_drop:+.4f} lower, p50 {slowdown:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="embeddings/imdb_embeddings.npy", help="Stored catalog embeddings (.npy).")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[], help="Also benchmark synthetic catalogs of these sizes.")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for synthetic catalogs (MiniLM-L12 is 384).")
+    parser.add_argument("--index-types", nargs="+", default=["flat"], choices=INDEX_TYPES)
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS), choices=CODECS)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, default=16, help="nprobe for IVF indexes.")
+    parser.add_argument("--ef-search", type=int, default=64, help="efSearch for HNSW indexes.")
+    parser.add_argument("--json", default="results/quantization_benchmark.json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative p50 slowdown before flagging a regression.")
+    parser.add_argument("--overlap-tolerance", type=float, default=0.01, help="Allowed absolute overlap@k drop.")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="Ignore p50 slowdowns smaller than this, which are timer noise on small catalogs.")
+    args = parser.parse_args()
+
+    datasets = []
+    if os.path.exists(args.embeddings):
+        datasets.append(("real", load_real_embeddings(args.embeddings)))
+    else:
+        print(f"(no stored embeddings at {args.embeddings}; start the API once to build them)")
+    for size in args.synthetic:
+        datasets.append((f"synthetic-{size}", synthetic_vectors(size, args.dim)))
+
+    results = {}
+    for name, vectors in datasets:
+        print(f"\n=== {name}: {len(vectors)} x {vectors.shape[1]} ===", flush=True)
+        rows = run(vectors, args.index_types, args.codecs, args.top_k, args.queries, args.nprobe, args.ef_search)
+        print_table(rows, args.top_k)
+        results[name] = rows
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "top_k": args.top_k, "nprobe": args.nprobe,
+                       "ef_search": args.ef_search, "datasets": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["datasets"], args.tolerance, args.overlap_tolerance,
+                              args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nNo overlap drops beyond {args.overlap_tolerance} or slowdowns beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+End-to-end replay benchmark for the chat API, with the LLMs stubbed out.
+
+Drives the FastAPI app in `main.py` in-process (no server, no API key) with
+recorded or synthetic conversations. Every agent's Gemini model is replaced
+by `StubLlm`: a deterministic, scripted model with configurable latency that
+routes, calls tools and answers the way the real agents are instructed to, so
+everything except the model itself runs for real (fast path, ADK runner,
+tools, critic cache, query encoding, FAISS, session store).
+
+Conversations are closed-loop: each worker replays one conversation's turns
+in order on its own session, then takes the next conversation. For every
+concurrency level it reports throughput, p50/p95/p99 request latency and the
+same percentiles per stage, taken from each request's RequestTrace (see
+observability/metrics.py):
+
+    routing     the manager's LLM calls (llm:movie_chatbot_manager)
+    critic      the critic tool, including cache and precomputed hits
+    encode      SentenceTransformer query encoding (cache misses)
+    faiss       FAISS searches
+    session_io  session store reads and writes
+
+Results are written as JSON; `--compare` diffs a run against a saved one and
+exits with status 1 if anything regressed by more than `--tolerance`.
+
+    python -m benchmarks.replay_benchmark --concurrency 1 4 16
+    python -m benchmarks.replay_benchmark --conversations chats.jsonl --llm-latency 0.2
+    python -m benchmarks.replay_benchmark --json results/replay_new.json --compare results/replay.json
+
+A conversations file has one JSON object per line, either
+{"turns": ["first message", "second message", ...]} or {"message": "..."}.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from typing import AsyncGenerator, List
+
+import numpy as np
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# Report name -> RequestTrace stage.
+STAGES = {
+    "routing": "llm:movie_chatbot_manager",
+    "critic": "tool:critic_agent",
+    "encode": "encode",
+    "faiss": "faiss",
+    "session_io": "session_io",
+}
+PERCENTILES = (50, 95, 99)
+
+_QUOTED = re.compile(r"(?<![A-Za-z])['\"“‘](.+?)['\"”’](?![A-Za-z])")
+
+
+# --- Stub model ------------------------------------------------------------
+
+def _quoted_title(text: str) -> str:
+    match = _QUOTED.search(text)
+    return match.group(1) if match else text
+
+
+def _text(content: types.Content) -> str:
+    return "".join(part.text for part in content.parts or [] if part.text)
+
+
+class StubLlm(BaseLlm):
+    """
+    Deterministic stand-in for Gemini. It sleeps `latency` seconds (varied
+    by up to +/- `jitter` of that, seeded by the prompt) and then plays the
+    agent it is serving, recognised by the tools it was given:
+
+      - manager: routes to recommender_agent, profile_agent or movie_info_agent
+      - recommender_agent: recommend_by_theme, else critic_agent then recommend_movies
+      - profile_agent: get_movie_rating or update_user_preferences
+      - movie_info_agent: search_movies
+      - no tools (critic_agent): a valid analysis JSON
+
+    Each agent answers in text once it has seen its last tool result.
+    """
+
+    model: str = "stub-llm"
+    latency: float = 0.05
+    jitter: float = 0.0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        request_text, responses = self._turn(llm_request.contents)
+        delay = self.latency
+        if self.jitter:
+            seed = int.from_bytes(hashlib.blake2b(request_text.encode(), digest_size=4).digest(), "little")
+            delay *= 1 + self.jitter * (2 * random.Random(seed + len(responses)).random() - 1)
+        await asyncio.sleep(max(0.0, delay))
+
+        tools = set(llm_request.tools_dict or ())
+        part = self._next_step(tools, request_text, responses)
+        output = part.text or json.dumps(part.function_call.args)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=sum(len(_text(c)) for c in llm_request.contents) // 4,
+                candidates_token_count=len(output) // 4,
+                total_token_count=0,
+            ),
+        )
+
+    @staticmethod
+    def _turn(contents: List[types.Content]):
+        """The current user message and the tool results received since it, by tool name."""
+        responses = {}
+        for content in reversed(contents):
+            parts = content.parts or []
+            for part in parts:
+                if part.function_response:
+                    responses.setdefault(part.function_response.name, part.function_response.response)
+            text = _text(content)
+            if content.role == "user" and text:
+                return text, responses
+        return "", responses
+
+    @staticmethod
+    def _call(name: str, **args) -> types.Part:
+        return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+    def _next_step(self, tools: set, text: str, responses: dict) -> types.Part:
+        title = _quoted_title(text)
+        lowered = text.lower()
+
+        if "recommender_agent" in tools:  # manager
+            if responses:
+                response = next(iter(responses.values()))
+                return types.Part(text=f"Here is what I found: {str(response.get('result', response))[:300]}")
+            if re.search(r"recommend|suggest|similar|should i watch", lowered):
+                return self._call("recommender_agent", request=text)
+            if re.search(r"rating|rated|lov|hat|liked|dislike", lowered):
+                return self._call("profile_agent", request=text)
+            return self._call("movie_info_agent", request=text)
+
+        if "recommend_by_theme" in tools:  # recommender_agent
+            if "recommend_movies" in responses:
+                titles = [movie.get("Title") or movie.get("title") for movie in responses["recommend_movies"].get("recommendations", [])]
+                return types.Part(text=f"Since you liked {title}, you might enjoy: {', '.join(map(str, titles))}.")
+            if "critic_agent" in responses:
+                try:
+                    summary = json.loads(responses["critic_agent"].get("result", ""))["summary"]
+                except (ValueError, KeyError, TypeError):
+                    summary = title
+                return self._call("recommend_movies", base_query=summary)
+            theme = responses.get("recommend_by_theme")
+            if theme is None:
+                return self._call("recommend_by_theme", title=title)
+            if theme.get("status") == "success":
+                titles = [movie.get("Title") for movie in theme.get("recommendations", [])]
+                return types.Part(text=f"Since you liked {title}, you might enjoy: {', '.join(map(str, titles))}.")
+            return self._call("critic_agent", request=title)
+
+        if "update_user_preferences" in tools:  # profile_agent
+            if responses:
+                return types.Part(text=f"Done: {json.dumps(next(iter(responses.values())), default=str)[:200]}")
+            if re.search(r"rating|rated", lowered):
+                return self._call("get_movie_rating", title=title)
+            key = "disliked_movie" if re.search(r"hat|dislike", lowered) else "liked_movie"
+            return self._call("update_user_preferences", user_id="replay", **{key: title})
+
+        if "search_movies" in tools:  # movie_info_agent
+            if responses:
+                results = responses["search_movies"].get("results", [])
+                return types.Part(text=f"I found {len(results)} matching movies.")
+            return self._call("search_movies", query=title)
+
+        # critic_agent
+        return types.Part(text=json.dumps({
+            "themes": ["identity", "ambition", "loss"],
+            "genre_style": "A character-driven drama with a restrained visual style.",
+            "summary": f"A character-driven drama about identity and ambition, in the spirit of {title}.",
+        }))
+
+
+def install_stub_llm(agent, latency: float, jitter: float) -> None:
+    """Replaces the model of `agent` and of every agent reachable through its sub-agents and AgentTools."""
+    agent.model = StubLlm(latency=latency, jitter=jitter)
+    children = list(getattr(agent, "sub_agents", []))
+    children += [tool.agent for tool in getattr(agent, "tools", []) if hasattr(tool, "agent")]
+    for child in children:
+        install_stub_llm(child, latency, jitter)
+
+
+# --- Conversations ---------------------------------------------------------
+
+SYNTHETIC_TURNS = (
+    "What is the rating of '{title}'?",
+    "What is '{title}' about?",
+    "Can you recommend a movie like '{title}'?",
+    "I loved '{title}', can you save that to my profile?",
+    "Who directed '{title}'?",
+    "Recommend me something similar to '{title}'.",
+)
+
+
+def load_conversations(path: str) -> List[List[str]]:
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turns = record.get("turns") or ([record["message"]] if record.get("message") else [])
+            if turns:
+                conversations.append([str(turn) for turn in turns])
+    return conversations
+
+
+def synthetic_conversations(titles: List[str], count: int, turns: int, seed: int = 0) -> List[List[str]]:
+    rng = random.Random(seed)
+    return [[rng.choice(SYNTHETIC_TURNS).format(title=rng.choice(titles)) for _ in range(turns)] for _ in range(count)]
+
+
+# --- Replay ----------------------------------------------------------------
+
+def _percentiles(values) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {}
+    return {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+
+
+class TraceRecorder:
+    """Collects the RequestTrace of every finished chat request."""
+
+    def __init__(self):
+        self.traces = []
+
+    def wrap(self, finish_trace):
+        def recording(trace, endpoint, route):
+            finish_trace(trace, endpoint, route)
+            self.traces.append((route, trace.summary()))
+        return recording
+
+
+async def replay(client, path: str, conversations: List[List[str]], concurrency: int, recorder: TraceRecorder) -> dict:
+    """Replays every conversation once on `concurrency` workers and summarises the run."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for conversation in conversations:
+        queue.put_nowait(conversation)
+    latencies, errors = [], 0
+    recorder.traces = []
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            conversation = queue.get_nowait()
+            user_id, session_id = f"replay-{uuid.uuid4().hex[:8]}", str(uuid.uuid4())
+            for message in conversation:
+                start = time.perf_counter()
+                response = await client.post(path, json={"user_id": user_id, "session_id": session_id, "message": message})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200 or "event: error" in response.text:
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    summaries = [summary for _, summary in recorder.traces]
+    stages = {}
+    for name, stage in STAGES.items():
+        values = [s["stages_ms"][stage] for s in summaries if stage in s["stages_ms"]]
+        stages[name] = {"requests": len(values), **_percentiles(values)}
+    agent_turns = [s["llm_calls"] for route, s in recorder.traces if route == "agent"]
+    routes = {}
+    for route, _ in recorder.traces:
+        routes[route] = routes.get(route, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {**_percentiles(latencies), "mean": round(float(np.mean(latencies)), 2) if latencies else None},
+        "stages_ms": stages,
+        "routes": routes,
+        "llm_calls_per_agent_turn": round(float(np.mean(agent_turns)), 2) if agent_turns else 0.0,
+    }
+
+
+def print_level(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"\nconcurrency {result['concurrency']}: {result['requests']} requests in {result['wall_s']:.2f}s | "
+          f"{result['throughput_rps']:.1f} req/s | p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  "
+          f"p99 {latency['p99']:.1f} ms | errors {result['errors']} | routes {result['routes']} | "
+          f"{result['llm_calls_per_agent_turn']} LLM calls per agent turn")
+    print(f"  {'stage':<12}{'requests':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stage in result["stages_ms"].items():
+        if stage["requests"]:
+            print(f"  {name:<12}{stage['requests']:>9}{stage['p50']:>10.2f}{stage['p95']:>10.2f}{stage['p99']:>10.2f}")
+        else:
+            print(f"  {name:<12}{0:>9}{'-':>10}{'-':>10}{'-':>10}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Lines describing every metric that got worse than the baseline by more
+    than `tolerance`; latencies must also have grown by `min_delta_ms`, so
+    noise in sub-millisecond stages is not flagged.
+    """
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nComparison with baseline ({baseline['config'].get('created')}):")
+    for key, value in results["config"].items():
+        if key != "created" and baseline["config"].get(key) != value:
+            print(f"  ⚠️ config differs: {key} was {baseline['config'].get(key)!r}, now {value!r}")
+    for level in results["levels"]:
+        old = baseline_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        checks = [("throughput_rps", old["throughput_rps"], level["throughput_rps"], False)]
+        checks += [(f"latency {p}", old["latency_ms"].get(p), level["latency_ms"].get(p), True) for p in ("p50", "p95", "p99")]
+        checks += [(f"{name} p95", old["stages_ms"].get(name, {}).get("p95"), stage.get("p95"), True)
+                   for name, stage in level["stages_ms"].items()]
+        for metric, before, after, lower_is_better in checks:
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = (change > tolerance and after - before >= min_delta_ms) if lower_is_better else change < -tolerance
+            flag = "  <-- regression" if worse else ""
+            print(f"  c={level['concurrency']:<4}{metric:<18}{before:>10.2f} -> {after:>10.2f}  ({change:+.1%}){flag}")
+            if worse:
+                regressions.append(f"concurrency {level['concurrency']}: {metric} {before:.2f} -> {after:.2f} ({change:+.1%})")
+    return regressions
+
+
+async def run(args) -> dict:
+    # Imported here so the environment set up in main() is in place first.
+    import main as app_module
+    from manager_agent.agent import root_agent
+    from storage.catalog import get_catalog
+    from storage.vector_db import warm_up_retriever
+    import httpx
+
+    install_stub_llm(root_agent, args.llm_latency, args.llm_jitter)
+    recorder = TraceRecorder()
+    app_module._finish_trace = recorder.wrap(app_module._finish_trace)
+
+    if args.conversations:
+        conversations = load_conversations(args.conversations)
+        source = args.conversations
+    else:
+        catalog = get_catalog()
+        titles = [str(record["Title"]) for record in catalog.records[:args.title_pool]]
+        conversations = synthetic_conversations(titles, args.num_conversations, args.turns, args.seed)
+        source = f"synthetic ({args.num_conversations} x {args.turns} turns, seed {args.seed})"
+    print(f"Replaying {sum(map(len, conversations))} turns from {source} against {args.endpoint} "
+          f"with a {args.llm_latency * 1000:.0f} ms stub LLM.")
+
+    await asyncio.to_thread(warm_up_retriever)
+    path = "/chat" if args.endpoint == "chat" else "/chat/stream"
+    transport = httpx.ASGITransport(app=app_module.app)
+    levels = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=args.timeout) as client:
+        if args.warmup:
+            # One uncounted pass fills the query, critic and session caches, so every level measures steady state.
+            await replay(client, path, conversations, max(args.concurrency), recorder)
+        for concurrency in args.concurrency:
+            result = await replay(client, path, conversations, concurrency, recorder)
+            print_level(result)
+            levels.append(result)
+    await app_module.session_service.close()
+
+    return {
+        "config": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "endpoint": args.endpoint,
+            "conversations": source,
+            "turns": sum(map(len, conversations)),
+            "llm_latency_s": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "fast_path": not args.no_fast_path,
+            "warmup": args.warmup,
+        },
+        "levels": levels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", help="JSONL file of conversations to replay (default: synthetic).")
+    parser.add_argument("--num-conversations", type=int, default=40, help="Synthetic conversations to generate.")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per synthetic conversation.")
+    parser.add_argument("--title-pool", type=int, default=200, help="Synthetic turns pick titles from the first N catalog rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--endpoint", choices=("chat", "chat_stream"), default="chat")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM call.")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Vary LLM latency by up to this fraction.")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every turn through the agents.")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Measure from cold caches.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", default="results/replay_benchmark.json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown before flagging a regression.")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's INFO logs.")
+    args = parser.parse_args()
+
+    # Sessions and critic analyses go to throwaway databases, not the app's.
+    scratch = tempfile.mkdtemp(prefix="mars-replay-")
+    os.environ["MARS_SESSION_DB"] = os.path.join(scratch, "sessions.db")
+    os.environ["MARS_CRITIC_CACHE_DB"] = os.path.join(scratch, "critic_cache.db")
+    if args.no_fast_path:
+        os.environ["MARS_FAST_PATH"] = "0"
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        # Modules loaded by the app set up their own INFO loggers.
+        logging.disable(logging.INFO)
+
+    results = asyncio.run(run(args))
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Retrieval-layer micro-benchmarks on synthetic catalogs of growing size.
+
+Generates catalogs with the same schema as data/imdb_cleaned.csv (10k, 100k
+and 1M rows by default), together with a matching embedding store and FAISS
+index, then measures in a fresh process per size:
+
+    load      CSV parse, parquet snapshot load, keyword/title index build
+              and MovieRetriever start-up (model, mmap'd embeddings, index)
+    functions p50/p95/p99 latency (sequential calls), throughput (calls/s
+              from `--threads` threads) and peak RSS after each of
+              search_movies_by_keywords, get_rating_by_title,
+              MovieRetriever.search and recommend_movies (plain and
+              personalized)
+
+Embeddings are synthetic clustered vectors, so the numbers describe the
+storage and tools modules, not retrieval quality; query encoding still runs
+through the real SentenceTransformer. Generated catalogs are kept in
+`--workdir` and reused by later runs with the same size and seed.
+
+    python -m benchmarks.retrieval_benchmark
+    python -m benchmarks.retrieval_benchmark --sizes 10k 100k --queries 100
+    python -m benchmarks.retrieval_benchmark --json results/retrieval_new.json --compare results/retrieval.json
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = "data/imdb_cleaned.csv"
+EMBEDDING_PATH = "embeddings/imdb_embeddings.npy"
+INDEX_PATH = "vectorstore/imdb_faiss.index"
+PERCENTILES = (50, 95, 99)
+
+_WORDS = (
+    "shadow night river city dream empire silent broken last lost secret golden iron crimson winter summer "
+    "storm fire glass stone wild dark bright hidden final first northern eastern distant burning frozen "
+    "kingdom garden mirror highway harbor station island forest desert mountain ocean tower bridge "
+    "journey promise memory return escape reckoning rising fall echo signal horizon frontier legacy"
+).split()
+_PLOT_WORDS = (
+    "detective family soldier teacher thief pilot scientist journalist musician farmer doctor lawyer "
+    "village war conspiracy heist revenge romance friendship betrayal survival ambition grief redemption "
+    "investigates discovers escapes confronts protects uncovers pursues rebuilds defends abandons"
+).split()
+_GENRES = ("Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama",
+           "Family", "Fantasy", "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western")
+_CERTIFICATES = ("G", "PG", "PG-13", "R", "NC-17", "Not Rated")
+_FIRST = ("James", "Maria", "Chen", "Aisha", "Lars", "Sofia", "Kenji", "Amara", "Diego", "Nora", "Ivan", "Leila")
+_LAST = ("Hart", "Okafor", "Lindqvist", "Moreau", "Tanaka", "Rossi", "Novak", "Haddad", "Silva", "Byrne", "Kowal", "Reyes")
+
+
+def parse_size(text: str) -> int:
+    text = text.lower().replace("_", "")
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# --- Synthetic catalogs ------------------------------------------------------
+
+def synthetic_catalog(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """A catalog with the columns and value formats of data/imdb_cleaned.csv."""
+    rng = np.random.default_rng(seed)
+    words = np.array(_WORDS, dtype=object)
+    plot_words = np.array(_PLOT_WORDS, dtype=object)
+
+    lengths = rng.integers(1, 4, num_rows)
+    picks = rng.integers(0, len(words), (num_rows, 3))
+    titles = [" ".join(w.capitalize() for w in words[row[:n]]) for row, n in zip(picks, lengths)]
+    # Sequels keep most titles distinct at 1M rows, like "Title II" in the real data.
+    sequel = rng.integers(0, 40, num_rows)
+    titles = [f"{t} {s}" if s > 1 else t for t, s in zip(titles, sequel)]
+
+    def names(count):
+        first = rng.choice(_FIRST, (num_rows, count))
+        last = rng.choice(_LAST, (num_rows, count))
+        return ["".join(f"{a} {b}" for a, b in zip(f, l)) for f, l in zip(first, last)]
+
+    genres = rng.choice(_GENRES, num_rows)
+    directors = names(1)
+    casts = names(3)
+    plot_picks = rng.integers(0, len(plot_words), (num_rows, 12))
+    plots = [f"A {p[0]} {p[1]} a {p[2]} in a {p[3]} of {p[4]} and {p[5]}. Along the way the {p[6]} "
+             f"{p[7]} a {p[8]}, and a {p[9]} {p[10]} everything for {p[11]}." for p in plot_words[plot_picks]]
+    df = pd.DataFrame({
+        "Title": titles,
+        "IMDb Rating": np.round(rng.uniform(1.5, 9.5, num_rows), 1),
+        "Year": rng.integers(1920, 2025, num_rows),
+        "Certificates": rng.choice(_CERTIFICATES, num_rows),
+        "Genre": genres,
+        "Director": directors,
+        "Star Cast": casts,
+        "MetaScore": np.round(rng.uniform(10, 100, num_rows)),
+        "Poster-src": "https://m.media-amazon.com/images/M/synthetic.jpg",
+        "Duration (minutes)": rng.integers(70, 200, num_rows).astype(float),
+    })
+    df["embedding_text"] = ("Title: " + df["Title"] + "; Genre: " + df["Genre"] + "; Director: " + df["Director"]
+                            + "; Cast: " + df["Star Cast"])
+    df["Generated_Plot"] = plots
+    return df
+
+
+def prepare(size_dir: str, num_rows: int, dim: int, seed: int, index_type: str) -> None:
+    """Writes the catalog CSV, embedding store and FAISS index for one size, unless they already exist."""
+    marker = os.path.join(size_dir, "synthetic.json")
+    # "format" 2: the index carries the build metadata the retriever checks, so it isn't rebuilt on load.
+    spec = {"rows": num_rows, "dim": dim, "seed": seed, "index_type": index_type, "format": 2}
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == spec:
+                return
+
+    from benchmarks.ann_benchmark import synthetic_vectors
+    from storage.ann_index import build_index, index_path_for, write_index, write_index_meta
+    from storage.embedding_store import catalog_checksum, row_hashes, save_embeddings, save_row_hashes
+    from storage.vector_db import MODEL_NAME, embedding_texts
+
+    print(f"Generating a {num_rows:,}-row catalog in {size_dir}...", flush=True)
+    start = time.perf_counter()
+    os.makedirs(os.path.join(size_dir, "data"), exist_ok=True)
+    df = synthetic_catalog(num_rows, seed)
+    df.to_csv(os.path.join(size_dir, CSV_PATH), index=False)
+
+    # The store is keyed by the same texts and checksum the retriever computes, so it loads without re-encoding.
+    texts = embedding_texts(df)
+    vectors = synthetic_vectors(num_rows, dim, seed)
+    embedding_path = os.path.join(size_dir, EMBEDDING_PATH)
+    checksum, hashes = catalog_checksum(texts), row_hashes(texts)
+    save_embeddings(embedding_path, vectors, MODEL_NAME, checksum, hashes)
+    index_path = index_path_for(os.path.join(size_dir, INDEX_PATH), index_type)
+    write_index(build_index(vectors, index_type, ids=np.arange(num_rows)), index_path)
+    save_row_hashes(index_path, hashes)
+    write_index_meta(index_path, {"model_name": MODEL_NAME, "catalog_checksum": checksum, "rows": num_rows})
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    print(f"  done in {time.perf_counter() - start:.1f}s", flush=True)
+
+
+# --- Measurements (run inside a fresh process per catalog) -------------------
+
+def _timed(func: Callable, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def measure(func: Callable, inputs: List, threads: int) -> dict:
+    """Sequential latency over the first half of `inputs`, threaded throughput over the second half."""
+    half = len(inputs) // 2
+    for item in inputs[:3]:
+        func(item)
+    latencies = np.array([_timed(func, item) for item in inputs[:half]]) * 1000
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(func, inputs[half:]))
+    elapsed = time.perf_counter() - start
+    result = {f"p{p}_ms": round(float(np.percentile(latencies, p)), 3) for p in PERCENTILES}
+    result["mean_ms"] = round(float(latencies.mean()), 3)
+    result["throughput_qps"] = round((len(inputs) - half) / elapsed, 1)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def run_worker(num_queries: int, threads: int, seed: int) -> dict:
+    """Benchmarks the catalog in the current directory; imports happen here so load times are measured."""
+    logging.disable(logging.WARNING)
+    load = {}
+    baseline_rss = _rss_mb()
+
+    from storage.catalog import MovieCatalog, get_catalog, snapshot_path_for
+    if os.path.exists(snapshot_path_for(CSV_PATH)):
+        os.remove(snapshot_path_for(CSV_PATH))
+    load["csv_load_s"] = _timed(MovieCatalog.load, CSV_PATH)
+    start = time.perf_counter()
+    catalog = get_catalog(CSV_PATH, reload=True)
+    load["snapshot_load_s"] = time.perf_counter() - start
+    load["keyword_index_s"] = _timed(lambda: catalog.keyword_index)
+    load["title_index_s"] = _timed(lambda: catalog.title_index)
+
+    from storage.movie_data_access import get_rating_by_title, search_movies_by_keywords
+    from storage.vector_db import get_movie_retriever
+    from tools.movie_tools import recommend_movies
+    start = time.perf_counter()
+    retriever = get_movie_retriever()
+    load["retriever_init_s"] = time.perf_counter() - start
+    load = {name: round(seconds, 3) for name, seconds in load.items()}
+    memory = {"baseline_rss_mb": round(baseline_rss, 1), "rss_after_load_mb": round(_rss_mb(), 1),
+              "peak_rss_after_load_mb": round(_peak_rss_mb(), 1)}
+
+    rng = np.random.default_rng(seed)
+    titles = [str(t) for t in rng.choice(catalog.df["Title"].to_numpy(), num_queries)]
+    # Half exact (any case), half with one character dropped, so both title lookup paths run.
+    lookups = [t.lower() if i % 2 else (t[:len(t) // 2] + t[len(t) // 2 + 1:]) for i, t in enumerate(titles)]
+    keyword_queries = [f"{rng.choice(_GENRES)} {rng.choice(_PLOT_WORDS)} {rng.choice(_FIRST)}" for _ in range(num_queries)]
+    # Unique text per call, so every semantic search pays for its query encoding.
+    semantic_queries = [f"a {rng.choice(_PLOT_WORDS)} story about {rng.choice(_PLOT_WORDS)} #{i}" for i in range(num_queries)]
+
+    def personalized(request):
+        query, liked, disliked = request
+        return recommend_movies.__wrapped__(query, liked_movies=liked, disliked_movies=[disliked])
+
+    picks = rng.integers(0, len(titles), (num_queries, 3))
+    personalized_requests = [(f"{q} (personalized)", [titles[a], titles[b]], titles[c])
+                             for q, (a, b, c) in zip(semantic_queries, picks)]
+
+    functions = {
+        "search_movies_by_keywords": (search_movies_by_keywords, keyword_queries),
+        "get_rating_by_title": (get_rating_by_title, lookups),
+        "MovieRetriever.search": (retriever.search, semantic_queries),
+        "recommend_movies": (recommend_movies.__wrapped__, [q + " (plain)" for q in semantic_queries]),
+        "recommend_movies[personalized]": (personalized, personalized_requests),
+    }
+    results = {name: measure(func, inputs, threads) for name, (func, inputs) in functions.items()}
+    return {"rows": len(catalog), "load": load, "memory": memory, "functions": results}
+
+
+# --- Report ------------------------------------------------------------------
+
+def print_report(results: List[dict]) -> None:
+    sizes = [f"{r['rows']:,} rows" for r in results]
+    width = 22
+    print(f"\n{'load / memory':<34}" + "".join(f"{s:>{width}}" for s in sizes))
+    for key in results[0]["load"]:
+        print(f"  {key:<32}" + "".join(f"{r['load'][key]:>{width - 2}.3f} s" for r in results))
+    for key in results[0]["memory"]:
+        print(f"  {key:<32}" + "".join(f"{r['memory'][key]:>{width - 3}.1f} MB" for r in results))
+    for name in results[0]["functions"]:
+        print(f"\n{name:<34}" + "".join(f"{s:>{width}}" for s in sizes))
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_qps", "peak_rss_mb"):
+            print(f"  {key:<32}" + "".join(f"{r['functions'][name][key]:>{width}.3f}" for r in results))
+
+
+def _flatten(results: List[dict]) -> dict:
+    """{(rows, metric): (value, lower_is_better)} for every comparable number."""
+    flat = {}
+    for r in results:
+        for key, value in r["load"].items():
+            flat[(r["rows"], f"load {key}")] = (value, True)
+        flat[(r["rows"], "memory rss_after_load_mb")] = (r["memory"]["rss_after_load_mb"], True)
+        for name, metrics in r["functions"].items():
+            flat[(r["rows"], f"{name} p95_ms")] = (metrics["p95_ms"], True)
+            flat[(r["rows"], f"{name} throughput_qps")] = (metrics["throughput_qps"], False)
+    return flat
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Lines describing every metric that is worse than the baseline by more than `tolerance`."""
+    regressions = []
+    old = _flatten(baseline)
+    print("\nComparison with baseline:")
+    for key, (after, lower_is_better) in _flatten(results).items():
+        if key not in old or not old[key][0]:
+            continue
+        before = old[key][0]
+        change = (after - before) / before
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        print(f"  {key[0]:>9,} {key[1]:<50}{before:>12.3f} -> {after:>12.3f}  ({change:+.1%})"
+              f"{'  <-- regression' if worse else ''}")
+        if worse:
+            regressions.append(f"{key[0]:,} rows: {key[1]} {before:.3f} -> {after:.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m"], help="Catalog sizes, e.g. 10k 100k 1m.")
+    parser.add_argument("--queries", type=int, default=200, help="Calls per function (half latency, half throughput).")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for the throughput measurement.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (MiniLM-L12 is 384).")
+    parser.add_argument("--index-type", default=os.getenv("MARS_INDEX_TYPE", "flat"), help="FAISS backend (storage/ann_index.py).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "mars-retrieval-benchmark"),
+                        help="Where generated catalogs are kept between runs.")
+    parser.add_argument("--json", default="results/retrieval_benchmark.json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging a regression.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.queries, args.threads, args.seed)))
+        return
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    for size in map(parse_size, args.sizes):
+        size_dir = os.path.join(args.workdir, f"{size}-seed{args.seed}-{args.index_type}")
+        prepare(size_dir, size, args.dim, args.seed, args.index_type)
+        print(f"Benchmarking {size:,} rows...", flush=True)
+        # A fresh interpreter per size, so load times and peak RSS are not skewed by earlier sizes.
+        env = dict(os.environ, MARS_INDEX_TYPE=args.index_type,
+                   PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+        worker = subprocess.run(
+            [sys.executable, "-m", "benchmarks.retrieval_benchmark", "--worker", "--queries", str(args.queries),
+             "--threads", str(args.threads), "--seed", str(args.seed)],
+            cwd=size_dir, env=env, capture_output=True, text=True,
+        )
+        if worker.returncode != 0:
+            print(worker.stderr[-3000:], file=sys.stderr)
+            raise SystemExit(f"❌ Benchmark worker failed for {size:,} rows.")
+        results.append(json.loads(worker.stdout.strip().splitlines()[-1]))
+
+    print_report(results)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "index_type": args.index_type,
+                       "queries": args.queries, "threads": args.threads, "sizes": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["sizes"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Per-worker memory of the API under several worker processes.
+
+Starts `--workers` worker processes the way each serving mode would, lets
+every worker warm up and serve some retrieval traffic, then reads its
+memory from /proc/<pid>/smaps_rollup:
+
+    RSS  resident pages, counting shared pages in full for every process
+    USS  pages private to the worker (what adding one more worker costs)
+    PSS  resident pages with shared ones split between their users; the sum
+         over all processes is the real total
+
+Modes:
+
+    private  each worker imports main.py and loads everything itself
+             (uvicorn --workers N)
+    mmap     same, with the FAISS index memory-mapped (MARS_INDEX_MMAP=1)
+    preload  main.py is imported and `preload_for_fork` run once in a
+             master, and workers are forked from it (gunicorn.conf.py)
+
+Run from the repository root, or point `--catalog-dir` at a directory with
+data/, embeddings/ and vectorstore/, e.g. a synthetic catalog generated by
+benchmarks/retrieval_benchmark.py:
+
+    python -m benchmarks.worker_memory --workers 4
+    python -m benchmarks.worker_memory --workers 4 --catalog-dir /tmp/mars-retrieval-benchmark/100000-seed0-flat
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("private", "mmap", "preload")
+
+
+def memory_of(pid: int) -> dict:
+    """RSS, PSS and USS of a process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "uss_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def _serve(connection, num_queries: int) -> None:
+    """Worker body: warm up like main.py's startup hook, serve some lookups, then wait to be measured."""
+    logging.disable(logging.WARNING)
+    import main  # noqa: F401  (what a uvicorn worker imports)
+    from storage.movie_data_access import get_rating_by_title, search_movies_by_keywords
+    from storage.vector_db import get_search_batcher, warm_up_retriever
+
+    retriever = warm_up_retriever()
+    titles = [str(title) for title in retriever.catalog.df["Title"].head(num_queries)]
+    for i, title in enumerate(titles):
+        get_rating_by_title(title)
+        search_movies_by_keywords(title)
+        get_search_batcher().search(f"a movie like {title} #{i}")
+        retriever.personalized_search(f"something close to {title}", liked_ids=[i])
+    connection.send(os.getpid())
+    connection.recv()
+
+
+def run_mode(mode: str, workers: int, num_queries: int) -> dict:
+    """Starts the workers for one mode in this (fresh) process and measures them."""
+    logging.disable(logging.WARNING)
+    os.environ["MARS_INDEX_MMAP"] = "0" if mode == "private" else "1"
+    if mode == "preload":
+        import main  # noqa: F401
+        from storage.vector_db import preload_for_fork
+        preload_for_fork()
+        context = multiprocessing.get_context("fork")
+    else:
+        # uvicorn starts its workers with spawn: each imports the app from scratch.
+        context = multiprocessing.get_context("spawn")
+
+    pipes, processes = [], []
+    start = time.perf_counter()
+    for _ in range(workers):
+        parent_end, child_end = context.Pipe()
+        process = context.Process(target=_serve, args=(child_end, num_queries))
+        process.start()
+        pipes.append(parent_end)
+        processes.append(process)
+    pids = [pipe.recv() for pipe in pipes]
+    ready_s = time.perf_counter() - start
+
+    worker_memory = [memory_of(pid) for pid in pids]
+    master = memory_of(os.getpid())
+    for pipe in pipes:
+        pipe.send("stop")
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        return round(sum(m[key] for m in worker_memory) / len(worker_memory), 1)
+
+    # A spawning parent holds none of the app, so only the preload master counts towards the total.
+    total_pss = sum(m["pss_mb"] for m in worker_memory) + (master["pss_mb"] if mode == "preload" else 0.0)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "ready_s": round(ready_s, 2),
+        "worker_rss_mb": mean("rss_mb"),
+        "worker_pss_mb": mean("pss_mb"),
+        "worker_uss_mb": mean("uss_mb"),
+        "master": master if mode == "preload" else None,
+        "total_pss_mb": round(total_pss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--queries", type=int, default=50, help="Lookups per worker before measuring.")
+    parser.add_argument("--catalog-dir", default=".", help="Directory holding data/, embeddings/ and vectorstore/.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.workers, args.queries)))
+        return
+
+    results = []
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])),
+               TOKENIZERS_PARALLELISM="false",
+               MARS_SESSION_DB=os.path.join(tempfile.mkdtemp(prefix="mars-worker-memory-"), "sessions.db"))
+    for mode in args.modes:
+        print(f"Measuring {args.workers} workers in '{mode}' mode...", flush=True)
+        # Every mode runs in a fresh interpreter, so nothing loaded by one skews the next.
+        run = subprocess.run(
+            [sys.executable, "-m", "benchmarks.worker_memory", "--mode", mode, "--workers", str(args.workers),
+             "--queries", str(args.queries)],
+            cwd=args.catalog_dir, env=env, capture_output=True, text=True,
+        )
+        if run.returncode != 0:
+            print(run.stderr[-3000:], file=sys.stderr)
+            raise SystemExit(f"❌ '{mode}' run failed.")
+        results.append(json.loads(run.stdout.strip().splitlines()[-1]))
+
+    baseline = next((r["total_pss_mb"] for r in results if r["mode"] == "private"), None)
+    print(f"\n{'mode':<10}{'workers':>8}{'RSS/worker':>13}{'PSS/worker':>13}{'USS/worker':>13}"
+          f"{'master PSS':>13}{'total PSS':>12}{'vs private':>12}{'ready':>9}")
+    for r in results:
+        master = f"{r['master']['pss_mb']:.1f}" if r["master"] else "-"
+        saving = f"{r['total_pss_mb'] / baseline - 1:+.0%}" if baseline else "-"
+        print(f"{r['mode']:<10}{r['workers']:>8}{r['worker_rss_mb']:>13.1f}{r['worker_pss_mb']:>13.1f}"
+              f"{r['worker_uss_mb']:>13.1f}{master:>13}{r['total_pss_mb']:>12.1f}{saving:>12}{r['ready_s']:>8.1f}s")
+    print("(MB; RSS counts shared pages once per worker, PSS splits them, USS is private to each worker)")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "catalog_dir": os.path.abspath(args.catalog_dir),
+                       "queries": args.queries, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
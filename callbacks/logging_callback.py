@@ -1,14 +1,22 @@
 # callbacks/logging_callback.py
+import json
 import logging
-from typing import Optional
-
-# Import the necessary Callback and context classes from the ADK
-from google.adk.callbacks import (
-    Callback,
-    AgentInput,
-    AgentOutput,
-    ToolInput,
-    ToolOutput,
+import os
+import time
+from typing import Any, Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from observability.metrics import (
+    AGENT_SECONDS,
+    LLM_CALLS,
+    LLM_ERRORS,
+    LLM_SECONDS,
+    TOOL_ERRORS,
+    TOOL_RESULT_BYTES,
+    TOOL_SECONDS,
+    current_trace,
+    record_stage,
 )
 
 # Configure basic logging
@@ -17,50 +25,129 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-class ObservabilityCallback(Callback):
-    """A custom callback to log the inner workings of the agent system."""
-
-    def before_agent(self, agent_input: AgentInput) -> Optional[AgentInput]:
-        """Called before any agent (manager or sub-agent) starts execution."""
-        agent_name = agent_input.agent.name
-        user_id = agent_input.session.user_id
-        session_id = agent_input.session.id
-        
-        # Log the user's message only if it's the start of the chain (for the manager)
-        if agent_input.new_message:
-            message = agent_input.new_message.parts[0].text
-            logging.info(f"--- START [User: {user_id} | Session: {session_id}] ---")
-            logging.info(f"USER_MESSAGE: '{message}'")
-        
-        logging.info(f"AGENT_START: Running '{agent_name}'...")
-        return agent_input
-
-    def before_tool(self, tool_input: ToolInput) -> Optional[ToolInput]:
-        """Called before any tool is executed."""
-        tool_name = tool_input.tool.__name__
+# Tool payloads are logged as their size plus a preview this long; the full
+# payload is only logged at DEBUG level.
+LOG_PREVIEW_CHARS = int(os.getenv("MARS_LOG_PREVIEW_CHARS", "200"))
+
+
+def _payload(value: Any) -> str:
+    try:
+        return json.dumps(value, default=str, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _preview(text: str) -> str:
+    return text if len(text) <= LOG_PREVIEW_CHARS else f"{text[:LOG_PREVIEW_CHARS]}... ({len(text)} chars)"
+
+
+class ObservabilityCallback(BasePlugin):
+    """
+    ADK plugin that logs the inner workings of the agent system and records
+    timing spans per run, agent, LLM call and tool (see observability/metrics.py).
+    Register it with the `Runner` via `plugins=[...]`; `AgentTool` passes it on
+    to sub-agent runs, so the critic's spans are recorded too.
+    """
+
+    def __init__(self, name: str = "observability"):
+        super().__init__(name)
+        # Start times of open spans. Keys include the invocation id, so
+        # concurrent requests never share a span.
+        self._started: dict = {}
+        self._models: dict = {}
+
+    def _start(self, key) -> None:
+        self._started[key] = time.perf_counter()
+
+    def _stop(self, key) -> Optional[float]:
+        start = self._started.pop(key, None)
+        return None if start is None else time.perf_counter() - start
+
+    async def before_run_callback(self, *, invocation_context) -> None:
+        self._start(("run", invocation_context.invocation_id))
+        message = invocation_context.user_content
+        text = message.parts[0].text if message and message.parts and message.parts[0].text else ""
+        logging.info(f"--- START [User: {invocation_context.user_id} | Session: {invocation_context.session.id} | "
+                     f"Invocation: {invocation_context.invocation_id}] ---")
+        logging.info(f"USER_MESSAGE: '{_preview(text)}'")
+        return None
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        elapsed = self._stop(("run", invocation_context.invocation_id))
+        trace = current_trace()
+        logging.info(f"--- END [User: {invocation_context.user_id} | Session: {invocation_context.session.id}] "
+                     f"in {elapsed or 0:.3f}s{f' | {trace.llm_calls} LLM calls so far' if trace else ''} ---")
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        self._start(("agent", callback_context.invocation_id, agent.name))
+        logging.info(f"AGENT_START: Running '{agent.name}'...")
+        return None
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        elapsed = self._stop(("agent", callback_context.invocation_id, agent.name))
+        if elapsed is not None:
+            AGENT_SECONDS.observe(elapsed, agent=agent.name)
+            record_stage(f"agent:{agent.name}", elapsed)
+        logging.info(f"AGENT_END: '{agent.name}' finished in {elapsed or 0:.3f}s.")
+        return None
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        key = ("model", callback_context.invocation_id, callback_context.agent_name)
+        self._start(key)
+        self._models[key] = llm_request.model
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        # In streaming mode this fires per chunk; the call ends with the first non-partial response.
+        if llm_response.partial:
+            return None
+        key = ("model", callback_context.invocation_id, callback_context.agent_name)
+        elapsed = self._stop(key)
+        model = self._models.pop(key, None) or llm_response.model_version or "unknown"
+        if elapsed is None:
+            return None
+        agent_name = callback_context.agent_name
+        LLM_SECONDS.observe(elapsed, agent=agent_name, model=model)
+        LLM_CALLS.inc(agent=agent_name, model=model)
+        record_stage(f"llm:{agent_name}", elapsed)
+        trace = current_trace()
+        if trace is not None:
+            trace.count_llm_call()
+        usage = llm_response.usage_metadata
+        tokens = f", {usage.prompt_token_count} in / {usage.candidates_token_count} out tokens" if usage else ""
+        logging.info(f"  LLM_CALL: '{agent_name}' got a response in {elapsed:.3f}s{tokens}.")
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        key = ("model", callback_context.invocation_id, callback_context.agent_name)
+        self._stop(key)
+        self._models.pop(key, None)
+        LLM_ERRORS.inc(agent=callback_context.agent_name)
+        logging.error(f"❌ LLM call for '{callback_context.agent_name}' failed: {error}")
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        self._start(("tool", tool_context.function_call_id))
         # Log parameters, but exclude the large tool_context object for cleaner logs
-        params = {k: v for k, v in tool_input.params.items() if k != "tool_context"}
-        
-        logging.info(f"  TOOL_CALL: Agent is calling '{tool_name}' with params: {params}")
-        return tool_input
-
-    def after_tool(self, tool_output: ToolOutput) -> Optional[ToolOutput]:
-        """Called after any tool finishes execution."""
-        tool_name = tool_output.input.tool.__name__
-        result = tool_output.result
-        
-        logging.info(f"  TOOL_RESULT: '{tool_name}' returned: {result}")
-        return tool_output
-
-    def after_agent(self, agent_output: AgentOutput) -> Optional[AgentOutput]:
-        """Called after any agent (manager or sub-agent) finishes execution."""
-        agent_name = agent_output.agent.name
-        final_response = agent_output.content.text if agent_output.is_final_response() and agent_output.content else "'' (No final text response)"
-        
-        logging.info(f"AGENT_END: '{agent_name}' finished.")
-        
-        # Log the final response only if it's the end of the entire chain
-        if agent_output.is_final_response():
-            logging.info(f"FINAL_RESPONSE: '{final_response}'")
-            logging.info(f"--- END [User: {agent_output.session.user_id} | Session: {agent_output.session.id}] ---\n")
-        return agent_output
\ No newline at end of file
+        params = {k: v for k, v in tool_args.items() if k != "tool_context"}
+        logging.info(f"  TOOL_CALL: Agent is calling '{tool.name}' with params: {_preview(_payload(params))}")
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        elapsed = self._stop(("tool", tool_context.function_call_id)) or 0.0
+        TOOL_SECONDS.observe(elapsed, tool=tool.name)
+        record_stage(f"tool:{tool.name}", elapsed)
+        # Recommendation payloads can be large: log their size and a preview, not the whole result.
+        payload = _payload(result)
+        TOOL_RESULT_BYTES.observe(len(payload.encode("utf-8")), tool=tool.name)
+        logging.info(f"  TOOL_RESULT: '{tool.name}' returned {len(payload)} chars in {elapsed:.3f}s: {_preview(payload)}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"  TOOL_RESULT_FULL: '{tool.name}': {payload}")
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        elapsed = self._stop(("tool", tool_context.function_call_id)) or 0.0
+        TOOL_SECONDS.observe(elapsed, tool=tool.name)
+        TOOL_ERRORS.inc(tool=tool.name)
+        logging.error(f"❌ Tool '{tool.name}' failed after {elapsed:.3f}s: {error}")
+        return None
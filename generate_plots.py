@@ -1,55 +1,37 @@
-import pandas as pd
-import google.generativeai as genai
-import os
-import time
+"""
+Generates a plot summary for every movie in the catalog that lacks one.
+
+Calls run concurrently on an async worker pool behind a token-bucket rate
+limit, with retries and backoff. Each finished plot is appended to a
+checkpoint log next to the CSV, so an interrupted run resumes where it
+stopped; the CSV itself is rewritten once, atomically, at the end.
+
+    python generate_plots.py --concurrency 8 --rate 2
+    python generate_plots.py --client fake --fake-latency 0.05   # offline, no API key
+"""
+import argparse
+import asyncio
 import logging
+import os
+import random
 
+import pandas as pd
 from dotenv import load_dotenv
 
-load_dotenv()
+from pipelines.batch import JsonlCheckpoint, TokenBucket, run_batch
+from storage.catalog import movie_id
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Configure the Gemini API key
-try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY environment variable not set.")
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    logging.info("Gemini model configured successfully.")
-except Exception as e:
-    logging.error(f"Failed to configure Gemini model: {e}. "
-                  "Please ensure GEMINI_API_KEY environment variable is set correctly.")
-    exit()
-
-# --- IMPORTANT CHANGE HERE ---
-# The script will now read from and overwrite this file.
-DATA_FILE_PATH = "data/imdb_cleaned.csv" 
-
-# Load your existing data
-try:
-    df = pd.read_csv(DATA_FILE_PATH)
-    logging.info(f"Loaded {len(df)} movies from {DATA_FILE_PATH}")
-except FileNotFoundError:
-    logging.error(f"Error: {DATA_FILE_PATH} not found. Please check the path.")
-    exit()
-
-# Add a new 'Generated_Plot' column if it doesn't exist, initialized to None
-# If it exists, existing plots will be overwritten for movies that don't have a valid plot.
-if 'Generated_Plot' not in df.columns:
-    df['Generated_Plot'] = None
-    logging.info("Added 'Generated_Plot' column to DataFrame.")
-else:
-    logging.info("'Generated_Plot' column already exists. Checking for missing/error plots to re-generate.")
-
-
-# --- Function to generate plot for a single movie ---
-def generate_movie_plot(title, year, genre, director, star_cast):
-    """
-    Generates a concise plot summary using the Gemini LLM.
-    """
-    prompt = (
+# The script reads from and overwrites this file.
+DATA_FILE_PATH = "data/imdb_cleaned.csv"
+
+# Markers written by earlier versions of this script for failed generations.
+FAILED_PLOTS = ("No plot generated.", "Error generating plot.")
+
+
+def build_prompt(title, year, genre, director, star_cast) -> str:
+    return (
         f"Generate a concise, engaging plot summary (around 3-5 sentences) for a movie with the following details:\n"
         f"Title: {title}\n"
         f"Year: {year}\n"
@@ -59,46 +41,157 @@ def generate_movie_plot(title, year, genre, director, star_cast):
         f"Ensure the plot captures the main premise and avoids excessive detail. Do not include release year or cast names in the plot."
     )
 
+
+class GeminiPlotClient:
+    """Generates plots with Gemini through the async google-genai client."""
+
+    def __init__(self, model: str = "gemini-1.5-flash"):
+        from google import genai
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable not set.")
+        self.model = model
+        self.client = genai.Client(api_key=api_key)
+        logging.info("Gemini model configured successfully.")
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+        return response.text or ""
+
+
+class FakePlotClient:
+    """
+    Offline stand-in for the model: returns a canned plot after `latency`
+    seconds and fails a `failure_rate` share of calls, to exercise the
+    concurrency, retry and resume paths without an API key.
+    """
+
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("simulated API error")
+        title = prompt.split("Title: ", 1)[1].split("\n", 1)[0]
+        return f"A placeholder plot for {title}, generated offline."
+
+
+def _value(row, column):
+    value = row.get(column)
+    return "N/A" if pd.isna(value) else value
+
+
+def pending_rows(df: pd.DataFrame) -> pd.Index:
+    """Rows with a title and no usable plot (missing, or a failure marker from an earlier run)."""
+    plots = df["Generated_Plot"]
+    return df.index[df["Title"].notna() & (plots.isna() | plots.isin(FAILED_PLOTS))]
+
+
+async def generate_plots(df: pd.DataFrame, client, checkpoint: JsonlCheckpoint, concurrency: int, rate: float,
+                         burst: int, max_retries: int, limit=None):
+    """Fills `Generated_Plot` for pending rows, resuming from `checkpoint`. Returns the batch stats."""
+    # Progress is keyed by stable movie id, so a checkpoint stays valid if rows move.
+    years = df["Year"] if "Year" in df.columns else [None] * len(df)
+    keys = pd.Series([movie_id(t, y) for t, y in zip(df["Title"], years)], index=df.index)
+
+    done = checkpoint.load()
+    rows = pending_rows(df)
+    resumed = 0
+    for row in rows:
+        plot = done.get(int(keys[row]))
+        if plot:
+            df.at[row, "Generated_Plot"] = plot
+            resumed += 1
+    rows = pending_rows(df)
+    if limit is not None:
+        rows = rows[:limit]
+    logging.info(f"{resumed} plots restored from {checkpoint.path}; {len(rows)} movies left to generate.")
+
+    async def process(row):
+        record = df.loc[row]
+        prompt = build_prompt(record["Title"], _value(record, "Year"), _value(record, "Genre"),
+                              _value(record, "Director"), _value(record, "Star Cast"))
+        plot = (await client.generate(prompt)).strip()
+        return plot or None
+
+    def on_result(row, plot):
+        df.at[row, "Generated_Plot"] = plot
+        checkpoint.append(int(keys[row]), plot)
+
     try:
-        response = model.generate_content(prompt)
-        generated_plot = response.text
-        if generated_plot:
-            return generated_plot.strip()
-        else:
-            return "No plot generated."
+        return await run_batch(rows, process, on_result, concurrency=concurrency,
+                               rate_limiter=TokenBucket(rate, burst) if rate > 0 else None, max_retries=max_retries)
+    finally:
+        checkpoint.flush()
+
+
+def save_atomically(df: pd.DataFrame, path: str) -> None:
+    """Writes to a temp file and renames it, so readers never see a half-written CSV."""
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DATA_FILE_PATH)
+    parser.add_argument("--client", choices=("gemini", "fake"), default="gemini")
+    parser.add_argument("--model", default="gemini-1.5-flash")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum API calls in flight.")
+    parser.add_argument("--rate", type=float, default=2.0, help="Average API calls per second (0 = unlimited).")
+    parser.add_argument("--burst", type=int, default=4, help="Calls allowed back to back before --rate applies.")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Flush the checkpoint log every N plots.")
+    parser.add_argument("--limit", type=int, default=None, help="Generate at most this many plots in this run.")
+    parser.add_argument("--fake-latency", type=float, default=0.05)
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        client = (FakePlotClient(args.fake_latency, args.fake_failure_rate) if args.client == "fake"
+                  else GeminiPlotClient(args.model))
     except Exception as e:
-        logging.error(f"Error during Gemini API call for '{title}': {e}")
-        return "Error generating plot."
-
-# --- Iterate through each movie and generate/update plot ---
-logging.info("Starting plot generation process...")
-for index, row in df.iterrows():
-    title = row['Title']
-    year = row.get('Year', 'N/A')
-    genre = row.get('Genre', 'N/A')
-    director = row.get('Director', 'N/A')
-    star_cast = row.get('Star Cast', 'N/A')
-    
-    # Get the current value of 'Generated_Plot' for this row
-    current_plot = row.get('Generated_Plot')
-
-    if pd.isna(title):
-        logging.warning(f"Skipping row {index}: Missing title.")
-        continue
-    
-    # Generate plot only if it's missing or marked as an error from a previous run
-    if pd.isna(current_plot) or current_plot == "No plot generated." or current_plot == "Error generating plot.":
-        logging.info(f"Generating plot for: {title}...")
-        plot = generate_movie_plot(title, year, genre, director, star_cast)
-        df.at[index, 'Generated_Plot'] = plot
-        # Add a delay to respect API rate limits
-        time.sleep(0.5) # Adjust this delay if you face rate limit errors
-    else:
-        logging.debug(f"Plot already exists and is valid for: {title}. Skipping generation.")
-
-# --- Save the updated DataFrame back to the original CSV ---
-try:
-    df.to_csv(DATA_FILE_PATH, index=False)
-    logging.info(f"\n✅ Updated data with generated plots saved successfully to {DATA_FILE_PATH}")
-except Exception as e:
-    logging.error(f"❌ Failed to save updated data to {DATA_FILE_PATH}: {e}")
\ No newline at end of file
+        logging.error(f"Failed to configure Gemini model: {e}. "
+                      "Please ensure GOOGLE_API_KEY environment variable is set correctly.")
+        raise SystemExit(1)
+
+    # Load your existing data
+    try:
+        df = pd.read_csv(args.csv)
+        logging.info(f"Loaded {len(df)} movies from {args.csv}")
+    except FileNotFoundError:
+        logging.error(f"Error: {args.csv} not found. Please check the path.")
+        raise SystemExit(1)
+
+    if 'Generated_Plot' not in df.columns:
+        df['Generated_Plot'] = None
+        logging.info("Added 'Generated_Plot' column to DataFrame.")
+    df['Generated_Plot'] = df['Generated_Plot'].astype(object)
+
+    checkpoint = JsonlCheckpoint(os.path.splitext(args.csv)[0] + ".plots.jsonl", flush_every=args.checkpoint_every)
+    logging.info("Starting plot generation process...")
+    try:
+        stats = asyncio.run(generate_plots(df, client, checkpoint, args.concurrency, args.rate, args.burst,
+                                           args.max_retries, args.limit))
+    except KeyboardInterrupt:
+        logging.warning(f"⚠️ Interrupted. Finished plots are saved in {checkpoint.path}; run again to resume.")
+        raise SystemExit(130)
+
+    # --- Save the updated DataFrame back to the original CSV ---
+    try:
+        save_atomically(df, args.csv)
+        logging.info(f"✅ Updated data with generated plots saved successfully to {args.csv}")
+    except Exception as e:
+        logging.error(f"❌ Failed to save updated data to {args.csv}: {e}")
+        raise SystemExit(1)
+    # Every finished plot is now in the CSV; failed rows stay pending for the next run.
+    checkpoint.remove()
+    logging.info(f"Throughput: {stats.throughput:.2f} plots/s over {stats.elapsed:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
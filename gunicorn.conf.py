@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for serving main:app on several worker processes that
+share one copy of the catalog, the embedding model and the FAISS index.
+
+    gunicorn -c gunicorn.conf.py main:app
+    WEB_CONCURRENCY=8 gunicorn -c gunicorn.conf.py main:app
+
+The app is imported and the retriever loaded once in the master
+(`preload_for_fork` in storage/vector_db.py); workers are forked from it and
+share those pages copy-on-write. The index is also memory-mapped from its
+file, so even without preloading (MARS_PRELOAD=0), or with plain
+`uvicorn --workers N`, flat and HNSW vectors live once in the page cache.
+See benchmarks/worker_memory.py for per-worker RSS/PSS measurements.
+"""
+import os
+
+bind = os.getenv("MARS_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers only answer /ready once warm (see main.py); allow for slow first loads.
+timeout = int(os.getenv("MARS_WORKER_TIMEOUT", "120"))
+preload_app = os.getenv("MARS_PRELOAD", "1") != "0"
+
+# Read by storage/vector_db.py when the app is imported, which happens after this file.
+os.environ.setdefault("MARS_INDEX_MMAP", "1")
+# HF tokenizers disable their thread pool after a fork anyway; say so up front instead of warning per worker.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def on_starting(server):
+    # With preload_app the master has already imported main:app at this point.
+    if preload_app:
+        from storage.vector_db import preload_for_fork
+        preload_for_fork()
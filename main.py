@@ -1,6 +1,14 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
 import uuid
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
 from google.adk.runners import Runner
 from google.genai import types
 import os
@@ -8,18 +16,25 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from callbacks.logging_callback import ObservabilityCallback
 from manager_agent.agent import root_agent
+from manager_agent.fast_path import fast_path_stats, try_fast_path
+from observability.metrics import LLM_CALLS_PER_TURN, REQUEST_SECONDS, RequestTrace, render_metrics, use_trace
 from storage.session_service import PersistentSessionService
+from storage.vector_db import is_retriever_ready, warm_up_retriever
+from tools.executor import TOOL_EXECUTOR
 
 # --- Application Setup ---
 app = FastAPI(title="Movie Chatbot API")
 session_service = PersistentSessionService()
 
-# The runner is now clean, with no reference to callbacks
+# The observability plugin logs and times every agent, LLM call and tool,
+# including those of sub-agents run through AgentTool.
 runner = Runner(
     agent=root_agent,
     app_name="MovieChatbot",
-    session_service=session_service
+    session_service=session_service,
+    plugins=[ObservabilityCallback()],
 )
 
 # --- API Data Models ---
@@ -32,19 +47,155 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
 
+# --- Startup / Readiness ---
+_warm_up_task = None
+
+@app.on_event("startup")
+async def warm_up():
+    """
+    Loads the embedding model and FAISS index in the background so the
+    worker starts accepting connections (and passing liveness checks)
+    immediately, while `/ready` reports 503 until the retriever is warm.
+    """
+    global _warm_up_task
+    _warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up_retriever))
+    _warm_up_task.add_done_callback(_log_warm_up_failure)
+
+@app.on_event("shutdown")
+async def close_sessions():
+    """Writes any session updates still waiting in the write-behind buffer."""
+    await session_service.close()
+
+def _log_warm_up_failure(task):
+    if not task.cancelled() and task.exception():
+        logging.error(f"❌ Retriever warm-up failed: {task.exception()}")
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    if is_retriever_ready():
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": "warming_up"})
+
+@app.get("/stats/fast-path")
+def fast_path_statistics():
+    """How many chats the fast path answered without the LLM agents, and why the others fell back."""
+    return fast_path_stats.snapshot()
+
+@app.get("/metrics")
+def metrics():
+    """Latency histograms and counters in the Prometheus text format (per worker process)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def _finish_trace(trace: RequestTrace, endpoint: str, route: str) -> None:
+    """Records a finished chat request's latency and logs its per-stage breakdown."""
+    REQUEST_SECONDS.observe(trace.elapsed, endpoint=endpoint, route=route)
+    if route == "agent":
+        LLM_CALLS_PER_TURN.observe(trace.llm_calls)
+    logging.info(f"REQUEST_DONE: {json.dumps({'endpoint': endpoint, 'route': route, **trace.summary()})}")
+
+# --- Fast Path ---
+async def _answer_fast_path(session, message: types.Content) -> str:
+    """
+    Answers simple rating/plot lookups from the catalog without any LLM call
+    (see manager_agent/fast_path.py). The exchange is recorded in the session
+    so the agents still see it on later turns. Returns "" if the message
+    needs the agent tree.
+    """
+    # Run in a copy of this context so the lookups are recorded in the request trace.
+    lookup = functools.partial(contextvars.copy_context().run, try_fast_path, message.parts[0].text)
+    answer = await asyncio.get_running_loop().run_in_executor(TOOL_EXECUTOR, lookup)
+    if answer is None:
+        return ""
+    invocation_id = f"e-{uuid.uuid4()}"
+    await session_service.append_event(session, Event(invocation_id=invocation_id, author="user", content=message))
+    reply = types.Content(role="model", parts=[types.Part(text=answer.text)])
+    await session_service.append_event(session, Event(invocation_id=invocation_id, author=root_agent.name, content=reply))
+    return answer.text
+
 # --- API Endpoint ---
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
-    await session_service.create_session("MovieChatbot", request.user_id, request.session_id)
-    message = types.Content(role="user", parts=[types.Part(text=request.message)])
-    final_response = ""
+    with use_trace(RequestTrace()) as trace:
+        session = await session_service.create_session("MovieChatbot", request.user_id, request.session_id)
+        message = types.Content(role="user", parts=[types.Part(text=request.message)])
+        final_response = await _answer_fast_path(session, message)
+        if final_response:
+            _finish_trace(trace, "chat", "fast_path")
+            return ChatResponse(response=final_response, session_id=request.session_id)
+
+        # The async event stream keeps LLM round-trips off the event loop; CPU-heavy
+        # tools run on their own bounded pool (see tools/executor.py).
+        async for event in runner.run_async(user_id=request.user_id, session_id=request.session_id, new_message=message):
+            if event.is_final_response() and event.content:
+                final_response = event.content.parts[0].text
+
+        _finish_trace(trace, "chat", "agent")
+        return ChatResponse(response=final_response, session_id=request.session_id)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_text(event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text)
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events version of /chat. Emits, as the runner produces them:
+      - `tool`:  {"name": ...} when an agent calls a tool or specialist
+      - `token`: {"text": ...} incremental chunks of the model's answer
+      - `done`:  {"response": ..., "session_id": ...} with the full answer
+    """
+    trace = RequestTrace()
+    with use_trace(trace):
+        session = await session_service.create_session("MovieChatbot", request.user_id, request.session_id)
+        message = types.Content(role="user", parts=[types.Part(text=request.message)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+        fast_response = await _answer_fast_path(session, message)
 
-    for event in runner.run(user_id=request.user_id, session_id=request.session_id, new_message=message):
-        if event.is_final_response() and event.content:
-            final_response = event.content.parts[0].text
-            break
+    async def event_stream():
+        if fast_response:
+            _finish_trace(trace, "chat_stream", "fast_path")
+            yield _sse("token", {"text": fast_response})
+            yield _sse("done", {"response": fast_response, "session_id": request.session_id})
+            return
+        streamed = ""
+        final_response = ""
+        # The generator runs in the response's own context, so make the trace current here too.
+        with use_trace(trace):
+            try:
+                async for event in runner.run_async(user_id=request.user_id, session_id=request.session_id,
+                                                    new_message=message, run_config=run_config):
+                    for call in event.get_function_calls():
+                        yield _sse("tool", {"name": call.name})
+                    text = _event_text(event)
+                    if event.partial:
+                        if text:
+                            streamed += text
+                            yield _sse("token", {"text": text})
+                        continue
+                    if event.is_final_response() and text:
+                        # The closing event repeats the turn's aggregated text; only send what wasn't streamed yet.
+                        final_response = text
+                        remainder = text[len(streamed):] if text.startswith(streamed) else text
+                        if remainder:
+                            yield _sse("token", {"text": remainder})
+                    # Any non-partial event closes the model turn that the partial chunks belonged to.
+                    streamed = ""
+            except Exception as e:
+                logging.error(f"❌ Streaming chat failed: {e}")
+                yield _sse("error", {"message": "The assistant failed to respond."})
+                return
+        _finish_trace(trace, "chat_stream", "agent")
+        yield _sse("done", {"response": final_response, "session_id": request.session_id})
 
-    return ChatResponse(response=final_response, session_id=request.session_id)
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/")
 def read_root():
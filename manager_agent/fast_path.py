@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from observability.metrics import FAST_PATH_REQUESTS
+from storage.catalog import get_catalog
+from tools.movie_tools import get_movie_rating
+
+# Rule-based pre-router for single-movie rating and plot questions. A hit
+# answers straight from the catalog tools with a templated reply, skipping
+# the manager LLM and the sub-agent LLM. Anything ambiguous goes to the
+# agent tree as before.
+FAST_PATH_ENABLED = os.getenv("MARS_FAST_PATH", "1") != "0"
+MIN_CONFIDENCE = float(os.getenv("MARS_FAST_PATH_MIN_CONFIDENCE", "0.9"))
+
+# A quote opens after a non-letter and closes before one, so the apostrophes
+# in "What's" or "Schindler's List" don't end a quoted title.
+_QUOTED_TITLE = re.compile(r"(?<![A-Za-z])['\"“‘](.+?)['\"”’](?![A-Za-z])")
+_RATING_WORDS = re.compile(r"\b(rating|rated|imdb score|score)\b")
+_PLOT_WORDS = re.compile(r"\b(plot|synopsis|storyline|summary|about)\b")
+# Anything hinting at preferences, recommendations, people or several asks.
+_AGENT_WORDS = re.compile(
+    r"\b(recommend\w*|suggest\w*|similar|watch|lov\w+|hat\w+|like[sd]?|enjoy\w*|favou?rite|save|remember|profile|"
+    r"compare|versus|vs|better|worse|cast|actors?|actress\w*|director|who|when|why|and|or|also|my)\b"
+)
+_UNQUOTED_TITLE = {
+    "rating": [
+        re.compile(r"\b(?:rating|score)\s+(?:for|of)\s+(?P<title>.+?)\s*[?.!]*$"),
+        re.compile(r"^(?:what(?:'s| is)|how (?:good|well) is)\s+(?P<title>.+?)\s+(?:rated|(?:imdb\s+)?rating)\s*[?.!]*$"),
+    ],
+    "plot": [
+        re.compile(r"\b(?:plot|synopsis|storyline|summary)\s+(?:of|for)\s+(?P<title>.+?)\s*[?.!]*$"),
+        re.compile(r"^what(?:'s| is)\s+(?P<title>.+?)\s+about\s*[?.!]*$"),
+    ],
+}
+_TITLE_PREFIX = re.compile(r"^(?:the\s+)?(?:movie|film)\s+")
+_NO_PLOT = {"", "no plot generated.", "error generating plot.", "no plot available.", "nan"}
+
+
+@dataclass
+class FastPathAnswer:
+    intent: str
+    title: str
+    confidence: float
+    text: str
+
+
+class FastPathStats:
+    """Thread-safe counters of how much traffic the fast path answered, and why the rest fell back."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.handled = Counter()
+        self.fallbacks = Counter()
+
+    def record(self, intent: Optional[str] = None, fallback_reason: Optional[str] = None) -> None:
+        with self._lock:
+            self.total += 1
+            if intent is not None:
+                self.handled[intent] += 1
+            else:
+                self.fallbacks[fallback_reason or "unknown"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            handled = sum(self.handled.values())
+            return {
+                "total": self.total,
+                "fast_path": handled,
+                "fast_path_ratio": round(handled / self.total, 4) if self.total else 0.0,
+                "handled_by_intent": dict(self.handled),
+                "fallback_reasons": dict(self.fallbacks),
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+def classify(message: str) -> tuple:
+    """
+    Returns (intent, title, reason): intent is "rating" or "plot" with the
+    raw title text, or None with the reason this message needs the agents.
+    """
+    text = " ".join(message.strip().split())
+    quoted = _QUOTED_TITLE.findall(text)
+    if len(quoted) > 1:
+        return None, None, "several_titles"
+    title = quoted[0].strip() if quoted else None
+    # Intent words are matched outside the title, so "The Plot Against
+    # America" is not a plot question.
+    rest = (text.replace(quoted[0], " ") if quoted else text).lower()
+
+    if _AGENT_WORDS.search(rest if title else text.lower()):
+        return None, None, "needs_agent"
+    intents = [name for name, words in (("rating", _RATING_WORDS), ("plot", _PLOT_WORDS)) if words.search(rest)]
+    if len(intents) != 1:
+        return None, None, "no_intent" if not intents else "ambiguous_intent"
+    intent = intents[0]
+
+    if title is None:
+        for pattern in _UNQUOTED_TITLE[intent]:
+            match = pattern.search(text.lower())
+            if match:
+                # Take the title from the original message to keep its casing.
+                title = text[match.start("title"):match.end("title")]
+                break
+    if title:
+        title = _TITLE_PREFIX.sub("", title.strip(" ?.!"))
+    # "What's the rating?" leaves only an article where the title would be.
+    if not title or title.lower() in ("the", "a", "an"):
+        return None, None, "no_title"
+    return intent, title, None
+
+
+def _answer_rating(title: str) -> Optional[FastPathAnswer]:
+    info = get_movie_rating.__wrapped__(title)
+    rating, confidence = info.get("rating"), info.get("match_confidence") or 0.0
+    if info.get("matched_title") is None or confidence < MIN_CONFIDENCE or str(rating) in ("nan", "N/A", "Not Found"):
+        return None
+    text = f"**{info['matched_title']}** has an IMDb rating of **{rating}/10**."
+    return FastPathAnswer("rating", info["matched_title"], confidence, text)
+
+
+def _answer_plot(title: str) -> Optional[FastPathAnswer]:
+    catalog = get_catalog()
+    match = catalog.title_index.lookup(title) if not catalog.empty else None
+    if match is None or match[1] < MIN_CONFIDENCE:
+        return None
+    record = catalog.records[match[0]]
+    matched_title = str(record["Title"])
+    plot = str(record.get("Generated_Plot") or "").strip()
+    if plot.lower() in _NO_PLOT:
+        return None
+    return FastPathAnswer("plot", matched_title, match[1], f"Here's the plot of **{matched_title}**:\n\n{plot}")
+
+
+def try_fast_path(message: str) -> Optional[FastPathAnswer]:
+    """
+    Answers `message` without the LLMs if it is a confident single-movie
+    rating or plot lookup; otherwise returns None. Runs catalog lookups, so
+    call it off the event loop. Every call is counted in `fast_path_stats`.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    intent, title, reason = classify(message)
+    answer = None
+    if intent is not None:
+        try:
+            answer = _answer_rating(title) if intent == "rating" else _answer_plot(title)
+        except Exception as e:
+            logging.error(f"❌ Fast path failed for '{message}': {e}")
+        reason = "low_confidence"
+    fast_path_stats.record(intent=answer.intent if answer else None, fallback_reason=reason)
+    FAST_PATH_REQUESTS.inc(result=answer.intent if answer else f"fallback_{reason}")
+    if answer is not None:
+        logging.info(f"FAST PATH: answered {answer.intent} for '{answer.title}' (confidence {answer.confidence:.2f}).")
+    return answer
@@ -1,10 +1,11 @@
 from google.adk.agents import Agent
-from google.adk.cli.agent_graph import AgentTool
 import json
 from ..critic_agent.agent import critic_agent
-from tools.movie_tools import recommend_movies
+from tools.critic_tool import CachedCriticTool
+from tools.movie_tools import recommend_by_theme, recommend_movies
 
-critic_tool = AgentTool(agent=critic_agent)
+# Analyses are cached on disk by movie, so repeat titles skip the critic LLM call.
+critic_tool = CachedCriticTool(agent=critic_agent)
 
 recommender_agent = Agent(
     name="recommender_agent",
@@ -15,14 +16,17 @@ recommender_agent = Agent(
     **Your Process (Chain-of-Thought):**
     1.  Examine the user's profile at `{user_profile}`. If their `liked_movies` list is not empty, pick the MOST RECENTLY liked movie from the list.
     2.  If the user mentions a movie in their prompt (e.g., "like Inception"), use that movie title instead.
-    3.  You MUST call the `critic_agent` tool with this movie title. The critic will return a JSON string with a deep analysis.
+    3.  First call the `recommend_by_theme` tool with this movie title (add its year in parentheses when you know it, e.g. "Dune (2021)", so remakes are told apart). If it returns `"status": "success"`, its `analysis` is the critic's analysis and its `recommendations` are your recommendations: skip to step 6.
+        Otherwise, you MUST call the `critic_agent` tool with this movie title. The critic will return a JSON string with a deep analysis.
     4.  Parse the JSON string from the critic's response. Take the value of the "summary" key.
     5.  Use this rich, thematic summary as the `base_query` for the `recommend_movies` tool. You **MUST** use the `recommend_movies` tool to get the actual movie recommendations.
-    6.  **For each recommended movie returned by the `recommend_movies` tool, you MUST extract its 'title' and 'plot' fields exactly as they are provided by the tool.**
-    7.  Present the recommendations to the user. For each movie, display its title and then its plot summary. Explain briefly WHY these specific movies were chosen (e.g., "Since you liked Parasite, a film about class conflict, you might enjoy..."). **ABSOLUTELY DO NOT INVENT, ALTER, OR HALLUCINATE ANY MOVIE TITLES OR PLOTS. ONLY USE THE DATA PROVIDED BY THE `recommend_movies` TOOL.** If the tool does not provide enough information for a movie, state "No plot available for this recommendation."
+    6.  **For each recommended movie returned by the `recommend_movies` (or `recommend_by_theme`) tool, you MUST extract its 'title' and 'plot' fields exactly as they are provided by the tool.**
+    7.  Present the recommendations to the user. For each movie, display its title and then its plot summary. Explain briefly WHY these specific movies were chosen (e.g., "Since you liked Parasite, a film about class conflict, you might enjoy..."). **ABSOLUTELY DO NOT INVENT, ALTER, OR HALLUCINATE ANY MOVIE TITLES OR PLOTS. ONLY USE THE DATA PROVIDED BY THE `recommend_movies` OR `recommend_by_theme` TOOL.** If the tool does not provide enough information for a movie, state "No plot available for this recommendation."
+
+    **Constraints:** If the user asks for movies from a period ("from the 90s"), of a genre, within a rating or MetaScore range, with a certificate ("family friendly", "PG-13") or of a runtime ("under two hours"), `recommend_by_theme` cannot apply them: skip it and pass them to `recommend_movies` through its `min_year`/`max_year`, `genres`, `certificates`, `min_rating`/`max_rating`, `min_metascore`/`max_metascore` and `min_duration`/`max_duration` parameters. If the result has `unknown_values`, retry with the closest entries from `known_values`; if it has a `message`, tell the user nothing matched and suggest relaxing a constraint.
 
     If the user profile is empty and they do not mention a specific movie, you must ask for a movie they like before starting this process.
     """,
-    tools=[critic_tool, recommend_movies],
+    tools=[recommend_by_theme, critic_tool, recommend_movies],
     model="gemini-1.5-pro"
 )
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+In-process metrics in the Prometheus text exposition format, plus per-request
+stage timings.
+
+Histograms and counters are module-level singletons defined at the bottom of
+this file and rendered by `render_metrics()` (served at `/metrics`). Each
+uvicorn worker keeps its own values, like an unaggregated prometheus_client
+registry, so scrape every worker or put them behind one per-pod endpoint.
+
+`timed(...)` also adds the elapsed time to the current `RequestTrace`, which
+`main.py` opens per chat request, so one request's time can be broken down
+by stage (LLM calls, tools, encode, FAISS search, session I/O).
+"""
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(zip(self.labelnames, key))} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = list(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class GaugeFunction(_Metric):
+    """A gauge read from a callback at scrape time (e.g. a cache's current size)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Optional[float]]):
+        super().__init__(name, documentation)
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            value = None
+        return super().render() + ([f"{self.name} {value}"] if value is not None else [])
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _REGISTRY for line in metric.render()) + "\n"
+
+
+# --- Per-request traces -----------------------------------------------------
+
+class RequestTrace:
+    """Wall-clock seconds per stage and the LLM call count for one chat request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] += seconds
+
+    def count_llm_call(self) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "total_ms": round(self.elapsed * 1000, 2),
+                "llm_calls": self.llm_calls,
+                "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in sorted(self.stages.items())},
+            }
+
+
+class FanOutTrace:
+    """Adds one measurement to several traces, e.g. all requests sharing a micro-batch."""
+
+    def __init__(self, traces: Iterable[RequestTrace]):
+        self.traces = [trace for trace in traces if trace is not None]
+
+    def add(self, stage: str, seconds: float) -> None:
+        for trace in self.traces:
+            trace.add(stage, seconds)
+
+    def count_llm_call(self) -> None:
+        for trace in self.traces:
+            trace.count_llm_call()
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("mars_request_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def use_trace(trace):
+    """Makes `trace` the current trace within the block (and tasks/threads started from its context)."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(histogram: Histogram, stage: Optional[str] = None, **labels):
+    """Observes the block's duration in `histogram` and, if given, adds it to the current trace as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        if stage is not None:
+            record_stage(stage, elapsed)
+
+
+# --- Metrics ---------------------------------------------------------------
+
+REQUEST_SECONDS = Histogram("mars_request_seconds", "End-to-end chat request latency.", ("endpoint", "route"))
+AGENT_SECONDS = Histogram("mars_agent_seconds", "Time spent inside each agent run.", ("agent",))
+LLM_SECONDS = Histogram("mars_llm_seconds", "Latency of each LLM call.", ("agent", "model"))
+LLM_CALLS = Counter("mars_llm_calls_total", "LLM calls made.", ("agent", "model"))
+LLM_ERRORS = Counter("mars_llm_errors_total", "LLM calls that raised.", ("agent",))
+LLM_CALLS_PER_TURN = Histogram("mars_llm_calls_per_turn", "LLM calls needed to answer one chat request.",
+                               buckets=COUNT_BUCKETS)
+TOOL_SECONDS = Histogram("mars_tool_seconds", "Latency of each tool call.", ("tool",))
+TOOL_ERRORS = Counter("mars_tool_errors_total", "Tool calls that raised.", ("tool",))
+TOOL_RESULT_BYTES = Histogram("mars_tool_result_bytes", "Size of tool results as JSON.", ("tool",), SIZE_BUCKETS)
+ENCODE_SECONDS = Histogram("mars_encode_seconds", "SentenceTransformer encode time per call (cache misses only).")
+QUERY_CACHE_REQUESTS = Counter("mars_query_cache_requests_total", "Query embedding cache lookups.", ("result",))
+FAISS_SEARCH_SECONDS = Histogram("mars_faiss_search_seconds", "FAISS search time per call.", ("kind",))
+KEYWORD_SEARCH_SECONDS = Histogram("mars_keyword_search_seconds", "BM25 keyword search time per call.")
+SEARCH_BATCH_SIZE = Histogram("mars_search_batch_size", "Queries served per micro-batched search.",
+                              buckets=(1, 2, 4, 8, 16, 32, 64))
+CRITIC_REQUESTS = Counter("mars_critic_requests_total", "Critic analyses by source.", ("source",))
+FAST_PATH_REQUESTS = Counter("mars_fast_path_requests_total", "Fast-path routing outcomes.", ("result",))
+SESSION_IO_SECONDS = Histogram("mars_session_io_seconds", "Session store database time.", ("op",))
@@ -0,0 +1,186 @@
+"""
+Shared machinery for the offline LLM pipelines (`generate_plots.py`,
+`pipelines/critic_themes.py`): an async worker pool with a token-bucket rate
+limit, retries with exponential backoff, an append-only checkpoint log and
+throughput reporting.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Async rate limiter: `rate` permits per second on average, with bursts of
+    up to `burst`. `acquire` waits until a permit is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class JsonlCheckpoint:
+    """
+    Append-only log of finished items, one `{"key": ..., "value": ...}` JSON
+    line each. Appends are buffered and flushed (and fsynced) in batches, so
+    a crash loses at most one batch; a torn last line is ignored on load.
+    Unlike rewriting the whole output file, each checkpoint costs only the
+    new records, which keeps large catalogs cheap to checkpoint.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50):
+        self.path = path
+        self.flush_every = flush_every
+        self._pending = []
+
+    def load(self) -> dict:
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done[record["key"]] = record["value"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return done
+
+    def append(self, key, value) -> None:
+        self._pending.append(json.dumps({"key": key, "value": value}, ensure_ascii=False))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # After a crash mid-write the log can end in a torn line; start on a fresh
+        # one so the first new record isn't glued to it (and lost with it).
+        separator = "\n" if self._ends_mid_line() else ""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(separator + "\n".join(self._pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+
+    def _ends_mid_line(self) -> bool:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def remove(self) -> None:
+        self._pending = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        finished = self.succeeded + self.failed
+        remaining = self.total - finished
+        eta = remaining / self.throughput if self.throughput else float("inf")
+        return (f"{finished}/{self.total} done ({self.succeeded} ok, {self.failed} failed, {self.retries} retries) "
+                f"in {self.elapsed:.1f}s | {self.throughput:.2f} items/s | ETA {eta:.0f}s")
+
+
+async def run_batch(
+    items: Iterable[Any],
+    process: Callable[[Any], Awaitable[Any]],
+    on_result: Callable[[Any, Any], None],
+    concurrency: int = 8,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_retries: int = 3,
+    backoff: float = 1.0,
+    report_every: float = 10.0,
+) -> BatchStats:
+    """
+    Runs `process(item)` for every item on `concurrency` workers, calling
+    `on_result(item, result)` for each success. A call that raises or
+    returns None is retried up to `max_retries` times with jittered
+    exponential backoff; every attempt first takes a permit from
+    `rate_limiter`. Progress is logged every `report_every` seconds.
+    """
+    items = list(items)
+    stats = BatchStats(total=len(items))
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = None
+            for attempt in range(max_retries + 1):
+                if attempt:
+                    stats.retries += 1
+                    await asyncio.sleep(backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+                if rate_limiter is not None:
+                    await rate_limiter.acquire()
+                try:
+                    result = await process(item)
+                except Exception as e:
+                    logger.warning(f"⚠️ Attempt {attempt + 1} failed for {item!r}: {e}")
+                    continue
+                if result is not None:
+                    break
+            if result is None:
+                stats.failed += 1
+                continue
+            on_result(item, result)
+            stats.succeeded += 1
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_every)
+            logger.info(f"🔄 {stats.summary()}")
+
+    report_task = asyncio.create_task(reporter())
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        report_task.cancel()
+    logger.info(f"✅ {stats.summary()}")
+    return stats
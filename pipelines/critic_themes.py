@@ -0,0 +1,228 @@
+"""
+Offline critic pass over the whole catalog.
+
+Runs the critic_agent analysis (themes, genre_style, summary) once for every
+movie in the catalog CSV, stores it in the Critic_* columns (see
+storage/theme_index.py) and embeds the summaries into a second FAISS index,
+so the recommender can use a movie's themes without an LLM call.
+
+The job is resumable: rows that already have a summary are skipped, and
+each analysis is committed to the shared critic cache as soon as it arrives,
+so an interrupted run picks up where it stopped without repeating calls.
+Analyses are keyed by catalog movie id (title + year), so remakes get their
+own analysis and duplicate rows of one movie cost a single call.
+At most `--concurrency` model calls are in flight at once, optionally
+rate-limited with `--rate` (see pipelines/batch.py).
+
+    python -m pipelines.critic_themes --concurrency 8
+    python -m pipelines.critic_themes --client stub --skip-index   # offline, no API key
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from manager_agent.sub_agents.critic_agent.agent import critic_agent
+from pipelines.batch import TokenBucket, run_batch
+from storage.catalog import movie_id
+from storage.critic_cache import CriticCache, parse_analysis
+from storage.theme_index import (
+    THEME_COLUMNS,
+    THEME_EMBEDDING_PATH,
+    THEME_INDEX_PATH,
+    build_theme_index,
+    precomputed_analysis,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DATA_FILE_PATH = "data/imdb_cleaned.csv"
+
+
+def _text(value, default="N/A") -> str:
+    return default if pd.isna(value) else str(value)
+
+
+def critic_request(record: dict) -> str:
+    """
+    The user message for one movie; the year disambiguates remakes, and is
+    also part of the movie id the cache is keyed by.
+    """
+    year = record.get("Year")
+    try:
+        return f"{record['Title']} ({int(year)})"
+    except (TypeError, ValueError):
+        return str(record["Title"])
+
+
+class GeminiCriticClient:
+    """Calls Gemini directly with the critic_agent instruction, asking for a JSON response."""
+
+    def __init__(self, model: str = "gemini-1.5-flash"):
+        from google import genai
+        from google.genai import types
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable not set.")
+        self.model = model
+        self.client = genai.Client(api_key=api_key)
+        self.config = types.GenerateContentConfig(system_instruction=critic_agent.instruction,
+                                                  response_mime_type="application/json")
+
+    async def analyze(self, record: dict) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=self.model, contents=critic_request(record), config=self.config)
+        return response.text or ""
+
+
+class StubCriticClient:
+    """
+    Offline stand-in for the model: derives a deterministic, schema-valid
+    analysis from the catalog row after `latency` seconds. Used to exercise
+    the pipeline without an API key.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def analyze(self, record: dict) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        genre = _text(record.get("Genre"), "drama")
+        director = _text(record.get("Director"), "an unknown director")
+        themes = [part.strip().lower() for part in genre.replace("|", ",").split(",") if part.strip()]
+        plot = _text(record.get("Generated_Plot"), "").split(". ")[0].strip()
+        return json.dumps({
+            "themes": themes or ["drama"],
+            "genre_style": f"A {genre.lower()} film directed by {director}.",
+            "summary": plot or f"A {genre.lower()} film by {director}.",
+        })
+
+
+def _pending_rows(df: pd.DataFrame) -> list:
+    summary = df[THEME_COLUMNS["summary"]]
+    return [i for i in df.index[summary.isna() | (summary.astype(str).str.strip() == "")] if not pd.isna(df.at[i, "Title"])]
+
+
+def _store(df: pd.DataFrame, row: int, analysis: dict) -> None:
+    df.at[row, THEME_COLUMNS["themes"]] = json.dumps(analysis["themes"])
+    df.at[row, THEME_COLUMNS["genre_style"]] = analysis["genre_style"]
+    df.at[row, THEME_COLUMNS["summary"]] = analysis["summary"]
+
+
+def _save(df: pd.DataFrame, path: str) -> None:
+    """Writes to a temp file and renames it, so a crash never leaves a truncated CSV."""
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+async def analyze_catalog(df: pd.DataFrame, client, cache: CriticCache, concurrency: int = 8, rate: float = 0.0,
+                          burst: int = 4, max_retries: int = 3, limit: Optional[int] = None) -> dict:
+    """
+    Fills the Critic_* columns of `df` for every row that lacks them. Each
+    analysis is stored in `cache` as it arrives, which is what makes an
+    interrupted run resumable. Duplicate rows of a movie share one model
+    call. Returns counts of rows pending, filled from an analysed duplicate
+    row or the cache, and of movies analysed and failed.
+    """
+    for column in THEME_COLUMNS.values():
+        if column not in df.columns:
+            df[column] = None
+        df[column] = df[column].astype(object)
+
+    ids = {row: movie_id(df.at[row, "Title"], df.at[row, "Year"] if "Year" in df.columns else None) for row in df.index}
+    pending = _pending_rows(df)
+    stats = {"pending": len(pending), "from_duplicates": 0, "from_cache": 0, "analyzed": 0, "failed": 0}
+
+    # Rows already analysed by an earlier run (or at request time), or sharing
+    # a movie with an analysed row, cost nothing.
+    pending_set = set(pending)
+    analysed = {}
+    for row in df.index:
+        if row not in pending_set and ids[row] not in analysed:
+            analysis = precomputed_analysis(df.loc[row].to_dict())
+            if analysis is not None:
+                analysed[ids[row]] = analysis
+    rows_by_movie = {}
+    for row in pending:
+        rows_by_movie.setdefault(ids[row], []).append(row)
+
+    to_call = []
+    for mid, rows in rows_by_movie.items():
+        if mid in analysed:
+            source, analysis = "from_duplicates", analysed[mid]
+        else:
+            source, analysis = "from_cache", cache.get_movie(mid)
+        if analysis is None:
+            to_call.append(mid)
+            continue
+        for row in rows:
+            _store(df, row, analysis)
+        stats[source] += len(rows)
+    if limit is not None:
+        to_call = to_call[:limit]
+    logger.info(f"🔄 {len(pending)} rows need themes: {stats['from_duplicates']} from duplicate rows, "
+                f"{stats['from_cache']} from the cache, {len(to_call)} movies to analyse.")
+
+    async def process(mid):
+        # Invalid JSON counts as a failed attempt and is retried.
+        return parse_analysis(await client.analyze(df.loc[rows_by_movie[mid][0]].to_dict()))
+
+    def on_result(mid, analysis):
+        rows = rows_by_movie[mid]
+        cache.put_movie(mid, str(df.at[rows[0], "Title"]), analysis)
+        for row in rows:
+            _store(df, row, analysis)
+
+    batch = await run_batch(to_call, process, on_result, concurrency=concurrency,
+                            rate_limiter=TokenBucket(rate, burst) if rate > 0 else None, max_retries=max_retries)
+    stats.update(analyzed=batch.succeeded, failed=batch.failed)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DATA_FILE_PATH)
+    parser.add_argument("--client", choices=("gemini", "stub"), default="gemini")
+    parser.add_argument("--model", default="gemini-1.5-flash")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds per call for the stub client.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum model calls in flight.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Average model calls per second (0 = unlimited).")
+    parser.add_argument("--burst", type=int, default=4, help="Calls allowed back to back before --rate applies.")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=None, help="Analyse at most this many movies in this run.")
+    parser.add_argument("--cache-db", default=None, help="Critic cache database (default: MARS_CRITIC_CACHE_DB).")
+    parser.add_argument("--skip-index", action="store_true", help="Don't (re)build the theme vector index.")
+    parser.add_argument("--embedding-path", default=THEME_EMBEDDING_PATH)
+    parser.add_argument("--index-path", default=THEME_INDEX_PATH)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = StubCriticClient(args.stub_latency) if args.client == "stub" else GeminiCriticClient(args.model)
+    df = pd.read_csv(args.csv)
+    logger.info(f"Loaded {len(df)} movies from {args.csv}")
+
+    cache = CriticCache(db_path=args.cache_db)
+    stats = asyncio.run(analyze_catalog(df, client, cache, concurrency=args.concurrency, rate=args.rate,
+                                        burst=args.burst, max_retries=args.max_retries, limit=args.limit))
+    _save(df, args.csv)
+    logger.info(f"✅ Critic themes saved to {args.csv}: {stats}")
+
+    if not args.skip_index:
+        # Imported here so the analysis step runs without torch installed.
+        from sentence_transformers import SentenceTransformer
+        from storage.vector_db import MODEL_NAME
+
+        build_theme_index(df, SentenceTransformer(MODEL_NAME), MODEL_NAME, args.embedding_path, args.index_path)
+
+
+if __name__ == "__main__":
+    main()
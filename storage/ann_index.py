@@ -0,0 +1,309 @@
+import json
+import logging
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+# How vectors are stored inside the index: raw float32, 2-byte floats,
+# 1-byte scalar-quantized components, or product-quantized codes.
+CODECS = ("float32", "fp16", "int8", "pq")
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+
+# FAISS warns below ~39 training points per centroid.
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def default_nlist(num_vectors: int) -> int:
+    """~4*sqrt(N) inverted lists, capped so every centroid gets enough training points."""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // _MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    """Largest divisor of `dim` not above `requested` (PQ needs dim % m == 0)."""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def resolve_codec(index_type: str, codec: Optional[str] = None) -> str:
+    """The codec an index of `index_type` is built with; "ivfpq" always stores PQ codes."""
+    codec = codec or "float32"
+    if codec not in CODECS:
+        raise ValueError(f"Unknown vector codec '{codec}'. Expected one of {CODECS}.")
+    if index_type == "ivfpq":
+        if codec not in ("float32", "pq"):
+            raise ValueError("The 'ivfpq' index always stores product-quantized codes; use codec 'pq'.")
+        return "pq"
+    if index_type == "ivf" and codec == "pq":
+        raise ValueError("An IVF index with product-quantized codes is index type 'ivfpq'.")
+    return codec
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = "flat",
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    pq_m: int = 48,
+    pq_bits: int = 8,
+    ids: Optional[np.ndarray] = None,
+    codec: Optional[str] = None,
+) -> faiss.Index:
+    """
+    Builds, trains and fills a FAISS index of the requested type:
+      - "flat":  exact brute-force L2 (IndexFlatL2)
+      - "ivf":   inverted file over flat vectors (IndexIVFFlat)
+      - "hnsw":  HNSW graph (IndexHNSWFlat)
+      - "ivfpq": inverted file with product-quantized codes (IndexIVFPQ)
+
+    `codec` (see CODECS) stores the vectors of "flat", "ivf" and "hnsw"
+    compressed instead of as float32: "fp16" halves them, "int8" quarters
+    them, and "pq" keeps `pq_m` one-byte codes per vector. Distances are
+    then computed against the compressed vectors, at some cost in accuracy
+    (see benchmarks/quantization_benchmark.py).
+
+    When `ids` is given the index is wrapped in an IndexIDMap2 so individual
+    rows can later be replaced in place (see `update_rows`).
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    codec = resolve_codec(index_type, codec)
+
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    if codec == "pq":
+        pq_m = _pq_subquantizers(dim, pq_m)
+        # Each sub-quantizer needs ~39 points per code word to train.
+        pq_bits = max(1, min(pq_bits, int(math.log2(max(2, num_vectors // _MIN_POINTS_PER_CENTROID)))))
+
+    if index_type == "flat":
+        if codec == "float32":
+            index = faiss.IndexFlatL2(dim)
+        elif codec == "pq":
+            # An exhaustive PQ scan, as one inverted list without residuals:
+            # unlike IndexPQ, IVF indexes honour the ID selectors used for filtering.
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, 1, pq_m, pq_bits)
+            index.by_residual = False
+        else:
+            index = faiss.IndexScalarQuantizer(dim, _SQ_TYPES[codec])
+    elif index_type == "hnsw":
+        if codec == "float32":
+            index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        elif codec == "pq":
+            index = faiss.IndexHNSWPQ(dim, pq_m, hnsw_m, pq_bits)
+        else:
+            index = faiss.IndexHNSWSQ(dim, _SQ_TYPES[codec], hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivfpq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+        elif codec == "float32":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, _SQ_TYPES[codec])
+    if not index.is_trained:
+        index.train(vectors)
+
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    else:
+        index.add(vectors)
+    logger.info(f"✅ Built '{index_type}' ({codec}) FAISS index over {num_vectors} vectors (dim={dim}).")
+    return index
+
+
+def configure_search(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> faiss.Index:
+    """Applies query-time knobs: `nprobe` for IVF indexes, `efSearch` for HNSW."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    inner = _unwrap(index)
+    if ef_search is not None and hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = ef_search
+    return index
+
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    Per-query parameters restricting a search to the ids `selector` accepts.
+    Search parameters override the index's own knobs, so the configured
+    `nprobe`/`efSearch` are carried over.
+    """
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+    try:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+    except RuntimeError:
+        return faiss.SearchParameters(sel=selector)
+
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    """Returns the index inside an ID map, or the index itself."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def update_rows(index: faiss.Index, embeddings: np.ndarray, changed_rows: np.ndarray, previous_rows: int,
+                max_changed_fraction: float = 0.5) -> bool:
+    """
+    Updates an ID-mapped index in place, where ids are catalog row numbers:
+    the vectors of `changed_rows` are replaced and ids beyond the new catalog
+    size are dropped. Returns False when the index should be rebuilt instead
+    (not ID-mapped, HNSW which can't remove vectors, or so many changed rows
+    that IVF centroids or quantizer codebooks would be trained on a stale
+    distribution).
+    """
+    if not isinstance(index, faiss.IndexIDMap2) or index_type_of(index) == "hnsw":
+        return False
+    if index.ntotal != previous_rows:
+        return False
+    num_rows = embeddings.shape[0]
+    if len(changed_rows) > max_changed_fraction * max(num_rows, 1):
+        return False
+
+    changed_rows = np.asarray(changed_rows, dtype=np.int64)
+    stale = np.union1d(changed_rows[changed_rows < previous_rows], np.arange(num_rows, previous_rows, dtype=np.int64))
+    if len(stale):
+        index.remove_ids(stale)
+    if len(changed_rows):
+        index.add_with_ids(np.ascontiguousarray(embeddings[changed_rows], dtype=np.float32), changed_rows)
+    return True
+
+
+def _is_flat_pq(index: faiss.Index) -> bool:
+    """The single-list IVF-PQ that `build_index` uses for a "flat" index with PQ codes."""
+    return isinstance(index, faiss.IndexIVFPQ) and index.nlist == 1 and not index.by_residual
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Maps a loaded FAISS index back to its INDEX_TYPES name."""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if _is_flat_pq(index):
+        return "flat"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def codec_of(index: faiss.Index) -> str:
+    """Maps a loaded FAISS index back to the CODECS name of how it stores vectors."""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = index.sq.qtype
+        return next((codec for codec, sq_type in _SQ_TYPES.items() if sq_type == qtype), "int8")
+    return "float32"
+
+
+def index_path_for(base_path: str, index_type: str, codec: str = "float32") -> str:
+    """
+    'vectorstore/imdb_faiss.index' stays the float32 flat index; other types
+    get 'imdb_faiss.<type>.index' and compressed ones 'imdb_faiss[.<type>].<codec>.index'.
+    """
+    parts = [] if index_type == "flat" else [index_type]
+    if resolve_codec(index_type, codec) != "float32" and index_type != "ivfpq":
+        parts.append(codec)
+    if not parts:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{'.'.join(parts)}{ext}"
+
+
+def write_index(index: faiss.Index, path: str) -> None:
+    """
+    Writes to a temp file and renames it into place. Workers that have the
+    old file memory-mapped keep reading its (now unlinked) inode instead of
+    faulting on a file truncated under them, and readers never see a
+    half-written index. The temp name is per process, so workers rebuilding
+    at the same time don't write into each other's file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def meta_path_for(index_path: str) -> str:
+    """Build metadata lives next to the index: 'x.index' -> 'x.meta.json'."""
+    return os.path.splitext(index_path)[0] + ".meta.json"
+
+
+def write_index_meta(index_path: str, meta: dict) -> None:
+    """
+    Records what an index was built from (model, catalog checksum, rows).
+    Write it after the index itself: if that is interrupted, the index
+    looks stale and is brought up to date again on the next load.
+    """
+    path = meta_path_for(index_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_index_meta(index_path: str) -> Optional[dict]:
+    path = meta_path_for(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_index(path: str, mmap: bool = False) -> faiss.Index:
+    """
+    Reads an index from disk. With `mmap`, flat and HNSW vectors are mapped
+    read-only from the file instead of copied into process memory, so every
+    worker serving the same file shares one page-cache copy. IVF inverted
+    lists are still read into memory. A mapped index cannot be modified.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+
+
+class IndexVectors:
+    """
+    Stands in for the raw embedding matrix once an ID-mapped index (ids =
+    row numbers) holds the vectors: `vectors[rows]` decodes those rows from
+    the index, so the float32 matrix doesn't have to stay mapped next to it.
+    Rows come back as stored, i.e. approximated under a compressing codec.
+    """
+
+    def __init__(self, index: faiss.Index):
+        self.index = index
+        self.shape = (index.ntotal, index.d)
+        try:
+            # IVF indexes need a row -> list position map to reconstruct vectors.
+            faiss.extract_index_ivf(index).make_direct_map()
+        except RuntimeError:
+            pass
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = self.index.reconstruct_batch(rows.reshape(-1))
+        return vectors[0] if rows.ndim == 0 else vectors
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .keyword_index import KeywordIndex
+from .metadata_index import MetadataIndex
+from .title_index import TitleIndex, normalize_title
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CSV_PATH = "data/imdb_cleaned.csv"
+_SOURCE_KEY = b"mars_source"
+# "Dune (2021)": a title with its release year, which tells remakes apart.
+_YEAR_SUFFIX_RE = re.compile(r"^(.*\S)\s*\((\d{4})\)\s*$")
+
+
+def movie_id(title, year) -> int:
+    """
+    Stable catalog id for a movie: a 48-bit hash of its normalized title and
+    year. Unlike a row number it survives rows being added or reordered, so it
+    is safe to persist (e.g. in user profiles). Fits exactly in a JSON number.
+    """
+    try:
+        year = str(int(year))
+    except (TypeError, ValueError):
+        year = ""
+    digest = hashlib.blake2b(f"{normalize_title(title)}|{year}".encode("utf-8"), digest_size=6).digest()
+    return int.from_bytes(digest, "big")
+
+
+def snapshot_path_for(csv_path: str) -> str:
+    """'data/imdb_cleaned.csv' -> 'data/imdb_cleaned.parquet'"""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def _source_fingerprint(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_snapshot(snapshot_path: str, fingerprint: dict) -> Optional[pd.DataFrame]:
+    """Reads the Parquet snapshot if it was written from the current CSV."""
+    if not os.path.exists(snapshot_path):
+        return None
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(snapshot_path).metadata or {}
+    if json.loads(metadata.get(_SOURCE_KEY, b"{}")) != fingerprint:
+        return None
+    return pq.read_table(snapshot_path).to_pandas()
+
+
+def _write_snapshot(df: pd.DataFrame, snapshot_path: str, fingerprint: dict) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_SOURCE_KEY] = json.dumps(fingerprint).encode("utf-8")
+    tmp_path = snapshot_path + ".tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+
+class MovieCatalog:
+    """
+    The single in-process copy of the movie catalog, shared by keyword
+    search (`movie_data_access`) and the vector store (`vector_db`).
+
+    Rows are addressed by position (the "movie id" used by the FAISS index
+    and the keyword/title indexes). `movie_ids` holds each row's stable
+    `movie_id`, for anything persisted across catalog reloads. `records`
+    holds one prebuilt dict per movie so search results don't rebuild them
+    with `to_dict` per call; treat them as read-only.
+    """
+
+    def __init__(self, df: pd.DataFrame, csv_path: str = DEFAULT_CSV_PATH):
+        self.df = df.reset_index(drop=True)
+        self.csv_path = csv_path
+        self.records: List[dict] = self.df.to_dict(orient="records")
+        titles = self.df["Title"].tolist() if "Title" in self.df.columns else []
+        years = self.df["Year"].tolist() if "Year" in self.df.columns else [None] * len(titles)
+        self.movie_ids = np.fromiter((movie_id(t, y) for t, y in zip(titles, years)), dtype=np.int64, count=len(titles))
+        # Duplicate rows of the same movie share an id; it maps to the first one.
+        self.row_by_id: Dict[int, int] = {}
+        for row, mid in enumerate(self.movie_ids.tolist()):
+            self.row_by_id.setdefault(mid, row)
+        self._keyword_index = None
+        self._title_index = None
+        self._metadata_index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, csv_path: str = DEFAULT_CSV_PATH) -> "MovieCatalog":
+        """
+        Loads from the binary snapshot next to the CSV, regenerating it first
+        if the CSV changed (size or mtime) since it was written.
+        """
+        snapshot_path = snapshot_path_for(csv_path)
+        fingerprint = _source_fingerprint(csv_path)
+        try:
+            df = _read_snapshot(snapshot_path, fingerprint)
+            if df is not None:
+                logger.info(f"✅ Movie catalog loaded from snapshot {snapshot_path} ({len(df)} movies).")
+                return cls(df, csv_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read catalog snapshot {snapshot_path}: {e}")
+
+        df = pd.read_csv(csv_path)
+        try:
+            _write_snapshot(df, snapshot_path, fingerprint)
+            logger.info(f"💾 Wrote catalog snapshot {snapshot_path}.")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write catalog snapshot {snapshot_path}: {e}")
+        logger.info(f"✅ Movie catalog loaded from {csv_path} ({len(df)} movies).")
+        return cls(df, csv_path)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+    def record_for_id(self, mid: int) -> Optional[dict]:
+        row = self.row_by_id.get(mid)
+        return self.records[row] if row is not None else None
+
+    def row_for_title(self, title: str, min_confidence: float = 0.8) -> Optional[int]:
+        """
+        Row of the best title match, or None if nothing matches with
+        `min_confidence`. A trailing year, as in "Dune (2021)", picks that
+        release among movies sharing the title; without one (or if the
+        catalog has no such year) the title index's first match is used.
+        """
+        if self.empty or not isinstance(title, str):
+            return None
+        suffix = _YEAR_SUFFIX_RE.match(title)
+        match = self.title_index.lookup(suffix.group(1) if suffix else title)
+        if match is None or match[1] < min_confidence:
+            match = self.title_index.lookup(title) if suffix else None
+            if match is None or match[1] < min_confidence:
+                return None
+            return match[0]
+        if suffix:
+            return self.row_by_id.get(movie_id(self.records[match[0]]["Title"], suffix.group(2)), match[0])
+        return match[0]
+
+    def movie_id_for_title(self, title: str, min_confidence: float = 0.8) -> Optional[int]:
+        """Stable id of the best title match, or None if nothing matches with `min_confidence`."""
+        row = self.row_for_title(title, min_confidence)
+        return int(self.movie_ids[row]) if row is not None else None
+
+    def column(self, name: str) -> np.ndarray:
+        """The column's backing array, without copying."""
+        return self.df[name].to_numpy(copy=False)
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        if self._keyword_index is None:
+            with self._lock:
+                if self._keyword_index is None:
+                    self._keyword_index = KeywordIndex.from_dataframe(self.df)
+        return self._keyword_index
+
+    @property
+    def title_index(self) -> TitleIndex:
+        if self._title_index is None:
+            with self._lock:
+                if self._title_index is None:
+                    titles = self.df["Title"].tolist() if "Title" in self.df.columns else []
+                    self._title_index = TitleIndex(titles)
+        return self._title_index
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        if self._metadata_index is None:
+            with self._lock:
+                if self._metadata_index is None:
+                    self._metadata_index = MetadataIndex(self.df)
+        return self._metadata_index
+
+
+_catalogs: Dict[str, MovieCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(csv_path: str = DEFAULT_CSV_PATH, reload: bool = False) -> MovieCatalog:
+    """
+    Returns the process-wide catalog for `csv_path`, loading it on first use.
+    `reload=True` re-reads the source (e.g. after `generate_plots.py` ran);
+    callers that fetch the catalog per call then see the new data.
+    """
+    key = os.path.abspath(csv_path)
+    catalog = _catalogs.get(key)
+    if catalog is None or reload:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None or reload:
+                catalog = MovieCatalog.load(csv_path)
+                _catalogs[key] = catalog
+    return catalog
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .title_index import normalize_title
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS critic_analyses (
+    title_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_critic_analyses_created ON critic_analyses (created_at);
+"""
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def parse_analysis(text) -> Optional[dict]:
+    """
+    Parses and validates a critic_agent answer: a JSON object with a list of
+    string `themes`, a string `genre_style` and a string `summary`. Tolerates
+    a surrounding ```json fence. Returns the cleaned dict, or None if invalid.
+    """
+    if isinstance(text, dict):
+        data = text
+    else:
+        try:
+            data = json.loads(_CODE_FENCE.sub("", str(text)))
+        except (TypeError, ValueError):
+            return None
+    if not isinstance(data, dict):
+        return None
+    themes, genre_style, summary = data.get("themes"), data.get("genre_style"), data.get("summary")
+    if not isinstance(themes, list) or not all(isinstance(theme, str) for theme in themes):
+        return None
+    if not isinstance(genre_style, str) or not isinstance(summary, str) or not summary.strip():
+        return None
+    return {"themes": themes, "genre_style": genre_style, "summary": summary}
+
+
+class CriticCache:
+    """
+    On-disk cache of critic_agent analyses, keyed by catalog movie id.
+
+    Backed by SQLite in WAL mode, so every uvicorn worker (and the offline
+    pipeline) reads and writes the same file concurrently. Free-text titles
+    are resolved against the catalog first, so "the matrix" and "Matrix" hit
+    the same entry, while remakes sharing a title ("Dune (1984)" and
+    "Dune (2021)") don't; titles not in the catalog are keyed by their
+    normalized text. Entries older than `ttl_seconds` are treated as misses
+    and purged on startup.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 min_title_confidence: float = 0.8):
+        self.db_path = db_path or os.getenv("MARS_CRITIC_CACHE_DB", "data/critic_cache.db")
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("MARS_CRITIC_CACHE_TTL", str(30 * 24 * 3600)))
+        self.min_title_confidence = min_title_confidence
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        removed = self.purge_expired()
+        logger.info(f"✅ Critic cache ready at {self.db_path} ({removed} expired entries purged).")
+
+    @staticmethod
+    def movie_key(movie_id: int) -> str:
+        return f"movie:{int(movie_id)}"
+
+    def title_key(self, title: str) -> tuple:
+        """(key, display title): the matching catalog movie's id and title, else the request itself."""
+        try:
+            from .catalog import get_catalog
+
+            catalog = get_catalog()
+            row = catalog.row_for_title(title, self.min_title_confidence)
+        except Exception:
+            row = None
+        if row is not None:
+            return self.movie_key(catalog.movie_ids[row]), str(catalog.records[row]["Title"])
+        return normalize_title(title), title
+
+    def get(self, title: str) -> Optional[dict]:
+        return self._get(self.title_key(title)[0])
+
+    def get_movie(self, movie_id: int) -> Optional[dict]:
+        """Lookup by catalog movie id, for callers that already know the row (see pipelines/critic_themes.py)."""
+        return self._get(self.movie_key(movie_id))
+
+    def _get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT analysis FROM critic_analyses WHERE title_key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_seconds),
+            ).fetchone()
+            analysis = parse_analysis(row[0]) if row else None
+            # Counted under the lock: tool-executor threads look up concurrently.
+            if analysis is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return analysis
+
+    def put(self, title: str, analysis) -> Optional[dict]:
+        """Stores `analysis` (dict or JSON text) if it validates. Returns the stored dict, or None."""
+        return self._put(*self.title_key(title), analysis)
+
+    def put_movie(self, movie_id: int, title: str, analysis) -> Optional[dict]:
+        return self._put(self.movie_key(movie_id), title, analysis)
+
+    def _put(self, key: str, display_title: str, analysis) -> Optional[dict]:
+        analysis = parse_analysis(analysis)
+        if analysis is None:
+            logger.warning(f"⚠️ Not caching invalid critic analysis for '{display_title}'.")
+            return None
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO critic_analyses VALUES (?, ?, ?, ?)",
+                (key, display_title, json.dumps(analysis), time.time()),
+            )
+        return analysis
+
+    def purge_expired(self) -> int:
+        with self._lock, self._db:
+            cursor = self._db.execute("DELETE FROM critic_analyses WHERE created_at < ?",
+                                      (time.time() - self.ttl_seconds,))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM critic_analyses").fetchone()[0]
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_critic_cache: Optional[CriticCache] = None
+_critic_cache_lock = threading.Lock()
+
+
+def get_critic_cache() -> CriticCache:
+    """The process-wide critic cache, opened on first use."""
+    global _critic_cache
+    if _critic_cache is None:
+        with _critic_cache_lock:
+            if _critic_cache is None:
+                _critic_cache = CriticCache()
+    return _critic_cache
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace and case. The MiniLM encoders are uncased, so this doesn't change the vector."""
+    return " ".join(str(query).split()).lower()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings keyed on
+    (model name, normalized query text). Entries also expire after
+    `ttl_seconds` so the cache can't serve vectors from a swapped model forever.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: Optional[float] = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, query: str, vector: np.ndarray) -> None:
+        vector = np.array(vector, dtype=np.float32)
+        # Cached vectors are shared between callers, so make them immutable.
+        vector.setflags(write=False)
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
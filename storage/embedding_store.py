@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def catalog_checksum(texts: Iterable[str]) -> str:
+    """SHA-256 over the embedding texts, in row order, identifying the catalog the vectors belong to."""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(str(text).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def row_hashes(texts: Iterable[str]) -> np.ndarray:
+    """64-bit content hash of each row's embedding text, used to find rows that need re-encoding."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(text).encode("utf-8"), digest_size=8).digest(), "little") for text in texts),
+        dtype=np.uint64,
+    )
+
+
+def changed_rows(old_hashes: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """
+    Rows whose content differs from the row at the same position in
+    `old_hashes`, plus rows beyond its end: the rows an index keyed by row
+    number must re-add to go from the old catalog to the new one.
+    """
+    common = min(len(hashes), len(old_hashes))
+    moved = np.flatnonzero(hashes[:common] != old_hashes[:common])
+    return np.union1d(moved, np.arange(common, len(hashes), dtype=np.int64))
+
+
+def hashes_path(embedding_path: str) -> str:
+    """Per-row hashes live next to the .npy file: 'x.npy' -> 'x.hashes.npy'."""
+    return os.path.splitext(embedding_path)[0] + ".hashes.npy"
+
+
+def header_path(embedding_path: str) -> str:
+    """The JSON header lives next to the .npy file: 'x.npy' -> 'x.json'."""
+    return os.path.splitext(embedding_path)[0] + ".json"
+
+
+def read_header(embedding_path: str) -> Optional[dict]:
+    path = header_path(embedding_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _atomic_save(path: str, array: np.ndarray) -> None:
+    # Per-process temp name, as in `ann_index.write_index`: concurrent writers don't share a file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save_row_hashes(embedding_path: str, hashes: np.ndarray) -> None:
+    _atomic_save(hashes_path(embedding_path), np.asarray(hashes, dtype=np.uint64))
+
+
+def load_row_hashes(embedding_path: str) -> Optional[np.ndarray]:
+    path = hashes_path(embedding_path)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def save_embeddings(embedding_path: str, embeddings: np.ndarray, model_name: str, checksum: str, hashes: Optional[np.ndarray] = None) -> None:
+    """
+    Writes embeddings as a raw float32 .npy file plus a JSON header with the
+    model name, dimension, row count and catalog checksum, and optionally the
+    per-row content hashes. Every file is written to a temp name and renamed
+    into place so readers never see a half-written store.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    os.makedirs(os.path.dirname(embedding_path) or ".", exist_ok=True)
+
+    _atomic_save(embedding_path, embeddings)
+    if hashes is not None:
+        save_row_hashes(embedding_path, hashes)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_name": model_name,
+        "dim": int(embeddings.shape[1]),
+        "rows": int(embeddings.shape[0]),
+        "dtype": "float32",
+        "catalog_checksum": checksum,
+    }
+    tmp_header = f"{header_path(embedding_path)}.{os.getpid()}.tmp"
+    with open(tmp_header, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_header, header_path(embedding_path))
+    logger.info(f"💾 Saved {header['rows']}x{header['dim']} embeddings to {embedding_path}")
+
+
+def load_embeddings(embedding_path: str, model_name: str, checksum: str) -> Optional[np.ndarray]:
+    """
+    Memory-maps a stored embedding matrix. Returns None when the store is
+    missing or its header does not match the current model and catalog, in
+    which case the caller should re-encode.
+    """
+    header = read_header(embedding_path)
+    if header is None or not os.path.exists(embedding_path):
+        return None
+
+    if header.get("model_name") != model_name:
+        logger.warning(f"⚠️ Embedding store was built with '{header.get('model_name')}', expected '{model_name}'.")
+        return None
+    if header.get("catalog_checksum") != checksum:
+        logger.warning("⚠️ Embedding store checksum does not match the current catalog.")
+        return None
+
+    embeddings = np.load(embedding_path, mmap_mode="r")
+    if embeddings.shape != (header["rows"], header["dim"]) or embeddings.dtype != np.float32:
+        logger.warning(f"⚠️ Embedding store shape {embeddings.shape} does not match its header.")
+        return None
+    return embeddings
+
+
+def load_previous_store(embedding_path: str, model_name: str):
+    """
+    Opens an existing store regardless of its catalog checksum, for
+    incremental re-embedding. Returns (embeddings, row_hashes) or None if
+    there is nothing reusable (missing, no row hashes, or another model).
+    """
+    header = read_header(embedding_path)
+    if header is None or header.get("model_name") != model_name or not os.path.exists(embedding_path):
+        return None
+    hashes = load_row_hashes(embedding_path)
+    if hashes is None:
+        return None
+    embeddings = np.load(embedding_path, mmap_mode="r")
+    if len(hashes) != embeddings.shape[0]:
+        return None
+    return embeddings, hashes
+
+
+def migrate_csv_embeddings(csv_path: str, embedding_path: str, model_name: str, checksum: str, expected_rows: int,
+                           hashes: Optional[np.ndarray] = None) -> bool:
+    """
+    One-shot migration from the legacy `pd.DataFrame(embeddings).to_csv` file.
+    The CSV carries no metadata, so it is only accepted when its row count
+    matches the catalog; it is then stamped with the current model and
+    checksum. Returns True if a binary store was written.
+    """
+    if not os.path.exists(csv_path) or os.path.exists(embedding_path):
+        return False
+
+    logger.info(f"🔄 Migrating legacy CSV embeddings from {csv_path}...")
+    embeddings = pd.read_csv(csv_path).to_numpy(dtype=np.float32)
+    if embeddings.shape[0] != expected_rows:
+        logger.warning(f"⚠️ Legacy embeddings have {embeddings.shape[0]} rows but the catalog has {expected_rows}; skipping migration.")
+        return False
+
+    save_embeddings(embedding_path, embeddings, model_name, checksum, hashes)
+    logger.info(f"✅ Migrated legacy embeddings. {csv_path} is no longer read and can be deleted.")
+    return True
@@ -0,0 +1,141 @@
+import bisect
+import logging
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns indexed for keyword search, with their BM25F field weights.
+# A hit in the title counts for more than a hit in the genre list.
+DEFAULT_FIELD_WEIGHTS = {
+    "Title": 3.0,
+    "Director": 1.5,
+    "Star Cast": 1.5,
+    "Genre": 1.0,
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# 'Star Cast' is stored without separators ("Louie LeonardoChad Allen"), so we
+# split on lowercase->uppercase boundaries before lowercasing.
+_CAMEL_RE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+
+def tokenize(text) -> List[str]:
+    """Splits a raw field value into lowercase alphanumeric tokens."""
+    if not isinstance(text, str) or not text:
+        return []
+    return _TOKEN_RE.findall(_CAMEL_RE.sub(" ", text).lower())
+
+
+class KeywordIndex:
+    """
+    Token inverted index over the movie catalog with BM25F ranking.
+
+    Each posting list stores the document ids and the precomputed per-document
+    BM25 contribution of that term, so a query only touches the postings of its
+    own terms and never scans the catalog.
+    """
+
+    def __init__(self, postings: Dict[str, Tuple[np.ndarray, np.ndarray]], num_docs: int):
+        self.postings = postings
+        self.num_docs = num_docs
+        # Sorted vocabulary for prefix expansion of partial words ("matr" -> "matrix").
+        self.vocabulary = sorted(postings)
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        field_weights: Optional[Dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> "KeywordIndex":
+        """Builds the index from the catalog DataFrame (one document per row)."""
+        field_weights = field_weights or DEFAULT_FIELD_WEIGHTS
+        num_docs = len(df)
+
+        term_freqs: Dict[str, Dict[int, float]] = {}
+        doc_lengths = np.zeros(num_docs, dtype=np.float32)
+        for column, weight in field_weights.items():
+            if column not in df.columns:
+                continue
+            for doc_id, value in enumerate(df[column].tolist()):
+                tokens = tokenize(value)
+                doc_lengths[doc_id] += weight * len(tokens)
+                for token in tokens:
+                    docs = term_freqs.setdefault(token, {})
+                    docs[doc_id] = docs.get(doc_id, 0.0) + weight
+
+        avg_length = float(doc_lengths.mean()) if num_docs else 0.0
+        norms = k1 * (1.0 - b + b * doc_lengths / avg_length) if avg_length else np.full(num_docs, k1, dtype=np.float32)
+
+        postings = {}
+        for token, docs in term_freqs.items():
+            doc_ids = np.fromiter(docs.keys(), dtype=np.int32, count=len(docs))
+            tfs = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            idf = math.log(1.0 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores = (idf * tfs * (k1 + 1.0) / (tfs + norms[doc_ids])).astype(np.float32)
+            order = np.argsort(doc_ids)
+            postings[token] = (doc_ids[order], scores[order])
+
+        logging.info(f"✅ Keyword index built: {len(postings)} terms over {num_docs} movies.")
+        return cls(postings, num_docs)
+
+    def _expand(self, token: str) -> List[str]:
+        """Returns the token itself if indexed, otherwise the indexed terms it prefixes."""
+        if token in self.postings:
+            return [token]
+        start = bisect.bisect_left(self.vocabulary, token)
+        expanded = []
+        for term in self.vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(self, query: str, top_k: int = 5, group_ids: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Returns up to `top_k` (doc_id, score) pairs, best match first. With
+        `group_ids` (one id per document, e.g. the catalog's movie ids), only
+        the best-ranked document of each group is returned, so duplicate
+        rows of a movie don't crowd out other matches.
+        """
+        if top_k <= 0:
+            return []
+
+        id_chunks, score_chunks = [], []
+        for token in dict.fromkeys(tokenize(query)):
+            for term in self._expand(token):
+                doc_ids, scores = self.postings[term]
+                id_chunks.append(doc_ids)
+                score_chunks.append(scores)
+        if not id_chunks:
+            return []
+
+        if len(id_chunks) == 1:
+            doc_ids, scores = id_chunks[0], score_chunks[0]
+        else:
+            all_ids = np.concatenate(id_chunks)
+            doc_ids, inverse = np.unique(all_ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_chunks)).astype(np.float32)
+
+        num_candidates = top_k
+        while True:
+            if len(doc_ids) > num_candidates:
+                candidates = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+            else:
+                candidates = np.arange(len(doc_ids))
+            # Best score first; ties broken by catalog order so results are deterministic.
+            order = np.lexsort((doc_ids[candidates], -scores[candidates]))
+            ranked = candidates[order]
+            if group_ids is None:
+                break
+            _, first = np.unique(group_ids[doc_ids[ranked]], return_index=True)
+            # Widen the candidate pool until it holds top_k distinct groups (or every match).
+            if len(first) >= top_k or len(candidates) == len(doc_ids):
+                ranked = ranked[np.sort(first)][:top_k]
+                break
+            num_candidates *= 2
+        return [(int(doc_ids[i]), float(scores[i])) for i in ranked]
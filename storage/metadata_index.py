@@ -0,0 +1,139 @@
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Filterable numeric columns, keyed by the name used in MetadataFilter fields
+# ("min_year"/"max_year" -> "Year").
+NUMERIC_COLUMNS = {
+    "year": "Year",
+    "rating": "IMDb Rating",
+    "metascore": "MetaScore",
+    "duration": "Duration (minutes)",
+}
+# Filterable label columns; a movie matches if it has any of the requested labels.
+LABEL_COLUMNS = {
+    "genres": "Genre",
+    "certificates": "Certificates",
+}
+
+
+@dataclass
+class MetadataFilter:
+    """Structured constraints on catalog rows. Bounds are inclusive; None means unconstrained."""
+
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    genres: Optional[List[str]] = None
+    certificates: Optional[List[str]] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    min_metascore: Optional[float] = None
+    max_metascore: Optional[float] = None
+    min_duration: Optional[float] = None
+    max_duration: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not self.describe()
+
+    def describe(self) -> dict:
+        """The constraints that are set, e.g. for echoing back in tool results."""
+        return {name: value for name, value in asdict(self).items() if value not in (None, [])}
+
+    def ranges(self) -> Iterator[Tuple[str, Optional[float], Optional[float]]]:
+        for key in NUMERIC_COLUMNS:
+            low, high = getattr(self, f"min_{key}"), getattr(self, f"max_{key}")
+            if low is not None or high is not None:
+                yield key, low, high
+
+    def labels(self) -> Iterator[Tuple[str, List[str]]]:
+        for key in LABEL_COLUMNS:
+            values = getattr(self, key)
+            if values:
+                yield key, values
+
+
+def _label_key(value) -> str:
+    return str(value).strip().lower()
+
+
+class _SortedColumn:
+    """Row numbers ordered by a numeric column (missing values left out), for range lookups by binary search."""
+
+    __slots__ = ("order", "values")
+
+    def __init__(self, values: np.ndarray):
+        rows = np.flatnonzero(~np.isnan(values))
+        self.order = rows[np.argsort(values[rows], kind="stable")]
+        self.values = values[self.order]
+
+    def rows_between(self, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        stop = len(self.values) if high is None else np.searchsorted(self.values, high, side="right")
+        return self.order[start:stop]
+
+
+class MetadataIndex:
+    """
+    Precomputed indexes over the catalog's structured columns, turning a
+    `MetadataFilter` into a boolean row mask without scanning the catalog:
+    numeric columns are kept sorted, so a range costs two binary searches,
+    and label columns keep one bitmap per label (a comma-separated Genre
+    like "Action, Drama" sets both). The mask restricts the FAISS search
+    in `MovieRetriever` through an ID selector.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.num_rows = len(df)
+        self.sorted_columns: Dict[str, _SortedColumn] = {
+            key: _SortedColumn(pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64))
+            for key, column in NUMERIC_COLUMNS.items() if column in df.columns
+        }
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {
+            key: self._label_bitmaps(df[column]) for key, column in LABEL_COLUMNS.items() if column in df.columns
+        }
+        # Labels as spelled in the catalog, for telling the agent which values exist.
+        self.known_labels: Dict[str, List[str]] = {
+            key: sorted({label.strip() for value in df[column].dropna() for label in str(value).split(",") if label.strip()})
+            for key, column in LABEL_COLUMNS.items() if column in df.columns
+        }
+
+    def _label_bitmaps(self, column: pd.Series) -> Dict[str, np.ndarray]:
+        labels = column.reset_index(drop=True).dropna().astype(str).str.split(",").explode().map(_label_key)
+        labels = labels[labels != ""]
+        bitmaps = {}
+        for label, rows in labels.groupby(labels).groups.items():
+            bitmap = np.zeros(self.num_rows, dtype=bool)
+            bitmap[np.asarray(rows, dtype=np.int64)] = True
+            bitmaps[label] = bitmap
+        return bitmaps
+
+    def unknown_labels(self, filters: MetadataFilter) -> Dict[str, List[str]]:
+        """Requested genres/certificates that no movie in the catalog has."""
+        unknown = {}
+        for key, values in filters.labels():
+            missing = [value for value in values if _label_key(value) not in self.bitmaps.get(key, {})]
+            if missing:
+                unknown[key] = missing
+        return unknown
+
+    def mask(self, filters: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """Rows matching every constraint in `filters`, or None if there is nothing to filter on."""
+        if filters is None or filters.is_empty():
+            return None
+        mask = np.ones(self.num_rows, dtype=bool)
+        for key, low, high in filters.ranges():
+            column = self.sorted_columns.get(key)
+            selected = np.zeros(self.num_rows, dtype=bool)
+            if column is not None:
+                selected[column.rows_between(low, high)] = True
+            mask &= selected
+        for key, values in filters.labels():
+            selected = np.zeros(self.num_rows, dtype=bool)
+            for value in values:
+                bitmap = self.bitmaps.get(key, {}).get(_label_key(value))
+                if bitmap is not None:
+                    selected |= bitmap
+            mask &= selected
+        return mask
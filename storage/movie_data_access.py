@@ -1,39 +1,51 @@
 import pandas as pd
 import logging
+from typing import Optional
 
-try:
-    # Make sure the CSV file is located at 'data/imdb_cleaned.csv'
-    MOVIE_DATA = pd.read_csv("data/imdb_cleaned.csv")
+from observability.metrics import KEYWORD_SEARCH_SECONDS, timed
+from .catalog import MovieCatalog, get_catalog
+from .title_index import normalize_title
+
+_EMPTY_CATALOG = MovieCatalog(pd.DataFrame())
+
+
+def _current_catalog() -> MovieCatalog:
+    """The shared catalog (also used by the vector store), or an empty one if it can't be loaded."""
+    try:
+        # Make sure the CSV file is located at 'data/imdb_cleaned.csv'
+        return get_catalog()
+    except Exception as e:
+        logging.error(f"❌ Failed to load IMDb data: {e}")
+        return _EMPTY_CATALOG
+
+
+CATALOG = _current_catalog()
+MOVIE_DATA = CATALOG.df
+if not CATALOG.empty:
     logging.info("✅ IMDb data loaded successfully for data access.")
-except Exception as e:
-    logging.error(f"❌ Failed to load IMDb data: {e}")
-    MOVIE_DATA = pd.DataFrame()
+    # Build the keyword and title indexes at load rather than on the first query.
+    _ = CATALOG.keyword_index
+    _ = CATALOG.title_index
 
 
 def search_movies_by_keywords(query: str, top_k: int = 5) -> list:
     """
-    Keyword-based search across Title, Genre, Star Cast, and Director.
+    Ranked keyword search across Title, Genre, Star Cast, and Director.
+    Duplicate rows of a movie (same `movie_id`) are returned once.
     """
-    if MOVIE_DATA.empty:
+    catalog = _current_catalog()
+    if catalog.empty:
         logging.warning("⚠️ No movie data available for search.")
         return []
 
-    query_lower = query.lower()
-    
-    # --- FIX 1: Using column names from your dataset sample ---
-    matches = MOVIE_DATA[
-        MOVIE_DATA['Title'].str.strip().str.lower().str.contains(query_lower, na=False) |
-        MOVIE_DATA['Genre'].str.strip().str.lower().str.contains(query_lower, na=False) |
-        MOVIE_DATA['Star Cast'].str.strip().str.lower().str.contains(query_lower, na=False) |
-        MOVIE_DATA['Director'].str.strip().str.lower().str.contains(query_lower, na=False)
-    ]
-
+    with timed(KEYWORD_SEARCH_SECONDS, stage="keyword_search"):
+        hits = catalog.keyword_index.search(query, top_k=top_k, group_ids=catalog.movie_ids)
     results = []
-    for _, row in matches.head(top_k).iterrows():
+    for doc_id, _ in hits:
+        row = catalog.records[doc_id]
         results.append({
             "title": row["Title"],
-            # --- IMPORTANT CHANGE: Use the 'Generated_Plot' column ---
-            "plot": row.get("Generated_Plot", "No plot available."), # <-- This line is changed
+            "plot": row.get("Generated_Plot", "No plot available."),
             "description": row.get("embedding_text", "No description available.") # Keep this if needed for other purposes
         })
     return results
@@ -41,24 +53,65 @@ def search_movies_by_keywords(query: str, top_k: int = 5) -> list:
 
 def get_rating_by_title(title: str) -> dict:
     """
-    Retrieve rating and votes for a movie title using a flexible search.
+    Retrieve rating and votes for a movie title.
+
+    Exact normalized titles resolve through a hash map; anything else falls
+    back to trigram matching. The matched catalog title and a 0-1 match
+    confidence are returned alongside the rating.
     """
-    if MOVIE_DATA.empty:
+    catalog = _current_catalog()
+    if catalog.empty:
         return None
 
-    title_lower = title.lower()
-    
-    match = MOVIE_DATA[MOVIE_DATA['Title'].str.strip().str.lower().str.contains(title_lower, na=False)]
-
-    if match.empty:
+    match = catalog.title_index.lookup(title)
+    if match is None:
         return None
 
-    row = match.iloc[0]
+    doc_id, confidence = match
+    row = catalog.records[doc_id]
 
     rating = row.get("IMDb Rating", "N/A")
     votes = "N/A" # Your sample did not include a votes column
 
     return {
+        "title": row["Title"],
         "rating": rating,
-        "votes": votes
-    }
\ No newline at end of file
+        "votes": votes,
+        "confidence": confidence
+    }
+
+
+def find_movie_ids(titles, min_confidence: float = 0.8) -> tuple:
+    """
+    Resolves free-text titles to catalog row ids. Returns (ids, unresolved),
+    where `unresolved` holds the normalized form of titles that didn't match
+    with at least `min_confidence`, so callers can still exclude them by name.
+    """
+    catalog = _current_catalog()
+    ids, unresolved = [], []
+    for title in titles or []:
+        row = catalog.row_for_title(title, min_confidence)
+        if row is not None:
+            ids.append(row)
+        else:
+            unresolved.append(normalize_title(title))
+    return ids, unresolved
+
+
+def find_catalog_movie_id(title: str, min_confidence: float = 0.8):
+    """Resolves a free-text title to its stable catalog movie id (see `catalog.movie_id`), or None."""
+    return _current_catalog().movie_id_for_title(title, min_confidence)
+
+
+def profile_rows(user_profile, catalog: Optional[MovieCatalog] = None) -> tuple:
+    """
+    Row ids in `catalog` (the current one by default) for a UserProfile's
+    (liked, disliked) movies, most recent first. Movies no longer in the
+    catalog are skipped.
+    """
+    if user_profile is None:
+        return [], []
+    row_by_id = (catalog or _current_catalog()).row_by_id
+    liked = [row_by_id[mid] for mid in user_profile.liked_ids if mid in row_by_id]
+    disliked = [row_by_id[mid] for mid in user_profile.disliked_ids if mid in row_by_id]
+    return liked, disliked
@@ -0,0 +1,40 @@
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def blended_query(query_vector: np.ndarray, liked: Optional[np.ndarray], disliked: Optional[np.ndarray],
+                  taste_weight: float, dislike_weight: float) -> np.ndarray:
+    """
+    Candidate-generation vector: the query pulled towards the centroid of the
+    liked movies and pushed away from the centroid of the disliked ones.
+    """
+    vector = normalize_rows(query_vector)
+    if liked is not None and len(liked):
+        vector = vector + taste_weight * normalize_rows(normalize_rows(liked).mean(axis=0))
+    if disliked is not None and len(disliked):
+        vector = vector - dislike_weight * normalize_rows(normalize_rows(disliked).mean(axis=0))
+    return normalize_rows(vector)
+
+
+def personalized_scores(candidates: np.ndarray, query_vector: np.ndarray, liked: Optional[np.ndarray],
+                        disliked: Optional[np.ndarray], taste_weight: float, dislike_weight: float) -> np.ndarray:
+    """
+    Re-ranking score per candidate: cosine similarity to the query, plus the
+    best similarity to any liked movie, minus the best similarity to any
+    disliked one. Using the max (not the centroid) keeps users with several
+    distinct tastes from being averaged into none of them.
+    """
+    candidates = normalize_rows(candidates)
+    scores = candidates @ normalize_rows(query_vector)
+    if liked is not None and len(liked):
+        scores += taste_weight * (candidates @ normalize_rows(liked).T).max(axis=1)
+    if disliked is not None and len(disliked):
+        scores -= dislike_weight * (candidates @ normalize_rows(disliked).T).max(axis=1)
+    return scores
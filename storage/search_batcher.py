@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+from observability.metrics import SEARCH_BATCH_SIZE, FanOutTrace, current_trace, use_trace
+
+logger = logging.getLogger(__name__)
+
+
+class SearchBatcher:
+    """
+    Micro-batches concurrent `MovieRetriever` searches.
+
+    Requests that arrive within `max_wait_ms` of each other (up to
+    `max_batch_size`) are served by a single `search_batch` call: one
+    `model.encode` over all texts and one FAISS search over the query
+    matrix. The collector runs on its own thread, so it can be used both
+    from async code (`await search_async(...)`) and from sync tools running
+    on worker threads (`search(...)`).
+    """
+
+    def __init__(self, retriever, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+        self._worker.start()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, query: str, top_k: int = 5) -> Future:
+        future: Future = Future()
+        # The caller's request trace, so the shared encode/search time is attributed to every request in the batch.
+        self._queue.put((query, top_k, future, current_trace()))
+        return future
+
+    def search(self, query: str, top_k: int = 5, timeout: Optional[float] = None) -> List[dict]:
+        return self.submit(query, top_k).result(timeout=timeout)
+
+    async def search_async(self, query: str, top_k: int = 5) -> List[dict]:
+        return await asyncio.wrap_future(self.submit(query, top_k))
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Drop requests whose callers already gave up.
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            queries = [query for query, _, _, _ in batch]
+            max_k = max(top_k for _, top_k, _, _ in batch)
+            SEARCH_BATCH_SIZE.observe(len(batch))
+            try:
+                with use_trace(FanOutTrace(trace for _, _, _, trace in batch)):
+                    results = self.retriever.search_batch(queries, top_k=max_k)
+            except Exception as e:
+                logger.error(f"❌ Batched search failed for {len(batch)} queries: {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            # FAISS returns neighbours best-first, so each caller's top_k is a prefix.
+            for (_, top_k, future, _), rows in zip(batch, results):
+                future.set_result(rows[:top_k])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
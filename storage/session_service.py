@@ -54,56 +54,401 @@
 #         return user_sessions
 
 
+import asyncio
+import json
 import logging
-from typing import Optional, Dict, List
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
 
+from google.adk.events import Event
 from google.adk.sessions import Session
 from google.adk.sessions.base_session_service import BaseSessionService
+from google.adk.sessions.state import State
+from observability.metrics import SESSION_IO_SECONDS, timed
 from .state_schema import UserProfile
 
-_STORE: Dict[str, Session] = {}
+SessionKey = Tuple[str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    events TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_app_user ON sessions (app_name, user_id, last_update_time);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_update ON sessions (last_update_time);
+"""
+
+_PROFILE_TAG = "__user_profile__"
+
+
+def _encode_value(value):
+    if isinstance(value, UserProfile):
+        return {_PROFILE_TAG: value.to_compact()}
+    raise TypeError(f"Session state value of type {type(value).__name__} is not serializable")
+
+
+def _encode_state(state: dict) -> str:
+    return json.dumps(dict(state), default=_encode_value)
+
+
+def _decode_state(raw: str) -> dict:
+    def object_hook(value):
+        if _PROFILE_TAG in value:
+            return UserProfile.from_compact(value[_PROFILE_TAG])
+        return value
+    return json.loads(raw, object_hook=object_hook)
+
 
 class PersistentSessionService(BaseSessionService):
-    """Manages user sessions, ensuring each has a UserProfile."""
+    """
+    Manages user sessions, ensuring each has a UserProfile.
+
+    Sessions live in SQLite (WAL mode, keyed by app/user/session) and survive
+    restarts. A bounded LRU keeps hot sessions in memory so memory use stays
+    flat however many users have ever chatted. Updates are written behind in
+    batches every `flush_interval` seconds (and on `close`), and sessions idle
+    for longer than `ttl_seconds` expire.
+
+    Every uvicorn worker has its own cache, so each row carries a version.
+    `get_session` reloads a cached session when another worker saved a newer
+    one, and a write only applies over the version it was based on. A session
+    that lost that race is rebased onto the stored copy (its new events
+    appended, their state deltas replayed) and written again.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_cached_sessions: int = 1024, ttl_seconds: float = 7 * 24 * 3600,
+                 flush_interval: float = 1.0, max_persisted_events: int = 200):
+        self.db_path = db_path or os.getenv("MARS_SESSION_DB", "data/sessions.db")
+        self.max_cached_sessions = max_cached_sessions
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.max_persisted_events = max_persisted_events
+
+        self._cache: "OrderedDict[SessionKey, Session]" = OrderedDict()
+        self._dirty: set = set()
+        # Dirty sessions pushed out of the LRU, kept until the next flush writes them.
+        self._evicted: Dict[SessionKey, Session] = {}
+        # (stored version, number of leading events already stored) per session.
+        self._synced: Dict[SessionKey, Tuple[int, int]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._connection = self._connect()
+        self._connection_pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        if "version" not in {column[1] for column in db.execute("PRAGMA table_info(sessions)")}:
+            try:
+                db.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            except sqlite3.OperationalError:
+                pass  # Another worker added it first.
+        return db
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # A SQLite connection must not be used across fork(): workers forked from a
+        # preloading server (see gunicorn.conf.py) open their own on first use.
+        if self._connection_pid != os.getpid():
+            self._connection = self._connect()
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    # --- In-memory tier -------------------------------------------------
+
+    def _remember(self, key: SessionKey, session: Session) -> None:
+        self._evicted.pop(key, None)
+        self._cache[key] = session
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached_sessions:
+            old_key, old_session = self._cache.popitem(last=False)
+            if old_key in self._dirty:
+                self._evicted[old_key] = old_session
+            else:
+                self._synced.pop(old_key, None)
+
+    def _pending(self, key: SessionKey) -> Optional[Session]:
+        session = self._cache.get(key)
+        return session if session is not None else self._evicted.get(key)
+
+    def _forget(self, key: SessionKey) -> None:
+        self._cache.pop(key, None)
+        self._evicted.pop(key, None)
+        self._synced.pop(key, None)
+        self._dirty.discard(key)
+
+    def _mark_dirty(self, session: Session) -> None:
+        key = (session.app_name, session.user_id, session.id)
+        session.last_update_time = time.time()
+        self._remember(key, session)
+        self._dirty.add(key)
+        self._ensure_flusher()
+
+    def _expired(self, last_update_time: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - last_update_time > self.ttl_seconds
 
-    async def get_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
-        key = f"{user_id}:{session_id}"
-        if key in _STORE:
-            logging.info(f"SESSION: Retrieved session for key {key}")
-            return _STORE.get(key)
-        return None
+    # --- SQLite tier ----------------------------------------------------
+
+    def _serialize(self, session: Session) -> tuple:
+        events = session.events[-self.max_persisted_events:] if self.max_persisted_events else []
+        return (
+            session.app_name,
+            session.user_id,
+            session.id,
+            _encode_state(session.state),
+            json.dumps([event.model_dump(mode="json", exclude_none=True, fallback=_encode_value) for event in events]),
+            session.last_update_time,
+        )
+
+    def _write_rows(self, rows: List[tuple]) -> List[int]:
+        """
+        Writes (row, base version) pairs in one transaction, each only over the
+        version it was based on (0: a new session). Returns the positions of
+        the rows that another worker saved first.
+        """
+        conflicts = []
+        with timed(SESSION_IO_SECONDS, stage="session_io", op="write"), self._db_lock, self._db:
+            for position, (row, version) in enumerate(rows):
+                if version:
+                    cursor = self._db.execute(
+                        "UPDATE sessions SET state = ?, events = ?, last_update_time = ?, version = ? "
+                        "WHERE app_name = ? AND user_id = ? AND session_id = ? AND version = ?",
+                        (*row[3:], version + 1, *row[:3], version),
+                    )
+                else:
+                    cursor = self._db.execute("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?, ?, 1)", row)
+                if cursor.rowcount == 0:
+                    conflicts.append(position)
+        return conflicts
+
+    def _read_version(self, app_name: str, user_id: str, session_id: str) -> Optional[int]:
+        with timed(SESSION_IO_SECONDS, stage="session_io", op="read"), self._db_lock:
+            row = self._db.execute(
+                "SELECT version FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _read_row(self, app_name: str, user_id: str, session_id: str) -> Optional[Tuple[Session, int]]:
+        with timed(SESSION_IO_SECONDS, stage="session_io", op="read"), self._db_lock:
+            row = self._db.execute(
+                "SELECT state, events, last_update_time, version FROM sessions "
+                "WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+        if row is None:
+            return None
+        state, events, last_update_time, version = row
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=_decode_state(state),
+            events=[Event.model_validate(event) for event in json.loads(events)],
+            last_update_time=last_update_time,
+        )
+        return session, version
+
+    def _read_user_rows(self, app_name: str, user_id: str) -> List[tuple]:
+        with timed(SESSION_IO_SECONDS, stage="session_io", op="read"), self._db_lock:
+            return self._db.execute(
+                "SELECT session_id, state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? "
+                "ORDER BY last_update_time",
+                (app_name, user_id),
+            ).fetchall()
+
+    def _delete_row(self, app_name: str, user_id: str, session_id: str) -> None:
+        with self._db_lock, self._db:
+            self._db.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id),
+            )
+
+    def _purge_expired(self) -> int:
+        if self.ttl_seconds is None:
+            return 0
+        with self._db_lock, self._db:
+            return self._db.execute("DELETE FROM sessions WHERE last_update_time < ?", (time.time() - self.ttl_seconds,)).rowcount
+
+    # --- Write-behind ---------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+            except RuntimeError:
+                # No running loop (sync caller): write through instead.
+                self._flush_now()
+
+    async def _flush_loop(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _collect_dirty(self) -> List[tuple]:
+        # Serialized on the event loop thread, where sessions are mutated.
+        pending = []
+        for key in self._dirty:
+            session = self._pending(key)
+            if session is not None:
+                version = self._synced.get(key, (0, 0))[0]
+                pending.append((key, session, len(session.events), self._serialize(session), version))
+        self._dirty.clear()
+        return pending
+
+    def _record_written(self, pending: List[tuple], conflicts: List[int]) -> List[SessionKey]:
+        """Notes the versions just stored. Returns the keys of the sessions another worker saved first."""
+        stale = []
+        for position, (key, session, events, _, version) in enumerate(pending):
+            if position in conflicts:
+                stale.append(key)
+            elif self._cache.get(key) is session:
+                self._synced[key] = (version + 1, events)
+            elif self._evicted.get(key) is session and key not in self._dirty:
+                self._evicted.pop(key)
+                self._synced.pop(key, None)
+        return stale
+
+    def _rebase(self, key: SessionKey, stored: Optional[Tuple[Session, int]]) -> None:
+        """
+        Puts a session that lost a write race on top of the stored copy: its
+        events, then the ones appended here since the last sync with their
+        state deltas replayed. Updated in place, since a runner may hold it.
+        """
+        session = self._pending(key)
+        if session is None:
+            return
+        if stored is None:
+            # Deleted or expired in the database meanwhile: store this copy as a new row.
+            self._synced.pop(key, None)
+        else:
+            fresh, version = stored
+            new_events = session.events[self._synced.get(key, (0, 0))[1]:]
+            temp_state = {name: value for name, value in session.state.items() if name.startswith(State.TEMP_PREFIX)}
+            session.state.clear()
+            session.state.update(fresh.state)
+            session.state.update(temp_state)
+            for event in new_events:
+                self._update_session_state(session, event)
+            session.events[:] = fresh.events + new_events
+            self._synced[key] = (version, len(fresh.events))
+        self._dirty.add(key)
+        logging.warning(f"⚠️ SESSION: {key[1]}:{key[2]} was saved by another worker first; rebased onto the stored copy")
+
+    def _flush_now(self) -> None:
+        pending = self._collect_dirty()
+        if pending:
+            conflicts = self._write_rows([(row, version) for *_, row, version in pending])
+            for key in self._record_written(pending, conflicts):
+                self._rebase(key, self._read_row(*key))
+
+    async def flush(self) -> None:
+        """
+        Writes all pending session updates in one transaction, and periodically
+        purges expired sessions. Sessions another worker saved first are
+        rebased and written on the next flush.
+        """
+        pending = self._collect_dirty()
+        if pending:
+            conflicts = await asyncio.to_thread(self._write_rows, [(row, version) for *_, row, version in pending])
+            for key in self._record_written(pending, conflicts):
+                self._rebase(key, await asyncio.to_thread(self._read_row, *key))
+            logging.info(f"SESSION: Flushed {len(pending) - len(conflicts)} sessions to {self.db_path}")
+        if time.time() - self._last_purge > 60:
+            self._last_purge = time.time()
+            expired = await asyncio.to_thread(self._purge_expired)
+            if expired:
+                logging.info(f"SESSION: Expired {expired} idle sessions")
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush()
+        if self._dirty:
+            await self.flush()  # Sessions rebased onto another worker's copy.
+        with self._db_lock:
+            self._db.close()
+
+    # --- BaseSessionService API -----------------------------------------
+
+    async def get_session(self, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        session = self._pending(key)
+        if session is not None and key not in self._dirty:
+            # Another worker may have saved a newer copy since this one was cached.
+            version = await asyncio.to_thread(self._read_version, app_name, user_id, session_id)
+            if version != self._synced.get(key, (0, 0))[0]:
+                self._forget(key)
+                session = None
+        if session is None:
+            stored = await asyncio.to_thread(self._read_row, app_name, user_id, session_id)
+            if stored is None:
+                return None
+            session, version = stored
+            self._synced[key] = (version, len(session.events))
+        if self._expired(session.last_update_time):
+            await self.delete_session(app_name, user_id, session_id)
+            return None
+        self._remember(key, session)
+        logging.info(f"SESSION: Retrieved session for key {user_id}:{session_id}")
+        return session
 
     async def create_session(self, app_name: str, user_id: str, session_id: str, state: Optional[dict] = None) -> Session:
-        key = f"{user_id}:{session_id}"
-        if key not in _STORE:
-            logging.info(f"SESSION: Creating new session for key {key}")
+        session = await self.get_session(app_name, user_id, session_id)
+        if session is None:
+            logging.info(f"SESSION: Creating new session for key {user_id}:{session_id}")
             initial_state = {"user_profile": UserProfile()}
-            _STORE[key] = Session(
+            initial_state.update(state or {})
+            session = Session(
                 app_name=app_name,
                 user_id=user_id,
                 id=session_id,
                 state=initial_state
             )
-        return _STORE[key]
+            self._mark_dirty(session)
+        return session
 
     async def update_session(self, session: Session) -> Session:
-        key = f"{session.user_id}:{session.id}"
-        logging.info(f"SESSION: Updating session for key {key}")
-        _STORE[key] = session
+        logging.info(f"SESSION: Updating session for key {session.user_id}:{session.id}")
+        self._mark_dirty(session)
         return session
 
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if not event.partial:
+            self._mark_dirty(session)
+        return event
+
     async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
-        """Deletes a session from the in-memory store."""
-        key = f"{user_id}:{session_id}"
-        if key in _STORE:
-            logging.info(f"SESSION: Deleting session for key {key}")
-            del _STORE[key]
+        """Deletes a session from memory and from the database."""
+        key = (app_name, user_id, session_id)
+        logging.info(f"SESSION: Deleting session for key {user_id}:{session_id}")
+        self._forget(key)
+        await asyncio.to_thread(self._delete_row, app_name, user_id, session_id)
 
     async def list_sessions(self, app_name: str, user_id: str) -> List[Session]:
-        """Lists all sessions for a given user from the in-memory store."""
-        user_sessions = []
-        for session in _STORE.values():
-            if session.user_id == user_id and session.app_name == app_name:
-                user_sessions.append(session)
+        """Lists a user's sessions via the (app_name, user_id) index, without loading their events."""
+        await self.flush()
+        rows = await asyncio.to_thread(self._read_user_rows, app_name, user_id)
+        user_sessions = [
+            Session(app_name=app_name, user_id=user_id, id=session_id, state=_decode_state(state), last_update_time=updated)
+            for session_id, state, updated in rows
+            if not self._expired(updated)
+        ]
         logging.info(f"SESSION: Found {len(user_sessions)} sessions for user {user_id}")
         return user_sessions
@@ -10,13 +10,141 @@
 #     disliked_movies: List[str] = field(default_factory=list)
 #     preferred_genres: List[str] = field(default_factory=list)
 
-from dataclasses import dataclass, field
-from typing import List, Optional
+import os
+from typing import Dict, Iterable, List, Optional
+
+# Most recent likes/dislikes kept per user; older ones are dropped first.
+MAX_PROFILE_ITEMS = int(os.getenv("MARS_PROFILE_MAX_ITEMS", "50"))
+
+
+def _title_for(movie_id: int) -> str:
+    """'Parasite (2019)' for a catalog movie id, or '#<id>' if it isn't in the catalog."""
+    try:
+        from .catalog import get_catalog
+
+        record = get_catalog().record_for_id(movie_id)
+    except Exception:
+        record = None
+    if record is None:
+        return f"#{movie_id}"
+    year = record.get("Year")
+    try:
+        return f"{record['Title']} ({int(year)})"
+    except (TypeError, ValueError):
+        return str(record["Title"])
+
 
-@dataclass
 class UserProfile:
-    """Holds all information about a user's movie preferences."""
-    name: Optional[str] = None
-    liked_movies: List[str] = field(default_factory=list)
-    disliked_movies: List[str] = field(default_factory=list)
-    preferred_genres: List[str] = field(default_factory=list)
\ No newline at end of file
+    """
+    Holds all information about a user's movie preferences.
+
+    Liked and disliked movies are stored as catalog movie ids (see
+    `catalog.movie_id`) in insertion-ordered dicts used as ordered sets:
+    membership checks are O(1), re-adding a movie moves it to the most
+    recent position, and only the newest `max_items` are kept. A movie is
+    never both liked and disliked.
+    """
+
+    __slots__ = ("name", "liked", "disliked", "preferred_genres", "max_items")
+
+    def __init__(self, name: Optional[str] = None, liked: Iterable[int] = (), disliked: Iterable[int] = (),
+                 preferred_genres: Iterable[str] = (), max_items: int = MAX_PROFILE_ITEMS):
+        self.name = name
+        self.max_items = max_items
+        self.liked: Dict[int, None] = {}
+        self.disliked: Dict[int, None] = {}
+        self.preferred_genres: Dict[str, None] = dict.fromkeys(preferred_genres)
+        for movie_id in liked:
+            self.like(movie_id)
+        for movie_id in disliked:
+            self.dislike(movie_id)
+
+    def _add(self, target: Dict[int, None], other: Dict[int, None], movie_id: int) -> bool:
+        """Adds `movie_id` as the most recent entry of `target`. Returns False if it already was."""
+        movie_id = int(movie_id)
+        if target and next(reversed(target)) == movie_id:
+            return False
+        other.pop(movie_id, None)
+        target.pop(movie_id, None)
+        target[movie_id] = None
+        while len(target) > self.max_items:
+            del target[next(iter(target))]
+        return True
+
+    def like(self, movie_id: int) -> bool:
+        return self._add(self.liked, self.disliked, movie_id)
+
+    def dislike(self, movie_id: int) -> bool:
+        return self._add(self.disliked, self.liked, movie_id)
+
+    def add_genre(self, genre: str) -> bool:
+        if genre in self.preferred_genres:
+            return False
+        self.preferred_genres[genre] = None
+        return True
+
+    @property
+    def liked_ids(self) -> List[int]:
+        """Liked movie ids, most recent first."""
+        return list(reversed(self.liked))
+
+    @property
+    def disliked_ids(self) -> List[int]:
+        """Disliked movie ids, most recent first."""
+        return list(reversed(self.disliked))
+
+    @property
+    def liked_movies(self) -> List[str]:
+        """Liked movie titles, most recent first."""
+        return [_title_for(movie_id) for movie_id in self.liked_ids]
+
+    @property
+    def disliked_movies(self) -> List[str]:
+        """Disliked movie titles, most recent first."""
+        return [_title_for(movie_id) for movie_id in self.disliked_ids]
+
+    def to_compact(self) -> dict:
+        """Short-keyed form for storage; ids are oldest first. Empty fields are omitted."""
+        data = {"n": self.name, "l": list(self.liked), "d": list(self.disliked), "g": list(self.preferred_genres)}
+        return {key: value for key, value in data.items() if value}
+
+    @classmethod
+    def from_compact(cls, data: dict) -> "UserProfile":
+        if "liked_movies" in data or "disliked_movies" in data:
+            return cls._from_titles(data)
+        return cls(name=data.get("n"), liked=data.get("l", ()), disliked=data.get("d", ()),
+                   preferred_genres=data.get("g", ()))
+
+    @classmethod
+    def _from_titles(cls, data: dict) -> "UserProfile":
+        """Upgrades the old title-list form, dropping titles the catalog doesn't know."""
+        from .catalog import get_catalog
+
+        catalog = get_catalog()
+        profile = cls(name=data.get("name"), preferred_genres=data.get("preferred_genres") or ())
+        for title in data.get("liked_movies") or ():
+            movie_id = catalog.movie_id_for_title(title)
+            if movie_id is not None:
+                profile.like(movie_id)
+        for title in data.get("disliked_movies") or ():
+            movie_id = catalog.movie_id_for_title(title)
+            if movie_id is not None:
+                profile.dislike(movie_id)
+        return profile
+
+    def __str__(self) -> str:
+        """Compact rendering injected into agent prompts via `{user_profile}`."""
+        parts = [f"name: {self.name or 'unknown'}",
+                 f"liked_movies (most recent first): [{'; '.join(self.liked_movies)}]",
+                 f"disliked_movies (most recent first): [{'; '.join(self.disliked_movies)}]"]
+        if self.preferred_genres:
+            parts.append(f"preferred_genres: [{', '.join(self.preferred_genres)}]")
+        return " | ".join(parts)
+
+    def __repr__(self) -> str:
+        return f"UserProfile({self.to_compact()!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UserProfile):
+            return NotImplemented
+        return self.to_compact() == other.to_compact()
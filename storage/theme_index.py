@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from .ann_index import build_index, write_index
+from .catalog import MovieCatalog, get_catalog
+from .critic_cache import parse_analysis
+from .embedding_store import catalog_checksum, load_embeddings, save_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Catalog columns filled by `python -m pipelines.critic_themes`, keyed by the
+# critic_agent JSON field they hold. Themes are stored as a JSON list.
+THEME_COLUMNS = {"themes": "Critic_Themes", "genre_style": "Critic_Genre_Style", "summary": "Critic_Summary"}
+THEME_EMBEDDING_PATH = "embeddings/imdb_theme_embeddings.npy"
+THEME_INDEX_PATH = "vectorstore/imdb_theme_faiss.index"
+
+
+def precomputed_analysis(record: dict) -> Optional[dict]:
+    """The critic analysis stored in a catalog record, or None if the row has none."""
+    summary = record.get(THEME_COLUMNS["summary"])
+    if not isinstance(summary, str) or not summary.strip():
+        return None
+    try:
+        themes = json.loads(record.get(THEME_COLUMNS["themes"]) or "[]")
+    except (TypeError, ValueError):
+        themes = []
+    return parse_analysis({"themes": themes, "genre_style": record.get(THEME_COLUMNS["genre_style"]) or "",
+                           "summary": summary})
+
+
+def precomputed_analysis_for_title(title: str, min_confidence: float = 0.8) -> Optional[dict]:
+    """Resolves `title` (optionally "Title (Year)") against the catalog and returns its precomputed analysis, if any."""
+    try:
+        catalog = get_catalog()
+        row = catalog.row_for_title(title, min_confidence)
+    except Exception:
+        return None
+    return precomputed_analysis(catalog.records[row]) if row is not None else None
+
+
+def theme_texts(df: pd.DataFrame) -> List[str]:
+    """Per-row text embedded into the theme index; empty for rows not analysed yet."""
+    summary = THEME_COLUMNS["summary"]
+    if summary not in df.columns:
+        return [""] * len(df)
+    return df[summary].fillna("").astype(str).tolist()
+
+
+def build_theme_index(df: pd.DataFrame, model, model_name: str, embedding_path: str = THEME_EMBEDDING_PATH,
+                      index_path: str = THEME_INDEX_PATH) -> int:
+    """
+    Embeds the critic summaries and writes the theme embedding store and a
+    flat FAISS index over the rows that have one (ids are catalog rows).
+    Rows without a summary keep a zero vector in the store. Re-uses the
+    stored embeddings when the summaries haven't changed. Returns the number
+    of indexed rows.
+    """
+    texts = theme_texts(df)
+    checksum = catalog_checksum(texts)
+    rows = np.array([i for i, text in enumerate(texts) if text], dtype=np.int64)
+    embeddings = load_embeddings(embedding_path, model_name, checksum)
+    if embeddings is None:
+        logger.info(f"🔄 Encoding {len(rows)} critic summaries...")
+        encoded = model.encode([texts[i] for i in rows], show_progress_bar=True) if len(rows) else None
+        dim = encoded.shape[1] if encoded is not None else model.get_sentence_embedding_dimension()
+        embeddings = np.zeros((len(texts), dim), dtype=np.float32)
+        if len(rows):
+            embeddings[rows] = encoded
+        save_embeddings(embedding_path, embeddings, model_name, checksum)
+
+    index = build_index(np.asarray(embeddings[rows], dtype=np.float32), "flat", ids=rows)
+    write_index(index, index_path)
+    logger.info(f"💾 Wrote theme index {index_path} ({len(rows)} movies).")
+    return len(rows)
+
+
+class ThemeIndex:
+    """
+    Read-only view of the precomputed theme vectors: "movies whose critic
+    analysis is close to this movie's", with no LLM call and no query
+    encoding, because the source movie's theme vector is already stored.
+    """
+
+    def __init__(self, catalog: MovieCatalog, embeddings: np.ndarray, index):
+        self.catalog = catalog
+        self.embeddings = embeddings
+        self.index = index
+
+    @classmethod
+    def load(cls, model_name: str, catalog: Optional[MovieCatalog] = None, embedding_path: str = THEME_EMBEDDING_PATH,
+             index_path: str = THEME_INDEX_PATH) -> Optional["ThemeIndex"]:
+        """Opens the theme store if it exists and was built from the current catalog's summaries."""
+        catalog = catalog or get_catalog()
+        if not os.path.exists(index_path):
+            return None
+        embeddings = load_embeddings(embedding_path, model_name, catalog_checksum(theme_texts(catalog.df)))
+        if embeddings is None:
+            logger.warning("⚠️ Theme index is stale; run `python -m pipelines.critic_themes` to rebuild it.")
+            return None
+        return cls(catalog, embeddings, faiss.read_index(index_path))
+
+    def has_row(self, row: int) -> bool:
+        return 0 <= row < len(self.embeddings) and bool(np.any(self.embeddings[row]))
+
+    def similar(self, row: int, top_k: int = 5, exclude_rows=()) -> List[int]:
+        """Catalog rows most similar in theme to `row`, skipping it and `exclude_rows`."""
+        if not self.has_row(row):
+            return []
+        excluded = set(exclude_rows) | {row}
+        fetch_k = min(self.index.ntotal, top_k + len(excluded))
+        _, ids = self.index.search(np.asarray(self.embeddings[row : row + 1], dtype=np.float32), fetch_k)
+        return [int(i) for i in ids[0] if i >= 0 and int(i) not in excluded][:top_k]
+
+
+# (catalog, index file signature) the cached result was loaded for, and the result.
+_theme_index_entry: tuple = (None, None)
+_theme_index_lock = threading.Lock()
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def get_theme_index() -> Optional[ThemeIndex]:
+    """
+    The theme index for the current catalog, or None if the pipeline hasn't
+    built one for it. Reloaded when the catalog is reloaded (e.g. by
+    `MovieRetriever.refresh`) or the index file is rewritten, so its rows
+    always match `ThemeIndex.catalog`.
+    """
+    global _theme_index_entry
+    key = (get_catalog(), _file_signature(THEME_INDEX_PATH))
+    loaded_for, theme_index = _theme_index_entry
+    if loaded_for != key:
+        with _theme_index_lock:
+            loaded_for, theme_index = _theme_index_entry
+            if loaded_for != key:
+                from .vector_db import MODEL_NAME
+
+                try:
+                    theme_index = ThemeIndex.load(MODEL_NAME, key[0])
+                except Exception as e:
+                    logger.error(f"❌ Failed to load theme index: {e}")
+                    theme_index = None
+                _theme_index_entry = (key, theme_index)
+    return theme_index
@@ -0,0 +1,96 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_LEADING_ARTICLE_RE = re.compile(r"^(the|a|an) ")
+# Library-style inversion: "Matrix, The".
+_TRAILING_ARTICLE_RE = re.compile(r",\s*(the|a|an)\s*$")
+
+
+def normalize_title(title) -> str:
+    """
+    Canonical form used for title lookups: accents stripped, lowercase,
+    punctuation collapsed to single spaces and a leading or trailing
+    (", The") article dropped, so "The Matrix", "matrix" and "Matrix, The"
+    line up.
+    """
+    if not isinstance(title, str):
+        return ""
+    text = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    text = _TRAILING_ARTICLE_RE.sub("", text.lower())
+    text = _NON_ALNUM_RE.sub(" ", text).strip()
+    return _LEADING_ARTICLE_RE.sub("", text)
+
+
+def trigrams(text: str) -> set:
+    """Padded character trigrams of an already-normalized string."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    Title lookup built once at load time.
+
+    Lookups first hit an exact hash map of normalized titles (O(1)); only when
+    that misses do they fall back to a trigram index, scored with the Dice
+    coefficient, which doubles as the match confidence.
+    """
+
+    def __init__(self, titles: List[str], min_confidence: float = 0.45):
+        self.min_confidence = min_confidence
+        self.exact: Dict[str, int] = {}
+        # Fuzzy matching works on distinct normalized titles; each maps back to
+        # the first catalog row carrying it so results are deterministic.
+        self._keys: List[str] = []
+        self._key_rows: List[int] = []
+        self._key_sizes: List[int] = []
+        postings: Dict[str, List[int]] = {}
+
+        for row, title in enumerate(titles):
+            key = normalize_title(title)
+            if not key or key in self.exact:
+                continue
+            self.exact[key] = row
+            key_id = len(self._keys)
+            grams = trigrams(key)
+            self._keys.append(key)
+            self._key_rows.append(row)
+            self._key_sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+
+        self._key_rows = np.asarray(self._key_rows, dtype=np.int32)
+        self._key_sizes = np.asarray(self._key_sizes, dtype=np.float32)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        logging.info(f"✅ Title index built: {len(self.exact)} distinct titles, {len(self.postings)} trigrams.")
+
+    def lookup(self, title: str) -> Optional[Tuple[int, float]]:
+        """
+        Returns (catalog_row, confidence) for the best matching title, or None
+        if nothing reaches `min_confidence`. Exact normalized matches return 1.0.
+        """
+        key = normalize_title(title)
+        if not key:
+            return None
+        row = self.exact.get(key)
+        if row is not None:
+            return row, 1.0
+
+        grams = trigrams(key)
+        chunks = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not chunks:
+            return None
+        candidates, shared = np.unique(np.concatenate(chunks), return_counts=True)
+        dice = 2.0 * shared / (len(grams) + self._key_sizes[candidates])
+        # Highest Dice score wins; ties go to the earliest catalog row.
+        rows = self._key_rows[candidates]
+        best = np.lexsort((rows, -dice))[0]
+        confidence = float(dice[best])
+        if confidence < self.min_confidence:
+            return None
+        return int(rows[best]), round(confidence, 3)
@@ -59,74 +59,460 @@
 
 # movie_retriever_instance = MovieRetriever()
 
+import copy
+import gc
 import os
+import threading
 import faiss
-import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import logging
 
+from .ann_index import (
+    IndexVectors,
+    build_index,
+    codec_of,
+    configure_search,
+    index_path_for,
+    index_type_of,
+    read_index,
+    read_index_meta,
+    resolve_codec,
+    search_parameters,
+    update_rows,
+    write_index,
+    write_index_meta,
+)
+from .catalog import get_catalog
+from .embedding_cache import QueryEmbeddingCache, normalize_query
+from .embedding_store import (
+    catalog_checksum,
+    changed_rows,
+    load_embeddings,
+    load_previous_store,
+    load_row_hashes,
+    migrate_csv_embeddings,
+    row_hashes,
+    save_embeddings,
+    save_row_hashes,
+)
+from .personalization import blended_query, personalized_scores
+from .search_batcher import SearchBatcher
+from .title_index import normalize_title
+from observability.metrics import ENCODE_SECONDS, FAISS_SEARCH_SECONDS, QUERY_CACHE_REQUESTS, timed
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "all-MiniLM-L12-v2"
+
+
+def _int_env(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# Filters matching at most this many rows are scored exactly over those rows instead of through the ANN index.
+FILTER_EXACT_ROWS = _int_env("MARS_FILTER_EXACT_ROWS") or 2048
+
+
+def _exact_search(vectors, embeddings, rows, k):
+    """Exact L2 nearest neighbours among `rows`, shaped like FAISS search ids (padded with -1)."""
+    ids = np.full((len(vectors), k), -1, dtype=np.int64)
+    take = min(k, len(rows))
+    if not take:
+        return ids
+    candidates = np.asarray(embeddings[rows], dtype=np.float32)
+    distances = (candidates * candidates).sum(axis=1) - 2.0 * (vectors @ candidates.T)
+    nearest = np.argsort(distances, axis=1, kind="stable")[:, :take]
+    ids[:, :take] = rows[nearest]
+    return ids
+
+
+def embedding_texts(movies_df):
+    """The text embedded for each catalog row; the embedding store is keyed by a checksum of these."""
+    # --- IMPORTANT CHANGE HERE: Combine 'Generated_Plot' AND 'Genre' for embeddings ---
+    if 'Generated_Plot' in movies_df.columns and not movies_df['Generated_Plot'].isnull().all() and \
+       'Genre' in movies_df.columns and not movies_df['Genre'].isnull().all():
+
+        # THIS IS THE KEY MODIFICATION
+        logger.info("Using 'Generated_Plot' and 'Genre' columns for embedding creation.")
+        return (movies_df['Generated_Plot'].fillna('') + ' | ' + movies_df['Genre'].fillna('')).tolist()
+
+    # Fallback to original text for embeddings if 'Generated_Plot' or Genre is not available or empty
+    logger.warning("Falling back to Title, Genre, Star Cast, Director for embeddings as 'Generated_Plot' or 'Genre' are not found or empty.")
+    return (movies_df['Title'].fillna('') + ' | ' + \
+            movies_df['Genre'].fillna('') + ' | ' + \
+            movies_df['Star Cast'].fillna('') + ' | ' + \
+            movies_df['Director'].fillna('')).tolist()
+
+
 class MovieRetriever:
-    def __init__(self, csv_path="data/imdb_cleaned.csv", embedding_path="embeddings/imdb_embeddings.csv", index_path="vectorstore/imdb_faiss.index"):
+    def __init__(self, csv_path="data/imdb_cleaned.csv", embedding_path="embeddings/imdb_embeddings.npy", index_path="vectorstore/imdb_faiss.index",
+                 legacy_embedding_path="embeddings/imdb_embeddings.csv", query_cache_size=2048, query_cache_ttl=3600.0,
+                 index_type=None, nprobe=None, ef_search=None, mmap_index=None, codec=None, drop_raw_embeddings=None):
         self.csv_path = csv_path
         self.embedding_path = embedding_path
-        self.index_path = index_path
+        # Index backend and its query-time knobs; see storage/ann_index.py and benchmarks/ann_benchmark.py.
+        self.index_type = index_type or os.getenv("MARS_INDEX_TYPE", "flat")
+        self.nprobe = nprobe or _int_env("MARS_NPROBE")
+        self.ef_search = ef_search or _int_env("MARS_EF_SEARCH")
+        # How the index stores vectors (float32, fp16, int8 or pq); see benchmarks/quantization_benchmark.py.
+        self.codec = resolve_codec(self.index_type, codec or os.getenv("MARS_VECTOR_CODEC", "float32"))
+        self.index_path = index_path_for(index_path, self.index_type, self.codec)
+        # Serve the index memory-mapped from its file, shared by every worker process (see gunicorn.conf.py).
+        self.mmap_index = mmap_index if mmap_index is not None else os.getenv("MARS_INDEX_MMAP", "0") == "1"
+        # Once the index is ready, read stored vectors back from it instead of keeping the raw matrix mapped too.
+        self.drop_raw_embeddings = (drop_raw_embeddings if drop_raw_embeddings is not None
+                                    else os.getenv("MARS_DROP_RAW_EMBEDDINGS", "0") == "1")
+        self.legacy_embedding_path = legacy_embedding_path
+        self.is_warm = False
+        self._refresh_lock = threading.Lock()
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl_seconds=query_cache_ttl)
 
         logger.info("🔄 Loading movie dataset for vector store...")
-        self.movies_df = pd.read_csv(self.csv_path)
+        # Shared with storage/movie_data_access.py, so the catalog is parsed once per process.
+        self.catalog = get_catalog(self.csv_path)
 
         logger.info("🔄 Loading sentence transformer model...")
-        self.model = SentenceTransformer("all-MiniLM-L12-v2")
+        # Imported here so that importing this module does not pull in torch.
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME)
 
         logger.info("🔄 Loading or creating embeddings...")
         self.embeddings = self._load_or_create_embeddings()
 
         logger.info("🔄 Creating FAISS index...")
         self.index = self._load_or_create_faiss_index()
+        self.embeddings = self._serving_vectors(self.embeddings, self.index)
         logger.info("✅ MovieRetriever initialized successfully.")
 
+    @property
+    def movies_df(self):
+        return self.catalog.df
+
+    def _embedding_texts(self):
+        return embedding_texts(self.movies_df)
+
     def _load_or_create_embeddings(self):
-        if os.path.exists(self.embedding_path):
-            return pd.read_csv(self.embedding_path).values
-        else:
-            # --- IMPORTANT CHANGE HERE: Combine 'Generated_Plot' AND 'Genre' for embeddings ---
-            if 'Generated_Plot' in self.movies_df.columns and not self.movies_df['Generated_Plot'].isnull().all() and \
-               'Genre' in self.movies_df.columns and not self.movies_df['Genre'].isnull().all():
-                
-                # THIS IS THE KEY MODIFICATION
-                descriptive_texts = (self.movies_df['Generated_Plot'].fillna('') + ' | ' + self.movies_df['Genre'].fillna('')).tolist()
-                logger.info("Using 'Generated_Plot' and 'Genre' columns for embedding creation.")
-            else:
-                # Fallback to original text for embeddings if 'Generated_Plot' or Genre is not available or empty
-                descriptive_texts = (self.movies_df['Title'].fillna('') + ' | ' + \
-                                     self.movies_df['Genre'].fillna('') + ' | ' + \
-                                     self.movies_df['Star Cast'].fillna('') + ' | ' + \
-                                     self.movies_df['Director'].fillna('')).tolist()
-                logger.warning("Falling back to Title, Genre, Star Cast, Director for embeddings as 'Generated_Plot' or 'Genre' are not found or empty.")
-
-            embeddings = self.model.encode(descriptive_texts, show_progress_bar=True)
-            os.makedirs(os.path.dirname(self.embedding_path), exist_ok=True)
-            pd.DataFrame(embeddings).to_csv(self.embedding_path, index=False)
+        descriptive_texts = self._embedding_texts()
+        checksum = catalog_checksum(descriptive_texts)
+        hashes = row_hashes(descriptive_texts)
+        # What the FAISS index must be built from; each index file records the
+        # checksum and row hashes it was built from, compared on load.
+        self._checksum, self._row_hashes = checksum, hashes
+
+        migrate_csv_embeddings(self.legacy_embedding_path, self.embedding_path, MODEL_NAME, checksum, len(descriptive_texts), hashes)
+        embeddings = load_embeddings(self.embedding_path, MODEL_NAME, checksum)
+        if embeddings is not None:
+            if load_row_hashes(self.embedding_path) is None:
+                save_row_hashes(self.embedding_path, hashes)
             return embeddings
 
+        embeddings = self._reembed_changed_rows(descriptive_texts, hashes)
+        save_embeddings(self.embedding_path, embeddings, MODEL_NAME, checksum, hashes)
+        # Re-open through mmap so every process shares the same page-cache copy.
+        return load_embeddings(self.embedding_path, MODEL_NAME, checksum)
+
+    def _reembed_changed_rows(self, descriptive_texts, hashes):
+        """
+        Encodes only rows whose text has no vector in the previous store.
+        Vectors are matched by content hash, so edited, inserted and reordered
+        rows all reuse whatever was already encoded.
+        """
+        previous = load_previous_store(self.embedding_path, MODEL_NAME)
+        if previous is None:
+            logger.info(f"🔄 Encoding all {len(descriptive_texts)} movies...")
+            return self.model.encode(descriptive_texts, show_progress_bar=True)
+
+        old_embeddings, old_hashes = previous
+        old_row_by_hash = {int(h): i for i, h in enumerate(old_hashes)}
+        source_rows = np.array([old_row_by_hash.get(int(h), -1) for h in hashes], dtype=np.int64)
+        to_encode = np.flatnonzero(source_rows < 0)
+        logger.info(f"🔄 Catalog changed: re-encoding {len(to_encode)} of {len(descriptive_texts)} movies.")
+
+        embeddings = np.empty((len(descriptive_texts), old_embeddings.shape[1]), dtype=np.float32)
+        reused = np.flatnonzero(source_rows >= 0)
+        embeddings[reused] = old_embeddings[source_rows[reused]]
+        if len(to_encode):
+            embeddings[to_encode] = self.model.encode([descriptive_texts[i] for i in to_encode], show_progress_bar=True)
+        return embeddings
+
+    def _stale_index_rows(self):
+        """
+        Rows the stored index at `index_path` must re-add to match the current
+        embeddings, and how many rows it was built over; None if it can't be
+        brought up to date and must be rebuilt (no build metadata, or built
+        with another model). Each index type/codec has its own file, so this
+        is decided per index file, not from whether the embedding store
+        changed in this run: another configuration may already have updated
+        the store past this index.
+        """
+        meta = read_index_meta(self.index_path)
+        if meta is None or meta.get("model_name") != MODEL_NAME:
+            return None
+        if meta.get("catalog_checksum") == self._checksum:
+            return np.empty(0, dtype=np.int64), meta.get("rows")
+        # The ids in the index are row numbers, so a row must be re-added if its content changed or moved.
+        old_hashes = load_row_hashes(self.index_path)
+        if old_hashes is None:
+            return None
+        return changed_rows(old_hashes, self._row_hashes), len(old_hashes)
+
+    def _save_index(self, index):
+        """Writes the index, then the row hashes and checksum it now reflects."""
+        write_index(index, self.index_path)
+        save_row_hashes(self.index_path, self._row_hashes)
+        write_index_meta(self.index_path, {"model_name": MODEL_NAME, "catalog_checksum": self._checksum,
+                                           "rows": len(self._row_hashes)})
+
     def _load_or_create_faiss_index(self):
         dim = self.embeddings.shape[1]
+        index = None
         if os.path.exists(self.index_path):
-            return faiss.read_index(self.index_path)
-        else:
-            index = faiss.IndexFlatL2(dim)
-            index.add(self.embeddings.astype(np.float32))
-            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-            faiss.write_index(index, self.index_path)
-            return index
-
-    def search(self, query, top_k=5):
-        query_embedding = self.model.encode([query])
-        _, indices = self.index.search(np.array(query_embedding).astype(np.float32), top_k)
-        results = self.movies_df.iloc[indices[0]]
-        return results.to_dict(orient="records")
-
-movie_retriever_instance = MovieRetriever()
\ No newline at end of file
+            index = read_index(self.index_path, mmap=self.mmap_index)
+            stale = self._stale_index_rows()
+            if index.d != dim or index_type_of(index) != self.index_type or codec_of(index) != self.codec or stale is None:
+                index = None
+            elif len(stale[0]) or index.ntotal != self.embeddings.shape[0]:
+                stale_rows, previous_rows = stale
+                # A memory-mapped index is read-only, so updates go through a private copy.
+                if self.mmap_index:
+                    index = read_index(self.index_path)
+                if update_rows(index, self.embeddings, stale_rows, previous_rows):
+                    logger.info(f"✅ Updated {len(stale_rows)} rows of the FAISS index in place.")
+                    self._save_index(index)
+                    if self.mmap_index:
+                        index = read_index(self.index_path, mmap=True)
+                else:
+                    index = None
+            if index is None:
+                logger.warning("⚠️ FAISS index does not match the embedding store; rebuilding.")
+        if index is None:
+            index = build_index(self.embeddings, self.index_type, ids=np.arange(self.embeddings.shape[0]), codec=self.codec)
+            self._save_index(index)
+            if self.mmap_index:
+                index = read_index(self.index_path, mmap=True)
+        return configure_search(index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def _serving_vectors(self, embeddings, index):
+        """
+        The row vectors used at query time (personalization, exact filtered
+        search): the mapped embedding store, or with `drop_raw_embeddings`
+        the index's own copy, so only one copy of the catalog is resident.
+        """
+        if not self.drop_raw_embeddings:
+            return embeddings
+        logger.info(f"✅ Serving stored vectors from the '{self.codec}' index; raw embeddings released.")
+        return IndexVectors(index)
+
+    def refresh(self):
+        """
+        Re-reads the catalog and re-encodes only new or changed rows, e.g.
+        after `generate_plots.py` rewrote some plots. The new dataset,
+        embeddings and index are swapped in together once they are ready.
+        """
+        with self._refresh_lock:
+            retriever = copy.copy(self)
+            retriever.catalog = get_catalog(self.csv_path, reload=True)
+            retriever.embeddings = retriever._load_or_create_embeddings()
+            retriever.index = retriever._load_or_create_faiss_index()
+            retriever.embeddings = retriever._serving_vectors(retriever.embeddings, retriever.index)
+            self.catalog, self.embeddings, self.index = retriever.catalog, retriever.embeddings, retriever.index
+        logger.info("✅ MovieRetriever refreshed.")
+
+    def encode_queries(self, queries):
+        """Encodes many queries with a single `model.encode` call for the cache misses."""
+        vectors = [self.query_cache.get(MODEL_NAME, query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        QUERY_CACHE_REQUESTS.inc(len(queries) - len(missing), result="hit")
+        QUERY_CACHE_REQUESTS.inc(len(missing), result="miss")
+        if missing:
+            # Encode each distinct missing query once, even if it repeats within the batch
+            # with other casing or spacing (the cache treats those as the same query).
+            texts = {}
+            for i in missing:
+                texts.setdefault(normalize_query(queries[i]), queries[i])
+            with timed(ENCODE_SECONDS, stage="encode"):
+                encoded = dict(zip(texts, self.model.encode(list(texts.values()))))
+            for key, vector in encoded.items():
+                self.query_cache.put(MODEL_NAME, texts[key], vector)
+            for i in missing:
+                vectors[i] = encoded[normalize_query(queries[i])]
+        return np.asarray(vectors, dtype=np.float32)
+
+    def encode_query(self, query):
+        """Encodes a query, reusing cached vectors for repeated text."""
+        return self.encode_queries([query])[0]
+
+    def _search(self, vectors, k, mask=None, kind="batch"):
+        """
+        Ids of the `k` nearest rows per query vector, restricted to the rows
+        set in `mask` if given. A mask matching few rows is scored exactly
+        over them; otherwise it becomes a FAISS ID selector, so the index
+        skips non-matching rows during the search instead of over-fetching.
+        """
+        with timed(FAISS_SEARCH_SECONDS, stage="faiss", kind=kind):
+            if mask is None:
+                return self.index.search(vectors, k)[1]
+            rows = np.flatnonzero(mask)
+            if len(rows) <= FILTER_EXACT_ROWS:
+                return _exact_search(vectors, self.embeddings, rows, k)
+            # The selector reads `bits` through a raw pointer: keep it referenced until the search returns.
+            bits = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bits))
+            return self.index.search(vectors, k, params=search_parameters(self.index, selector))[1]
+
+    def search_batch(self, queries, top_k=5, filters=None):
+        """
+        Runs one encode and one FAISS search for a list of queries; returns one
+        result list per query. `filters` (a `MetadataFilter`) restricts results
+        to matching movies.
+        """
+        if not queries:
+            return []
+        catalog = self.catalog
+        query_embeddings = self.encode_queries(list(queries))
+        mask = catalog.metadata_index.mask(filters)
+        indices = self._search(query_embeddings, top_k, mask, kind="batch" if mask is None else "filtered")
+        records = catalog.records
+        return [[records[i] for i in row if i >= 0] for row in indices]
+
+    def search(self, query, top_k=5, filters=None):
+        return self.search_batch([query], top_k=top_k, filters=filters)[0]
+
+    def personalized_search(self, query, liked_ids=(), disliked_ids=(), exclude_titles=(), top_k=5,
+                            taste_weight=0.5, dislike_weight=0.5, pool_factor=4, filters=None):
+        """
+        Recommends `top_k` unseen movies for `query`, personalized in embedding
+        space: the stored vectors of liked/disliked movies shape the search
+        vector and the re-ranking, so no extra text is encoded per liked movie.
+        Liked, disliked and `exclude_titles` (normalized titles) are never
+        returned; the search over-fetches until enough unseen movies remain.
+        `filters` (a `MetadataFilter`) restricts candidates to matching movies.
+        """
+        liked_ids = sorted(set(liked_ids))
+        disliked_ids = sorted(set(disliked_ids))
+        liked = np.asarray(self.embeddings[liked_ids], dtype=np.float32) if liked_ids else None
+        disliked = np.asarray(self.embeddings[disliked_ids], dtype=np.float32) if disliked_ids else None
+
+        query_vector = self.encode_query(query)
+        search_vector = blended_query(query_vector, liked, disliked, taste_weight, dislike_weight).reshape(1, -1)
+
+        excluded_ids = set(liked_ids) | set(disliked_ids)
+        seen_titles = set(exclude_titles)
+        seen_titles.update(normalize_title(self.catalog.records[i]["Title"]) for i in excluded_ids)
+        pool_size = top_k * pool_factor
+        mask = self.catalog.metadata_index.mask(filters)
+        searchable = self.index.ntotal if mask is None else int(np.count_nonzero(mask))
+        if not searchable:
+            return []
+        fetch_k = min(searchable, pool_size + len(excluded_ids))
+        candidates = []
+        while True:
+            indices = self._search(search_vector, fetch_k, mask, kind="personalized")
+            candidates, titles = [], set(seen_titles)
+            for i in indices[0]:
+                if i < 0 or i in excluded_ids:
+                    continue
+                title = normalize_title(self.catalog.records[i]["Title"])
+                if title in titles:
+                    continue
+                titles.add(title)
+                candidates.append(int(i))
+            if len(candidates) >= pool_size or fetch_k >= searchable:
+                break
+            fetch_k = min(searchable, fetch_k * 2)
+
+        if not candidates:
+            return []
+        scores = personalized_scores(np.asarray(self.embeddings[candidates], dtype=np.float32), query_vector,
+                                     liked, disliked, taste_weight, dislike_weight)
+        ranked = np.asarray(candidates)[np.argsort(-scores, kind="stable")[:top_k]]
+        return [self.catalog.records[i] for i in ranked]
+
+    def warm_up(self):
+        """Runs a dummy encode and search so the first real request doesn't pay for lazy initialization."""
+        self.search("warm-up query", top_k=1)
+        # The dummy query shouldn't count towards cache statistics.
+        self.query_cache.clear()
+        self.is_warm = True
+        logger.info("✅ MovieRetriever warmed up.")
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_movie_retriever() -> MovieRetriever:
+    """
+    Returns the process-wide MovieRetriever, building it on first use.
+    Loading the CSV, the SentenceTransformer and the FAISS index takes
+    seconds, so it is deferred until a tool actually needs it (or until
+    `warm_up_retriever` is called at startup).
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = MovieRetriever()
+    return _retriever
+
+
+_batcher = None
+
+
+def get_search_batcher() -> SearchBatcher:
+    """Returns the process-wide micro-batcher in front of the shared retriever."""
+    global _batcher
+    if _batcher is None:
+        retriever = get_movie_retriever()
+        with _retriever_lock:
+            if _batcher is None:
+                _batcher = SearchBatcher(retriever)
+    return _batcher
+
+
+def is_retriever_ready() -> bool:
+    return _retriever is not None and _retriever.is_warm
+
+
+def warm_up_retriever() -> MovieRetriever:
+    """Builds the retriever if needed and runs a dummy encode + search."""
+    retriever = get_movie_retriever()
+    if not retriever.is_warm:
+        retriever.warm_up()
+    return retriever
+
+
+def preload_for_fork() -> MovieRetriever:
+    """
+    Loads the catalog (with its keyword, title and metadata indexes), the
+    embedding model, the embeddings and the FAISS index in the parent of a
+    pre-forking server (see gunicorn.conf.py), so workers inherit one
+    copy-on-write copy instead of each loading their own. Nothing is encoded
+    or searched here: torch and the tool/search thread pools must first start
+    in the workers, since threads do not survive fork.
+    """
+    retriever = get_movie_retriever()
+    _ = retriever.catalog.keyword_index
+    _ = retriever.catalog.title_index
+    _ = retriever.catalog.metadata_index
+    # Move everything loaded so far out of the collector's reach, so GC passes in
+    # the workers don't write to (and un-share) the inherited objects.
+    gc.collect()
+    gc.freeze()
+    logger.info(f"✅ Preloaded the retriever for forking ({gc.get_freeze_count()} objects frozen).")
+    return retriever
+
+
+def __getattr__(name):
+    # Backwards compatibility: `movie_retriever_instance` used to be built at import time.
+    if name == "movie_retriever_instance":
+        return get_movie_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    # Explicit rebuild: brings the embedding store and FAISS index in line with
+    # the catalog, re-encoding only rows whose text changed.
+    MovieRetriever()
@@ -0,0 +1,93 @@
+import hashlib
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.catalog import DEFAULT_CSV_PATH, get_catalog
+
+DIM = 32
+GENRES = ["Drama", "Comedy", "Action, Thriller", "Sci-Fi", "Horror", "Romance, Drama"]
+CERTIFICATES = ["G", "PG", "PG-13", "R"]
+
+
+class FakeSentenceTransformer:
+    """Deterministic stand-in for the embedding model: a unit vector seeded by each text's hash."""
+
+    encoded = 0
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def encode(self, texts, show_progress_bar=False, **kwargs):
+        FakeSentenceTransformer.encoded += len(texts)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.md5(str(text).encode("utf-8")).digest()[:4], "little")
+            vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.array(vectors, dtype=np.float32)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Installs the fake model as `sentence_transformers` and resets its encode counter."""
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    FakeSentenceTransformer.encoded = 0
+    return FakeSentenceTransformer
+
+
+def make_catalog_df(num_rows: int = 40) -> pd.DataFrame:
+    """A small catalog with every filterable column, a remade title and a duplicated row."""
+    rows = []
+    for i in range(num_rows):
+        rows.append({
+            "Title": f"Movie {i}",
+            "IMDb Rating": round(5 + (i % 50) / 10, 1),
+            "Year": 1970 + i,
+            "Certificates": CERTIFICATES[i % len(CERTIFICATES)],
+            "Genre": GENRES[i % len(GENRES)],
+            "Director": f"Director {i % 7}",
+            "Star Cast": f"Actor {i}",
+            "MetaScore": 40 + i,
+            "Duration (minutes)": 80 + 3 * i,
+            "Generated_Plot": f"Plot number {i} about {GENRES[i % len(GENRES)].lower()} and more.",
+        })
+    rows[1].update({"Title": "Dune", "Year": 1984, "Generated_Plot": "A desert planet feud in the eighties."})
+    rows[2].update({"Title": "Dune", "Year": 2021, "Generated_Plot": "A desert planet feud, filmed again."})
+    rows[3] = dict(rows[0])
+    return pd.DataFrame(rows)
+
+
+def make_retriever(tmp_path, csv_path, index_type="flat", codec="float32", **kwargs):
+    """A MovieRetriever whose embedding store and index files live under `tmp_path`."""
+    from storage.vector_db import MovieRetriever
+
+    return MovieRetriever(csv_path=str(csv_path), embedding_path=str(tmp_path / "embeddings.npy"),
+                          index_path=str(tmp_path / "index.faiss"), legacy_embedding_path=str(tmp_path / "legacy.csv"),
+                          index_type=index_type, codec=codec, mmap_index=False, drop_raw_embeddings=False, **kwargs)
+
+
+def write_catalog(path, df: pd.DataFrame):
+    """Writes `df` as the catalog CSV and reloads the process-wide catalog for it."""
+    df.to_csv(path, index=False)
+    return get_catalog(str(path), reload=True)
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    path = tmp_path / "catalog.csv"
+    write_catalog(path, make_catalog_df())
+    return path
+
+
+@pytest.fixture
+def default_catalog(tmp_path, monkeypatch):
+    """The test catalog at the default path, where the tools and chat-time lookups find it."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    return write_catalog(DEFAULT_CSV_PATH, make_catalog_df())
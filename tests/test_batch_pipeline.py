@@ -0,0 +1,136 @@
+import asyncio
+import functools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import generate_plots
+from generate_plots import FakePlotClient, pending_rows
+from pipelines.batch import JsonlCheckpoint, TokenBucket, run_batch
+from storage.catalog import movie_id
+
+
+class ScriptedPlotClient(FakePlotClient):
+    """FakePlotClient whose calls for a title first go through a script: an exception, "" or None (the canned plot)."""
+
+    def __init__(self, script=None, hold_after=None):
+        super().__init__(latency=0.0)
+        self.script = {title: list(steps) for title, steps in (script or {}).items()}
+        self.calls = []
+        self.hold_after = hold_after
+        self.held = asyncio.Event()
+
+    async def generate(self, prompt):
+        title = prompt.split("Title: ", 1)[1].split("\n", 1)[0]
+        self.calls.append(title)
+        if self.hold_after is not None and len(self.calls) > self.hold_after:
+            self.held.set()
+            await asyncio.Event().wait()  # Never answers: the run is interrupted here.
+        steps = self.script.get(title)
+        step = steps.pop(0) if steps else None
+        if isinstance(step, Exception):
+            raise step
+        if step is not None:
+            return step
+        return await super().generate(prompt)
+
+
+def catalog_df(num_rows=6):
+    return pd.DataFrame({
+        "Title": [f"Movie {i}" for i in range(num_rows)],
+        "Year": [2000 + i for i in range(num_rows)],
+        "Genre": "Drama",
+        "Director": "Someone",
+        "Star Cast": "Actors",
+        "Generated_Plot": pd.Series([None] * num_rows, dtype=object),
+    })
+
+
+def run_generation(df, client, checkpoint, **kwargs):
+    return asyncio.run(generate_plots.generate_plots(df, client, checkpoint, concurrency=2, rate=0, burst=1,
+                                                     max_retries=kwargs.pop("max_retries", 2), **kwargs))
+
+
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(generate_plots, "run_batch", functools.partial(run_batch, backoff=0))
+
+
+def test_failed_and_empty_responses_are_retried():
+    client = ScriptedPlotClient({"Movie 0": [RuntimeError("simulated API error"), "   "]})
+    results = {}
+
+    async def process(title):
+        return (await client.generate(f"Title: {title}\n")).strip() or None
+
+    stats = asyncio.run(run_batch(["Movie 0", "Movie 1"], process, results.__setitem__, concurrency=2,
+                                  max_retries=3, backoff=0))
+    assert client.calls.count("Movie 0") == 3
+    assert (stats.succeeded, stats.failed, stats.retries) == (2, 0, 2)
+    assert results["Movie 0"] == "A placeholder plot for Movie 0, generated offline."
+
+
+def test_a_row_failing_every_attempt_stays_pending(tmp_path, monkeypatch):
+    no_backoff(monkeypatch)
+    df = catalog_df()
+    df.loc[4, "Generated_Plot"] = "No plot generated."  # A failure marker from an older run is retried.
+    checkpoint = JsonlCheckpoint(str(tmp_path / "plots.jsonl"))
+    client = ScriptedPlotClient({"Movie 2": [RuntimeError("down")] * 3})
+    stats = run_generation(df, client, checkpoint, max_retries=2)
+
+    assert (stats.succeeded, stats.failed) == (5, 1)
+    assert client.calls.count("Movie 2") == 3
+    assert pending_rows(df).tolist() == [2]
+    assert df.loc[4, "Generated_Plot"].startswith("A placeholder plot for Movie 4")
+    assert movie_id("Movie 2", 2002) not in checkpoint.load()
+    assert len(checkpoint.load()) == 5
+
+
+def test_an_interrupted_run_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    no_backoff(monkeypatch)
+    path = str(tmp_path / "plots.jsonl")
+    first = ScriptedPlotClient(hold_after=3)
+
+    async def interrupted_run():
+        task = asyncio.create_task(generate_plots.generate_plots(
+            catalog_df(), first, JsonlCheckpoint(path), concurrency=1, rate=0, burst=1, max_retries=0))
+        await first.held.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(interrupted_run())
+    saved = JsonlCheckpoint(path).load()
+    assert len(saved) == 3  # Flushed on the way out, although flush_every wasn't reached.
+
+    df = catalog_df()  # The CSV was never rewritten: resume from a fresh copy.
+    second = ScriptedPlotClient()
+    stats = run_generation(df, second, JsonlCheckpoint(path))
+    assert stats.succeeded == 3 and len(second.calls) == 3
+    assert not set(second.calls) & set(first.calls[:3])
+    assert pending_rows(df).empty
+
+
+def test_a_torn_last_line_is_ignored_and_not_reused(tmp_path):
+    path = tmp_path / "plots.jsonl"
+    path.write_text(json.dumps({"key": 1, "value": "First."}) + "\n" + '{"key": 2, "val', encoding="utf-8")
+    checkpoint = JsonlCheckpoint(str(path), flush_every=1)
+    assert checkpoint.load() == {1: "First."}
+    checkpoint.append(3, "Third.")
+    assert JsonlCheckpoint(str(path)).load() == {1: "First.", 3: "Third."}
+
+
+def test_token_bucket_limits_the_rate_after_the_burst():
+    bucket = TokenBucket(rate=50, burst=2)
+
+    async def acquire_all():
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # Two permits come from the burst; the other four are paced at 50/s.
+    assert asyncio.run(acquire_all()) >= 4 / 50 * 0.9
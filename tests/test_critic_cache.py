@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from pipelines.critic_themes import StubCriticClient, analyze_catalog
+from storage.catalog import movie_id
+from storage.critic_cache import CriticCache
+from storage.theme_index import THEME_COLUMNS, precomputed_analysis_for_title
+from tests.conftest import make_catalog_df
+
+
+def analysis(summary):
+    return {"themes": ["spice"], "genre_style": "Epic.", "summary": summary}
+
+
+@pytest.fixture
+def catalog(default_catalog):
+    return default_catalog
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CriticCache(db_path=str(tmp_path / "critic.db"))
+    yield cache
+    cache.close()
+
+
+def test_remakes_get_separate_entries(catalog, cache):
+    cache.put("Dune (1984)", analysis("Lynch"))
+    cache.put("Dune (2021)", analysis("Villeneuve"))
+    assert cache.title_key("Dune (1984)") == (cache.movie_key(movie_id("Dune", 1984)), "Dune")
+    assert cache.get("dune (2021)")["summary"] == "Villeneuve"
+    assert cache.get("Dune (1984)")["summary"] == "Lynch"
+    assert cache.get_movie(movie_id("Dune", 2021))["summary"] == "Villeneuve"
+    # Without a year the first release in the catalog is meant.
+    assert cache.get("Dune")["summary"] == "Lynch"
+
+
+def test_titles_outside_the_catalog_are_keyed_by_text(catalog, cache):
+    assert cache.title_key("Some Unknown Film") == ("some unknown film", "Some Unknown Film")
+    cache.put("Some Unknown Film", analysis("Unknown"))
+    assert cache.get("some unknown film")["summary"] == "Unknown"
+
+
+def test_invalid_analyses_are_not_cached(cache):
+    assert cache.put("Anything", "not json") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_precomputed_analysis_resolves_the_release_year(catalog):
+    catalog.records[1].update({THEME_COLUMNS["summary"]: "Lynch", THEME_COLUMNS["themes"]: "[]"})
+    catalog.records[2].update({THEME_COLUMNS["summary"]: "Villeneuve", THEME_COLUMNS["themes"]: "[]"})
+    assert precomputed_analysis_for_title("Dune (2021)")["summary"] == "Villeneuve"
+    assert precomputed_analysis_for_title("Dune (1984)")["summary"] == "Lynch"
+
+
+class CountingClient(StubCriticClient):
+    def __init__(self):
+        super().__init__()
+        self.titles = []
+
+    async def analyze(self, record):
+        self.titles.append((record["Title"], record["Year"]))
+        return await super().analyze(record)
+
+
+def test_pipeline_calls_the_model_once_per_movie(catalog, cache):
+    df = make_catalog_df()  # Row 3 duplicates row 0; rows 1 and 2 are both "Dune".
+    client = CountingClient()
+    stats = asyncio.run(analyze_catalog(df, client, cache))
+    assert len(client.titles) == len(set(client.titles)) == 39
+    assert stats["analyzed"] == 39
+    assert df.at[3, THEME_COLUMNS["summary"]] == df.at[0, THEME_COLUMNS["summary"]]
+    assert df.at[1, THEME_COLUMNS["summary"]] != df.at[2, THEME_COLUMNS["summary"]]
+
+    # A resumed run is served entirely from the cache, each movie from its own entry.
+    resumed = make_catalog_df()
+    client = CountingClient()
+    stats = asyncio.run(analyze_catalog(resumed, client, cache))
+    assert client.titles == [] and stats["from_cache"] == 40
+    assert json.loads(resumed.at[2, THEME_COLUMNS["themes"]]) == json.loads(df.at[2, THEME_COLUMNS["themes"]])
+    assert resumed.at[2, THEME_COLUMNS["summary"]] == df.at[2, THEME_COLUMNS["summary"]]
+
+
+def test_hit_and_miss_counts_are_exact_under_concurrent_lookups(catalog, cache):
+    cache.put("Unknown Film", {"themes": [], "genre_style": "", "summary": "Fine."})
+
+    def lookups():
+        for _ in range(200):
+            cache.get("Unknown Film")
+            cache.get("Missing Film")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 1600
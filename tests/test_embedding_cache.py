@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from storage import embedding_cache
+from storage.embedding_cache import QueryEmbeddingCache, normalize_query
+from tests.conftest import make_retriever
+
+
+def vector(value):
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_queries_are_keyed_without_case_or_extra_spaces():
+    cache = QueryEmbeddingCache()
+    cache.put("model", "  Space   Opera ", vector(1))
+    assert normalize_query("  Space   Opera ") == "space opera"
+    np.testing.assert_array_equal(cache.get("model", "space opera"), vector(1))
+    assert cache.get("other-model", "space opera") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("m", "a", vector(1))
+    cache.put("m", "b", vector(2))
+    cache.get("m", "a")  # "b" is now the least recently used.
+    cache.put("m", "c", vector(3))
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None and cache.get("m", "c") is not None
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    cache = QueryEmbeddingCache(ttl_seconds=60)
+    cache.put("m", "a", vector(1))
+    now[0] += 59
+    assert cache.get("m", "a") is not None
+    now[0] += 2
+    assert cache.get("m", "a") is None
+    assert cache.stats() | {"hit_rate": None} == {"size": 0, "max_size": 2048, "hits": 1, "misses": 1,
+                                                  "evictions": 1, "hit_rate": None}
+
+
+def test_cached_vectors_are_read_only():
+    cache = QueryEmbeddingCache()
+    cache.put("m", "a", vector(1))
+    with pytest.raises(ValueError):
+        cache.get("m", "a")[0] = 5
+
+
+def test_retriever_encodes_each_distinct_query_once(tmp_path, catalog_csv, fake_model):
+    r = make_retriever(tmp_path, catalog_csv)
+    fake_model.encoded = 0
+    first = r.encode_queries(["Heist movie", "heist  MOVIE", "space"])
+    assert fake_model.encoded == 2
+    np.testing.assert_array_equal(first[0], first[1])
+    r.search("space opera")
+    r.search("Space Opera")
+    assert fake_model.encoded == 3
+    assert r.query_cache.stats()["hits"] == 1
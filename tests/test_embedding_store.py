@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from storage.embedding_store import changed_rows, load_embeddings, load_row_hashes, row_hashes, save_embeddings
+from tests.conftest import make_catalog_df, make_retriever as retriever, write_catalog
+
+
+def test_changed_rows_finds_edited_and_appended_rows():
+    old = row_hashes(["a", "b", "c", "d"])
+    new = row_hashes(["a", "B", "c", "d", "e", "f"])
+    assert changed_rows(old, new).tolist() == [1, 4, 5]
+
+
+def test_changed_rows_ignores_rows_dropped_from_the_end():
+    old = row_hashes(["a", "b", "c"])
+    assert changed_rows(old, row_hashes(["a", "b"])).tolist() == []
+
+
+def test_only_new_or_edited_rows_are_re_encoded(tmp_path, catalog_csv, fake_model):
+    first = retriever(tmp_path, catalog_csv)
+    assert fake_model.encoded == 40
+    previous = np.array(first.embeddings)
+
+    df = make_catalog_df()
+    df.loc[5, "Generated_Plot"] = "An entirely new plot."
+    df = df.iloc[::-1].reset_index(drop=True)  # Reordered rows keep their vectors.
+    write_catalog(catalog_csv, df)
+    fake_model.encoded = 0
+    second = retriever(tmp_path, catalog_csv)
+
+    assert fake_model.encoded == 1
+    edited = 39 - 5
+    unchanged = [row for row in range(40) if row != edited]
+    np.testing.assert_array_equal(np.asarray(second.embeddings)[unchanged], previous[::-1][unchanged])
+    assert load_row_hashes(str(tmp_path / "embeddings.npy")).tolist() == second._row_hashes.tolist()
+
+
+def test_unchanged_catalog_is_not_re_encoded(tmp_path, catalog_csv, fake_model):
+    retriever(tmp_path, catalog_csv)
+    fake_model.encoded = 0
+    retriever(tmp_path, catalog_csv)
+    assert fake_model.encoded == 0
+
+
+def test_saves_go_through_per_process_temp_files(tmp_path, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: (replaced.append(src), real_replace(src, dst)))
+    path = str(tmp_path / "emb.npy")
+    save_embeddings(path, np.ones((3, 4), dtype=np.float32), "model", "sum", hashes=row_hashes(["a", "b", "c"]))
+
+    assert replaced and all(src.endswith(f".{os.getpid()}.tmp") for src in replaced)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert load_embeddings(path, "model", "sum").shape == (3, 4)
@@ -0,0 +1,67 @@
+import pytest
+
+from manager_agent import fast_path
+from manager_agent.fast_path import classify, fast_path_stats, try_fast_path
+from storage.catalog import DEFAULT_CSV_PATH
+from storage.movie_data_access import get_rating_by_title
+from tests.conftest import make_catalog_df, write_catalog
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("What's the rating of Inception?", ("rating", "Inception", None)),
+    ("how good is the movie Heat rated?", ("rating", "Heat", None)),
+    ("plot of The Matrix", ("plot", "The Matrix", None)),
+    ("What is Dune about?", ("plot", "Dune", None)),
+    ("What's the IMDb rating for 'The Plot Against America'?", ("rating", "The Plot Against America", None)),
+    ("Summary for \"Schindler's List\"", ("plot", "Schindler's List", None)),
+])
+def test_simple_lookups_are_classified(message, expected):
+    assert classify(message) == expected
+
+
+@pytest.mark.parametrize("message, reason", [
+    ("Recommend something like Inception", "needs_agent"),
+    ("Compare the rating of 'Heat' and 'Ronin'", "several_titles"),
+    ("What's the plot and rating of Heat?", "needs_agent"),
+    ("Tell me something fun", "no_intent"),
+    ("'Heat': rating, storyline?", "ambiguous_intent"),
+    ("What's the rating?", "no_title"),
+])
+def test_anything_else_goes_to_the_agents(message, reason):
+    assert classify(message) == (None, None, reason)
+
+
+def fallbacks(reason):
+    return fast_path_stats.snapshot()["fallback_reasons"].get(reason, 0)
+
+
+def test_confident_matches_are_answered_from_the_catalog(default_catalog):
+    rating = try_fast_path("What's the rating of Movie 10?")
+    assert (rating.intent, rating.title, rating.confidence) == ("rating", "Movie 10", 1.0)
+    assert "6.0/10" in rating.text
+    plot = try_fast_path("What is Dune about?")
+    assert plot.intent == "plot" and "A desert planet feud in the eighties." in plot.text
+
+
+def test_weak_title_matches_fall_back_to_the_agents(default_catalog, monkeypatch):
+    confidence = get_rating_by_title("Movi 1O")["confidence"]
+    assert confidence < 1.0
+    monkeypatch.setattr(fast_path, "MIN_CONFIDENCE", confidence + 0.01)
+    before = fallbacks("low_confidence")
+    assert try_fast_path("What's the rating of Movi 1O?") is None
+    assert fallbacks("low_confidence") == before + 1
+
+    monkeypatch.setattr(fast_path, "MIN_CONFIDENCE", confidence)
+    assert try_fast_path("What's the rating of Movi 1O?").confidence == confidence
+
+
+def test_missing_plots_fall_back_to_the_agents(default_catalog):
+    df = make_catalog_df()
+    df.loc[10, "Generated_Plot"] = "No plot generated."
+    write_catalog(DEFAULT_CSV_PATH, df)
+    assert try_fast_path("plot of Movie 10") is None
+
+
+def test_the_fast_path_can_be_disabled(default_catalog, monkeypatch):
+    monkeypatch.setattr(fast_path, "FAST_PATH_ENABLED", False)
+    assert try_fast_path("What's the rating of Movie 10?") is None
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from storage import vector_db
+from storage.ann_index import build_index, meta_path_for, read_index_meta, update_rows
+from tests.conftest import make_catalog_df, make_retriever as retriever, write_catalog
+
+
+def nearest(r, row):
+    distances, ids = r.index.search(np.ascontiguousarray(r.embeddings[row:row + 1], dtype=np.float32), 1)
+    return int(ids[0][0]), float(distances[0][0])
+
+
+def edit_plot(csv_path, row, plot):
+    df = make_catalog_df()
+    df.loc[row, "Generated_Plot"] = plot
+    write_catalog(csv_path, df)
+
+
+def forbid_rebuild(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("index was rebuilt instead of updated")
+    monkeypatch.setattr(vector_db, "build_index", fail)
+
+
+def test_index_records_what_it_was_built_from(tmp_path, catalog_csv, fake_model):
+    r = retriever(tmp_path, catalog_csv)
+    meta = read_index_meta(r.index_path)
+    assert meta == {"model_name": vector_db.MODEL_NAME, "catalog_checksum": r._checksum, "rows": 40}
+
+
+def test_unchanged_index_is_reused(tmp_path, catalog_csv, fake_model, monkeypatch):
+    retriever(tmp_path, catalog_csv)
+    forbid_rebuild(monkeypatch)
+    assert retriever(tmp_path, catalog_csv).index.ntotal == 40
+
+
+def test_edited_rows_are_updated_in_place(tmp_path, catalog_csv, fake_model, monkeypatch):
+    retriever(tmp_path, catalog_csv)
+    edit_plot(catalog_csv, 7, "A lighthouse keeper and a storm.")
+    forbid_rebuild(monkeypatch)
+    r = retriever(tmp_path, catalog_csv)
+    assert r.index.ntotal == 40
+    assert nearest(r, 7) == (7, pytest.approx(0.0, abs=1e-5))
+    assert read_index_meta(r.index_path)["catalog_checksum"] == r._checksum
+
+
+def test_index_of_another_type_does_not_hide_catalog_changes(tmp_path, catalog_csv, fake_model):
+    # flat is built, the catalog changes, hnsw brings the embedding store up
+    # to date, then flat loads again: its file still holds the old row 0.
+    retriever(tmp_path, catalog_csv, index_type="flat")
+    edit_plot(catalog_csv, 0, "A completely different plot about a submarine crew.")
+    retriever(tmp_path, catalog_csv, index_type="hnsw")
+    r = retriever(tmp_path, catalog_csv, index_type="flat")
+    assert nearest(r, 0) == (0, pytest.approx(0.0, abs=1e-5))
+
+
+def test_hnsw_index_is_rebuilt_after_an_edit(tmp_path, catalog_csv, fake_model):
+    retriever(tmp_path, catalog_csv, index_type="hnsw")
+    edit_plot(catalog_csv, 5, "A chess match that lasts a century.")
+    r = retriever(tmp_path, catalog_csv, index_type="hnsw")
+    assert nearest(r, 5) == (5, pytest.approx(0.0, abs=1e-5))
+
+
+@pytest.mark.parametrize("num_rows", [44, 30])
+def test_appended_and_dropped_rows_are_applied(tmp_path, catalog_csv, fake_model, monkeypatch, num_rows):
+    retriever(tmp_path, catalog_csv)
+    write_catalog(catalog_csv, make_catalog_df(num_rows))
+    forbid_rebuild(monkeypatch)
+    r = retriever(tmp_path, catalog_csv)
+    assert r.index.ntotal == num_rows
+    assert nearest(r, num_rows - 1) == (num_rows - 1, pytest.approx(0.0, abs=1e-5))
+
+
+def test_index_without_build_metadata_is_rebuilt(tmp_path, catalog_csv, fake_model, monkeypatch):
+    r = retriever(tmp_path, catalog_csv)
+    os.remove(meta_path_for(r.index_path))
+    built = []
+    real_build = vector_db.build_index
+    monkeypatch.setattr(vector_db, "build_index", lambda *a, **k: built.append(1) or real_build(*a, **k))
+    retriever(tmp_path, catalog_csv)
+    assert built == [1]
+    assert read_index_meta(r.index_path) is not None
+
+
+def vectors(num_rows, dim=16, seed=0):
+    data = np.random.default_rng(seed).standard_normal((num_rows, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("codec", ["float32", "fp16", "int8"])
+def test_update_rows_replaces_vectors(codec):
+    old, new = vectors(100), vectors(100)
+    index = build_index(old, "flat", ids=np.arange(100), codec=codec)
+    changed = np.array([3, 50])
+    new_embeddings = old.copy()
+    new_embeddings[changed] = new[changed]
+    assert update_rows(index, new_embeddings, changed, previous_rows=100)
+    _, ids = index.search(new_embeddings[changed], 1)
+    assert ids[:, 0].tolist() == [3, 50]
+    assert index.ntotal == 100
+
+
+def test_update_rows_declines_what_needs_a_rebuild():
+    data = vectors(100)
+    flat = build_index(data, "flat", ids=np.arange(100))
+    assert not update_rows(build_index(data, "hnsw", ids=np.arange(100)), data, np.array([1]), 100)
+    assert not update_rows(build_index(data, "flat"), data, np.array([1]), 100)  # Not ID-mapped.
+    assert not update_rows(flat, data, np.array([1]), previous_rows=99)  # Built over another catalog.
+    assert not update_rows(flat, data, np.arange(60), 100)  # Most rows changed.
+    assert flat.ntotal == 100
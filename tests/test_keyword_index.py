@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from storage.keyword_index import KeywordIndex, tokenize
+from storage.movie_data_access import search_movies_by_keywords
+
+
+def index_for(rows):
+    return KeywordIndex.from_dataframe(pd.DataFrame(rows))
+
+
+def test_tokenize_splits_concatenated_cast_names():
+    assert tokenize("Louie LeonardoChad Allen") == ["louie", "leonardo", "chad", "allen"]
+    assert tokenize(None) == []
+
+
+def test_title_hits_outrank_genre_hits():
+    index = index_for([
+        {"Title": "Quiet Days", "Genre": "Western", "Director": "", "Star Cast": ""},
+        {"Title": "Western Stars", "Genre": "Drama", "Director": "", "Star Cast": ""},
+    ])
+    assert [doc for doc, _ in index.search("western")] == [1, 0]
+
+
+def test_rare_terms_weigh_more_and_scores_add_up():
+    rows = [{"Title": f"Drama {i}", "Genre": "Drama", "Director": "", "Star Cast": ""} for i in range(10)]
+    rows[4]["Director"] = "Kubrick"
+    hits = index_for(rows).search("drama kubrick")
+    assert hits[0][0] == 4
+    assert hits[0][1] > hits[1][1]
+
+
+def test_results_are_capped_at_top_k_best_first():
+    rows = [{"Title": "Space " * (i + 1), "Genre": "", "Director": "", "Star Cast": ""} for i in range(8)]
+    hits = index_for(rows).search("space", top_k=3)
+    assert len(hits) == 3
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert index_for(rows).search("space", top_k=0) == []
+
+
+def test_partial_words_expand_to_indexed_terms():
+    index = index_for([{"Title": "The Matrix", "Genre": "", "Director": "", "Star Cast": ""}])
+    assert [doc for doc, _ in index.search("matr")] == [0]
+    assert index.search("zzz") == []
+
+
+def test_group_ids_return_each_group_once():
+    rows = [{"Title": "Oppenheimer", "Genre": "", "Director": "Nolan", "Star Cast": ""}] * 4
+    rows += [{"Title": f"Film {i}", "Genre": "", "Director": "Nolan", "Star Cast": ""} for i in range(4)]
+    groups = np.array([7, 7, 7, 7, 1, 2, 3, 4])
+    hits = index_for(rows).search("nolan oppenheimer", top_k=3, group_ids=groups)
+    assert [doc for doc, _ in hits] == [0, 4, 5]
+
+
+def test_keyword_search_skips_duplicate_rows(default_catalog):
+    # Row 3 repeats row 0 ("Movie 0"), so it must not fill a second slot.
+    titles = [result["title"] for result in search_movies_by_keywords("movie 0", top_k=5)]
+    assert titles.count("Movie 0") == 1
+    assert len(titles) == 5
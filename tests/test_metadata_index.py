@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from storage.metadata_index import MetadataFilter, MetadataIndex
+from tests.conftest import make_catalog_df
+
+
+def rows(mask):
+    return np.flatnonzero(mask).tolist()
+
+
+def test_empty_filter_has_no_mask():
+    index = MetadataIndex(make_catalog_df())
+    assert index.mask(None) is None
+    assert index.mask(MetadataFilter()) is None
+    assert MetadataFilter(genres=[]).is_empty()
+
+
+def test_numeric_ranges_are_inclusive():
+    df = make_catalog_df()
+    index = MetadataIndex(df)
+    mask = index.mask(MetadataFilter(min_year=2000, max_year=2005))
+    assert rows(mask) == df.index[df["Year"].between(2000, 2005)].tolist()
+    mask = index.mask(MetadataFilter(max_metascore=45))
+    assert rows(mask) == df.index[df["MetaScore"] <= 45].tolist()
+
+
+def test_labels_match_any_requested_value_case_insensitively():
+    df = make_catalog_df()
+    mask = MetadataIndex(df).mask(MetadataFilter(genres=["thriller", "Sci-Fi"]))
+    expected = df.index[df["Genre"].str.contains("Thriller") | (df["Genre"] == "Sci-Fi")].tolist()
+    assert rows(mask) == expected
+
+
+def test_constraints_are_combined():
+    df = make_catalog_df()
+    mask = MetadataIndex(df).mask(MetadataFilter(genres=["Drama"], certificates=["R"], min_rating=6))
+    expected = df.index[df["Genre"].str.contains("Drama") & (df["Certificates"] == "R") & (df["IMDb Rating"] >= 6)]
+    assert rows(mask) == expected.tolist()
+
+
+def test_missing_values_never_match_a_range():
+    df = pd.DataFrame({"Title": ["a", "b", "c"], "MetaScore": [50, None, "n/a"]})
+    assert rows(MetadataIndex(df).mask(MetadataFilter(min_metascore=0))) == [0]
+
+
+def test_unknown_labels_are_reported():
+    index = MetadataIndex(make_catalog_df())
+    assert index.unknown_labels(MetadataFilter(genres=["Drama", "Western"], certificates=["pg"])) == {"genres": ["Western"]}
@@ -0,0 +1,66 @@
+import numpy as np
+
+from storage.title_index import normalize_title
+from tests.conftest import make_retriever
+
+
+def titles(records):
+    return [record["Title"] for record in records]
+
+
+def spy_on_search(retriever, monkeypatch):
+    """Records the k of every index search personalized_search runs."""
+    sizes = []
+    search = retriever._search
+
+    def recording(vectors, k, mask=None, kind="batch"):
+        sizes.append(k)
+        return search(vectors, k, mask, kind)
+
+    monkeypatch.setattr(retriever, "_search", recording)
+    return sizes
+
+
+def test_liked_and_disliked_movies_are_never_recommended(tmp_path, catalog_csv, fake_model):
+    r = make_retriever(tmp_path, catalog_csv)
+    # Query with a liked movie's own plot, so it would otherwise rank first.
+    query = r.catalog.records[5]["Generated_Plot"] + " | " + r.catalog.records[5]["Genre"]
+    results = r.personalized_search(query, liked_ids=[5, 0], disliked_ids=[9], top_k=10)
+    assert len(results) == 10
+    # Row 3 duplicates the liked row 0 under the same title, so it is excluded too.
+    assert not {"Movie 5", "Movie 0", "Movie 9"} & set(titles(results))
+    assert len(set(titles(results))) == len(results)
+
+
+def test_unresolved_titles_are_excluded(tmp_path, catalog_csv, fake_model):
+    r = make_retriever(tmp_path, catalog_csv)
+    results = r.personalized_search("anything", exclude_titles=[normalize_title("Movie 12")], top_k=38)
+    assert "Movie 12" not in titles(results)
+
+
+def test_search_widens_until_enough_unseen_movies(tmp_path, catalog_csv, fake_model, monkeypatch):
+    r = make_retriever(tmp_path, catalog_csv)
+    sizes = spy_on_search(r, monkeypatch)
+    excluded = [normalize_title(f"Movie {i}") for i in range(10, 40)]
+    results = r.personalized_search("anything", exclude_titles=excluded, top_k=5)
+    # 5 * pool_factor 4 = 20 first; 30 of 40 titles are excluded, so that
+    # leaves too few and the fetch doubles, capped at the catalog size.
+    assert sizes == [20, 40]
+    assert len(results) == 5 and not set(titles(results)) & {f"Movie {i}" for i in range(10, 40)}
+
+
+def test_fetch_size_counts_the_excluded_movies(tmp_path, catalog_csv, fake_model, monkeypatch):
+    r = make_retriever(tmp_path, catalog_csv)
+    sizes = spy_on_search(r, monkeypatch)
+    r.personalized_search("anything", liked_ids=[1, 2], disliked_ids=[4], top_k=2)
+    assert sizes == [2 * 4 + 3]
+
+
+def test_likes_pull_the_ranking_towards_them(tmp_path, catalog_csv, fake_model):
+    r = make_retriever(tmp_path, catalog_csv)
+    embeddings = np.asarray(r.embeddings)
+    plain = r.personalized_search("anything", top_k=38)
+    liked = r.personalized_search("anything", liked_ids=[20], taste_weight=0.9, top_k=38)
+    nearest_to_liked = int(np.argsort(-(embeddings @ embeddings[20]))[1])
+    rank = lambda results: titles(results).index(r.catalog.records[nearest_to_liked]["Title"])
+    assert rank(liked) < rank(plain)
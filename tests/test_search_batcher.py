@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from storage.search_batcher import SearchBatcher
+
+
+class FakeRetriever:
+    """Records each search_batch call; every query's results are (query, rank) pairs, best first."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def search_batch(self, queries, top_k=5, filters=None):
+        self.started.set()
+        self.release.wait(5)
+        self.calls.append((list(queries), top_k))
+        if self.fail:
+            raise RuntimeError("index unavailable")
+        return [[{"query": query, "rank": rank} for rank in range(top_k)] for query in queries]
+
+
+def test_concurrent_requests_share_one_search():
+    retriever = FakeRetriever()
+    batcher = SearchBatcher(retriever, max_wait_ms=200)
+    futures = [batcher.submit(query, top_k=k) for query, k in (("heist", 2), ("space", 5), ("romance", 1))]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert retriever.calls == [(["heist", "space", "romance"], 5)]
+    # Each caller gets its own query's results, cut to its own top_k.
+    assert [[(r["query"], r["rank"]) for r in rows] for rows in results] == [
+        [("heist", 0), ("heist", 1)],
+        [("space", rank) for rank in range(5)],
+        [("romance", 0)],
+    ]
+    assert batcher.stats() == {"batches": 1, "requests": 3, "avg_batch_size": 3.0}
+
+
+def test_batches_are_capped_at_max_batch_size():
+    retriever = FakeRetriever()
+    batcher = SearchBatcher(retriever, max_batch_size=2, max_wait_ms=200)
+    futures = [batcher.submit(f"q{i}", top_k=1) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    assert [len(queries) for queries, _ in retriever.calls] == [2, 2, 1]
+
+
+def test_a_failed_search_fails_every_caller_in_the_batch():
+    batcher = SearchBatcher(FakeRetriever(fail=True), max_wait_ms=100)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="index unavailable"):
+            future.result(timeout=5)
+
+
+def test_cancelled_requests_are_skipped():
+    retriever = FakeRetriever()
+    retriever.release.clear()
+    batcher = SearchBatcher(retriever, max_wait_ms=1)
+    blocker = batcher.submit("first")  # Holds the worker until released.
+    assert retriever.started.wait(5)
+    cancelled, kept = batcher.submit("cancelled"), batcher.submit("kept")
+    assert cancelled.cancel()
+    retriever.release.set()
+    blocker.result(timeout=5)
+    assert kept.result(timeout=5)[0]["query"] == "kept"
+    assert all("cancelled" not in queries for queries, _ in retriever.calls)
+
+
+def test_async_callers_are_served_too():
+    batcher = SearchBatcher(FakeRetriever(), max_wait_ms=50)
+
+    async def scenario():
+        return await asyncio.gather(batcher.search_async("a", top_k=1), batcher.search_async("b", top_k=2))
+
+    first, second = asyncio.run(scenario())
+    assert [r["query"] for r in first] == ["a"] and [r["query"] for r in second] == ["b", "b"]
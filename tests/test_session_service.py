@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from storage.session_service import PersistentSessionService
+from storage.state_schema import UserProfile
+
+
+def event(text, **state_delta):
+    return Event(invocation_id=f"e-{uuid.uuid4()}", author="user",
+                 content=types.Content(role="user", parts=[types.Part(text=text)]),
+                 actions=EventActions(state_delta=state_delta))
+
+
+def texts(session):
+    return [e.content.parts[0].text for e in session.events]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_session_round_trips_through_sqlite(db_path):
+    async def scenario():
+        service = PersistentSessionService(db_path=db_path)
+        session = await service.create_session("app", "u", "s")
+        assert isinstance(session.state["user_profile"], UserProfile)
+        await service.append_event(session, event("hello", mood="curious"))
+        await service.close()
+
+        reopened = PersistentSessionService(db_path=db_path)
+        loaded = await reopened.get_session("app", "u", "s")
+        await reopened.close()
+        return loaded
+
+    loaded = run(scenario())
+    assert texts(loaded) == ["hello"]
+    assert loaded.state["mood"] == "curious"
+    assert isinstance(loaded.state["user_profile"], UserProfile)
+
+
+def test_concurrent_workers_do_not_overwrite_each_other(db_path):
+    async def scenario():
+        first, second = PersistentSessionService(db_path=db_path), PersistentSessionService(db_path=db_path)
+        a = await first.create_session("app", "u", "s")
+        await first.append_event(a, event("a1"))
+        await first.flush()
+        b = await second.get_session("app", "u", "s")
+        await first.append_event(a, event("a2", size="L"))
+        await second.append_event(b, event("b1", color="blue"))
+        await first.flush()
+        await second.flush()  # Loses the race and rebases onto the stored copy.
+        await second.flush()
+        assert texts(b) == ["a1", "a2", "b1"]
+        # The first worker's cached copy is now stale, so it is reloaded.
+        reloaded = await first.get_session("app", "u", "s")
+        await first.close()
+        await second.close()
+        return reloaded
+
+    reloaded = run(scenario())
+    assert texts(reloaded) == ["a1", "a2", "b1"]
+    assert reloaded.state["size"] == "L" and reloaded.state["color"] == "blue"
+
+
+def test_evicted_sessions_are_written_by_the_flush(db_path):
+    def stored():
+        with sqlite3.connect(db_path) as db:
+            return [row[0] for row in db.execute("SELECT session_id FROM sessions ORDER BY session_id")]
+
+    async def scenario():
+        service = PersistentSessionService(db_path=db_path, max_cached_sessions=1, flush_interval=60)
+        first = await service.create_session("app", "u", "s1")
+        await service.create_session("app", "u", "s2")
+        assert stored() == []  # Eviction didn't write on the event loop.
+        assert await service.get_session("app", "u", "s1") is first
+        await service.create_session("app", "u", "s3")
+        await service.close()
+
+    run(scenario())
+    assert stored() == ["s1", "s2", "s3"]
+
+
+def test_tables_without_a_version_column_are_migrated(db_path):
+    with sqlite3.connect(db_path) as db:
+        db.execute("CREATE TABLE sessions (app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL, "
+                   "state TEXT NOT NULL, events TEXT NOT NULL, last_update_time REAL NOT NULL, "
+                   "PRIMARY KEY (app_name, user_id, session_id))")
+        db.execute("INSERT INTO sessions VALUES ('app', 'u', 's', '{}', '[]', ?)", (time.time(),))
+
+    async def scenario():
+        service = PersistentSessionService(db_path=db_path)
+        session = await service.get_session("app", "u", "s")
+        await service.append_event(session, event("hi"))
+        await service.close()
+
+    run(scenario())
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT version FROM sessions").fetchone() == (2,)
+
+
+def test_list_sessions_reads_off_the_event_loop(db_path, monkeypatch):
+    async def scenario():
+        service = PersistentSessionService(db_path=db_path)
+        for session_id in ("s1", "s2"):
+            await service.create_session("app", "u", session_id)
+        await service.create_session("app", "other", "s3")
+        loop_thread = threading.get_ident()
+        read_threads = []
+        read_user_rows = service._read_user_rows
+
+        def recording(*args):
+            read_threads.append(threading.get_ident())
+            return read_user_rows(*args)
+
+        monkeypatch.setattr(service, "_read_user_rows", recording)
+        sessions = await service.list_sessions("app", "u")
+        await service.close()
+        return sessions, loop_thread, read_threads
+
+    sessions, loop_thread, read_threads = run(scenario())
+    assert sorted(session.id for session in sessions) == ["s1", "s2"]
+    assert all(not session.events for session in sessions)
+    assert read_threads and loop_thread not in read_threads
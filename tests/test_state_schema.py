@@ -0,0 +1,49 @@
+from storage.catalog import movie_id
+from storage.state_schema import UserProfile
+
+
+def test_history_is_capped_dropping_the_oldest():
+    profile = UserProfile(max_items=3)
+    for mid in range(5):
+        profile.like(mid)
+    assert profile.liked_ids == [4, 3, 2]
+
+
+def test_re_adding_moves_a_movie_to_most_recent():
+    profile = UserProfile(liked=[1, 2, 3])
+    assert profile.like(1)
+    assert not profile.like(1)  # Already the most recent.
+    assert profile.liked_ids == [1, 3, 2]
+
+
+def test_a_movie_is_never_both_liked_and_disliked():
+    profile = UserProfile(liked=[1, 2])
+    profile.dislike(1)
+    assert profile.liked_ids == [2] and profile.disliked_ids == [1]
+    profile.like(1)
+    assert profile.liked_ids == [1, 2] and profile.disliked_ids == []
+
+
+def test_compact_form_round_trips():
+    profile = UserProfile(name="Ada", liked=[10, 11], disliked=[12], preferred_genres=["Drama"])
+    compact = profile.to_compact()
+    assert compact == {"n": "Ada", "l": [10, 11], "d": [12], "g": ["Drama"]}
+    assert UserProfile.from_compact(compact) == profile
+    assert UserProfile().to_compact() == {}
+    assert UserProfile.from_compact({}) == UserProfile()
+
+
+def test_legacy_title_lists_are_upgraded_to_ids(default_catalog):
+    legacy = {"name": "Ada", "liked_movies": ["Movie 7", "Dune (2021)", "Not In The Catalog"],
+              "disliked_movies": ["movie 8"], "preferred_genres": ["Sci-Fi"]}
+    profile = UserProfile.from_compact(legacy)
+    assert profile.name == "Ada"
+    assert profile.liked_ids == [movie_id("Dune", 2021), movie_id("Movie 7", 1977)]
+    assert profile.disliked_ids == [movie_id("Movie 8", 1978)]
+    assert list(profile.preferred_genres) == ["Sci-Fi"]
+
+
+def test_prompt_rendering_lists_titles_most_recent_first(default_catalog):
+    profile = UserProfile(name="Ada", liked=[movie_id("Movie 7", 1977), movie_id("Dune", 1984), 123])
+    assert str(profile) == ("name: Ada | liked_movies (most recent first): [#123; Dune (1984); Movie 7 (1977)] | "
+                            "disliked_movies (most recent first): []")
@@ -0,0 +1,59 @@
+import json
+
+from storage.catalog import DEFAULT_CSV_PATH
+from storage.theme_index import THEME_COLUMNS, build_theme_index, get_theme_index
+from storage.vector_db import MODEL_NAME
+from tests.conftest import FakeSentenceTransformer, make_catalog_df, write_catalog
+from tools.movie_tools import recommend_by_theme
+
+
+def analysed_catalog_df(reverse=False):
+    df = make_catalog_df()
+    df[THEME_COLUMNS["themes"]] = [json.dumps([genre.lower()]) for genre in df["Genre"]]
+    df[THEME_COLUMNS["genre_style"]] = "A film."
+    df[THEME_COLUMNS["summary"]] = [f"Critic summary of {title} ({year})." for title, year in zip(df["Title"], df["Year"])]
+    return df.iloc[::-1].reset_index(drop=True) if reverse else df
+
+
+def publish(df):
+    """Writes the catalog and builds its theme index, as `pipelines.critic_themes` does."""
+    catalog = write_catalog(DEFAULT_CSV_PATH, df)
+    build_theme_index(catalog.df, FakeSentenceTransformer(MODEL_NAME), MODEL_NAME)
+    return catalog
+
+
+def recommend(title):
+    return recommend_by_theme.__wrapped__(title)
+
+
+def test_an_index_built_after_startup_is_picked_up(default_catalog):
+    assert get_theme_index() is None
+    assert recommend("Movie 7")["status"] == "not_available"
+    publish(analysed_catalog_df())
+    assert get_theme_index() is not None
+    assert recommend("Movie 7")["status"] == "success"
+
+
+def test_rows_follow_a_reloaded_catalog(default_catalog):
+    publish(analysed_catalog_df())
+    before = recommend("Movie 7")
+    assert before["source_title"] == "Movie 7"
+    assert before["analysis"]["summary"] == "Critic summary of Movie 7 (1977)."
+
+    # The catalog is reordered and reloaded (as MovieRetriever.refresh does).
+    write_catalog(DEFAULT_CSV_PATH, analysed_catalog_df(reverse=True))
+    # The theme store no longer matches the catalog: no answer, rather than another movie's.
+    assert recommend("Movie 7")["status"] == "not_available"
+
+    publish(analysed_catalog_df(reverse=True))
+    after = recommend("Movie 7")
+    assert after["source_title"] == "Movie 7"
+    assert after["analysis"]["summary"] == "Critic summary of Movie 7 (1977)."
+    assert "Movie 7" not in [movie["Title"] for movie in after["recommendations"]]
+
+
+def test_remakes_resolve_to_their_own_analysis(default_catalog):
+    publish(analysed_catalog_df())
+    assert recommend("Dune (2021)")["analysis"]["summary"] == "Critic summary of Dune (2021)."
+    assert recommend("Dune (1984)")["analysis"]["summary"] == "Critic summary of Dune (1984)."
+
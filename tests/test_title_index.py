@@ -0,0 +1,41 @@
+import pytest
+
+from storage.movie_data_access import get_rating_by_title
+from storage.title_index import TitleIndex, normalize_title
+
+
+@pytest.mark.parametrize("title", ["The Matrix", "matrix", "Matrix, The", "  THE   MATRIX!  "])
+def test_article_and_punctuation_variants_normalize_alike(title):
+    assert normalize_title(title) == "matrix"
+
+
+def test_normalize_strips_accents_and_keeps_inner_articles():
+    assert normalize_title("Amélie") == "amelie"
+    assert normalize_title("Gone with the Wind") == "gone with the wind"
+    assert normalize_title(None) == ""
+
+
+def test_exact_matches_have_full_confidence_and_keep_the_first_row():
+    index = TitleIndex(["Inception", "Heat", "Inception"])
+    assert index.lookup("inception") == (0, 1.0)
+
+
+def test_typos_fall_back_to_trigram_matching():
+    index = TitleIndex(["Inception", "Interstellar", "The Prestige"])
+    row, confidence = index.lookup("Inceptoin")
+    assert row == 0
+    assert 0.45 <= confidence < 1.0
+    assert index.lookup("Interstelar")[1] > index.lookup("Interstllar")[1]
+
+
+def test_weak_matches_are_rejected():
+    assert TitleIndex(["Inception"]).lookup("Jaws") is None
+    assert TitleIndex(["Inception"]).lookup("") is None
+
+
+def test_rating_lookup_reports_the_match_confidence(default_catalog):
+    exact = get_rating_by_title("movie 10")
+    assert (exact["title"], exact["rating"], exact["confidence"]) == ("Movie 10", 6.0, 1.0)
+    fuzzy = get_rating_by_title("Movi 10")
+    assert fuzzy["title"] == "Movie 10" and fuzzy["confidence"] < 1.0
+    assert get_rating_by_title("Completely Unrelated") is None
@@ -0,0 +1,44 @@
+import asyncio
+import json
+import logging
+from typing import Any
+
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+
+from observability.metrics import CRITIC_REQUESTS
+from storage.critic_cache import get_critic_cache
+from storage.theme_index import precomputed_analysis_for_title
+
+
+class CachedCriticTool(AgentTool):
+    """
+    `AgentTool` for critic_agent that answers without running the agent when
+    it can: from the analysis precomputed into the catalog by
+    `pipelines/critic_themes.py`, then from the shared critic cache. Only a
+    miss in both runs the agent (an LLM round-trip), and its answer is
+    cached if it is valid analysis JSON.
+    """
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        title = args.get("request")
+        if not title:
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        precomputed = await asyncio.to_thread(precomputed_analysis_for_title, title)
+        if precomputed is not None:
+            logging.info(f"TOOL EXECUTED: critic_agent('{title}') served from the catalog.")
+            CRITIC_REQUESTS.inc(source="precomputed")
+            return json.dumps(precomputed)
+
+        cache = get_critic_cache()
+        cached = await asyncio.to_thread(cache.get, title)
+        if cached is not None:
+            logging.info(f"TOOL EXECUTED: critic_agent('{title}') served from cache.")
+            CRITIC_REQUESTS.inc(source="cache")
+            return json.dumps(cached)
+
+        CRITIC_REQUESTS.inc(source="llm")
+        result = await super().run_async(args=args, tool_context=tool_context)
+        await asyncio.to_thread(cache.put, title, result)
+        return result
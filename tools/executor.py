@@ -0,0 +1,32 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Dedicated, size-limited pool for CPU-heavy sync tools (SentenceTransformer
+# encodes, FAISS searches, catalog scans) so they never block the event loop
+# and can't starve the default executor used by the rest of the app.
+TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MARS_TOOL_WORKERS", "8")),
+    thread_name_prefix="mars-tool",
+)
+
+
+def offload_to_tool_executor(func):
+    """
+    Turns a sync tool into an async one that runs on TOOL_EXECUTOR.
+
+    `functools.wraps` keeps the name, docstring and (via `__wrapped__`) the
+    signature, so the ADK builds the same function declaration for the model
+    as it did for the sync version. The sync function stays reachable as
+    `tool.__wrapped__`.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so contextvars (e.g. the request trace) carry over.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(TOOL_EXECUTOR, functools.partial(context.run, func, *args, **kwargs))
+
+    return wrapper
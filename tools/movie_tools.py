@@ -1,62 +1,162 @@
 import logging
 from typing import Optional, List
 from google.adk.tools.tool_context import ToolContext
-from storage.movie_data_access import get_rating_by_title, search_movies_by_keywords
-from storage.vector_db import movie_retriever_instance
+from storage.movie_data_access import (
+    find_catalog_movie_id, find_movie_ids, get_rating_by_title, profile_rows, search_movies_by_keywords,
+)
+from storage.metadata_index import MetadataFilter
+from storage.theme_index import get_theme_index, precomputed_analysis
+from storage.title_index import normalize_title
+from storage.vector_db import get_movie_retriever, get_search_batcher
+from tools.executor import offload_to_tool_executor
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - LOG - %(message)s')
 
+# The catalog/vector tools are CPU-bound, so they run on the bounded tool
+# executor instead of the event loop; `update_user_preferences` only touches
+# session state and stays inline.
+@offload_to_tool_executor
 def get_movie_rating(title: str) -> dict:
     """Gets the rating for a specific movie title."""
     logging.info(f"TOOL EXECUTED: get_movie_rating(title='{title}')")
     rating_info = get_rating_by_title(title)
     if rating_info:
-        return {"title": title, "rating": rating_info.get("rating"), "votes": rating_info.get("votes")}
+        return {
+            "title": title,
+            "matched_title": rating_info.get("title"),
+            "match_confidence": rating_info.get("confidence"),
+            "rating": rating_info.get("rating"),
+            "votes": rating_info.get("votes"),
+        }
     return {"title": title, "rating": "Not Found", "votes": "N/A"}
 
+@offload_to_tool_executor
 def search_movies(query: str) -> dict:
     """Finds information about a movie using keyword search."""
     logging.info(f"TOOL EXECUTED: search_movies(query='{query}')")
     return {"results": search_movies_by_keywords(query, top_k=5)}
 
 # --- UPGRADED RECOMMENDATION TOOL ---
+@offload_to_tool_executor
 def recommend_movies(
     base_query: str,
     liked_movies: Optional[List[str]] = None,
-    disliked_movies: Optional[List[str]] = None
+    disliked_movies: Optional[List[str]] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    genres: Optional[List[str]] = None,
+    certificates: Optional[List[str]] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    min_metascore: Optional[float] = None,
+    max_metascore: Optional[float] = None,
+    min_duration: Optional[int] = None,
+    max_duration: Optional[int] = None,
+    tool_context: Optional[ToolContext] = None
 ) -> dict:
     """
     Recommends movies based on a query, using the user's liked and
     disliked movies to create a more personalized recommendation.
+
+    Optional filters restrict the results to movies that match all of them:
+    release year between min_year and max_year, any of `genres` (e.g.
+    ["Comedy", "Drama"]), any of `certificates` (e.g. ["PG-13", "R"]), IMDb
+    rating between min_rating and max_rating (0-10), MetaScore between
+    min_metascore and max_metascore (0-100), and runtime between
+    min_duration and max_duration minutes.
     """
     logging.info(f"TOOL EXECUTED: recommend_movies(base_query='{base_query}')")
-    
-    # Create a more sophisticated search query for the vector store.
-    # This combines the user's explicit request with their implicit preferences.
-    search_text = base_query
-    if liked_movies:
-        # Add liked movies to the search query to find similar items.
-        search_text += " " + " ".join(liked_movies)
-        logging.info(f"Personalizing search with liked movies: {liked_movies}")
-
-    # In a more advanced system, you would also use the disliked_movies
-    # to filter out or penalize certain results. For now, we'll keep it simple.
-    
-    recommendations = movie_retriever_instance.search(search_text, top_k=10) # Get more results to filter
-    
-    # Filter out movies the user has already liked or disliked to avoid re-recommending.
-    final_recommendations = []
-    if recommendations:
-        for rec in recommendations:
-            title = rec.get('Title')
-            if title:
-                # Keep the recommendation if it's not in the user's liked or disliked lists.
-                if (not liked_movies or title not in liked_movies) and \
-                   (not disliked_movies or title not in disliked_movies):
-                    final_recommendations.append(rec)
-    
-    # Return the top 5 of the filtered list.
-    return {"recommendations": final_recommendations[:5]}
+    filters = MetadataFilter(
+        min_year=min_year, max_year=max_year, genres=genres, certificates=certificates,
+        min_rating=min_rating, max_rating=max_rating, min_metascore=min_metascore,
+        max_metascore=max_metascore, min_duration=min_duration, max_duration=max_duration,
+    )
+    if filters.is_empty():
+        filters = None
+
+    # Movies saved in the profile are already catalog ids; only titles passed
+    # in by the agent need resolving.
+    user_profile = tool_context.state.get("user_profile") if tool_context is not None else None
+    profile_liked, profile_disliked = profile_rows(user_profile)
+
+    if not liked_movies and not disliked_movies and not profile_liked and not profile_disliked:
+        if filters is None:
+            return {"recommendations": get_search_batcher().search(base_query, top_k=5)}
+        # Filtered searches skip the micro-batcher, whose batches share a single unfiltered FAISS search.
+        recommendations = get_movie_retriever().search(base_query, top_k=5, filters=filters)
+        return _filtered_result(recommendations, filters)
+
+    # Personalize in embedding space: liked movies pull the search towards
+    # their stored vectors and disliked ones push it away, without encoding
+    # any extra text. Liked and disliked movies are never re-recommended.
+    liked_ids, unresolved_liked = find_movie_ids(liked_movies)
+    disliked_ids, unresolved_disliked = find_movie_ids(disliked_movies)
+    liked_ids = list(dict.fromkeys(profile_liked + liked_ids))
+    disliked_ids = list(dict.fromkeys(profile_disliked + disliked_ids))
+    logging.info(f"Personalizing search with {len(liked_ids)} liked and {len(disliked_ids)} disliked movies.")
+
+    recommendations = get_movie_retriever().personalized_search(
+        base_query,
+        liked_ids=liked_ids,
+        disliked_ids=disliked_ids,
+        exclude_titles=unresolved_liked + unresolved_disliked,
+        top_k=5,
+        filters=filters,
+    )
+    if filters is not None:
+        return _filtered_result(recommendations, filters)
+    return {"recommendations": recommendations}
+
+
+def _filtered_result(recommendations: list, filters: MetadataFilter) -> dict:
+    """Echoes the applied filters, and says which ones the catalog can't satisfy, so the agent can relax them."""
+    result = {"recommendations": recommendations, "filters": filters.describe()}
+    metadata_index = get_movie_retriever().catalog.metadata_index
+    unknown = metadata_index.unknown_labels(filters)
+    if unknown:
+        result["unknown_values"] = unknown
+        result["known_values"] = {key: metadata_index.known_labels.get(key, []) for key in unknown}
+    if not recommendations:
+        result["message"] = "No movies in the catalog match these filters; try relaxing them."
+    return result
+
+
+@offload_to_tool_executor
+def recommend_by_theme(title: str, tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Recommends movies whose themes, genre and style are closest to the given
+    movie, using critic analyses precomputed for the whole catalog. Returns
+    status "not_available" if the movie has no precomputed analysis.
+    """
+    logging.info(f"TOOL EXECUTED: recommend_by_theme(title='{title}')")
+    theme_index = get_theme_index()
+    if theme_index is None:
+        return {"status": "not_available", "title": title}
+    # Rows are resolved in the catalog the theme vectors were built for.
+    catalog = theme_index.catalog
+    row = catalog.row_for_title(title)
+    if row is None or not theme_index.has_row(row):
+        return {"status": "not_available", "title": title}
+
+    user_profile = tool_context.state.get("user_profile") if tool_context is not None else None
+    liked, disliked = profile_rows(user_profile, catalog)
+    records = catalog.records
+    # Over-fetch so dropping seen movies and duplicate titles still leaves five.
+    seen_titles = {normalize_title(records[i]["Title"]) for i in [row, *liked, *disliked]}
+    recommendations = []
+    for i in theme_index.similar(row, top_k=20, exclude_rows=liked + disliked):
+        key = normalize_title(records[i]["Title"])
+        if key not in seen_titles:
+            seen_titles.add(key)
+            recommendations.append(records[i])
+        if len(recommendations) == 5:
+            break
+    return {
+        "status": "success",
+        "source_title": records[row]["Title"],
+        "analysis": precomputed_analysis(records[row]),
+        "recommendations": recommendations,
+    }
 
 
 def update_user_preferences(
@@ -68,16 +168,23 @@ def update_user_preferences(
     """Saves a user's movie preference directly into the session state."""
     logging.info(f"TOOL EXECUTED: update_user_preferences for user '{user_id}'")
     user_profile = tool_context.state.get("user_profile")
+    if user_profile is None:
+        return {"status": "error", "user_id": user_id, "message": "No profile for this session."}
 
-    if liked_movie and user_profile:
-        if liked_movie not in user_profile.liked_movies:
-            user_profile.liked_movies.append(liked_movie)
-            logging.info(f"STATE UPDATED: Added '{liked_movie}' to liked movies for user '{user_id}'.")
-
-    if disliked_movie and user_profile:
-        if disliked_movie not in user_profile.disliked_movies:
-            user_profile.disliked_movies.append(disliked_movie)
-            logging.info(f"STATE UPDATED: Added '{disliked_movie}' to disliked movies for user '{user_id}'.")
+    # Preferences are stored as catalog ids, so only movies in the catalog
+    # can be saved (and used for recommendations).
+    not_found = []
+    for title, add, label in ((liked_movie, user_profile.like, "liked"), (disliked_movie, user_profile.dislike, "disliked")):
+        if not title:
+            continue
+        movie_id = find_catalog_movie_id(title)
+        if movie_id is None:
+            not_found.append(title)
+        elif add(movie_id):
+            logging.info(f"STATE UPDATED: Added '{title}' to {label} movies for user '{user_id}'.")
 
     tool_context.state["user_profile"] = user_profile
-    return {"status": "success", "user_id": user_id}
\ No newline at end of file
+    if not_found:
+        return {"status": "not_found", "user_id": user_id, "not_found": not_found,
+                "message": "These titles are not in the movie catalog, so they were not saved."}
+    return {"status": "success", "user_id": user_id}